@@ -0,0 +1,617 @@
+"""
+離線效能測試
+
+以錄製 (或合成) 的 API 回應和頁面作為測試資料，透過本機的測試伺服器取代真正的網站，
+測量解析、合併和 excel 寫入、更新的執行時間，並將結果附加到結果檔案中，方便比較每次修改前後的差異
+
+```bash
+# 使用合成的測試資料執行
+python benchmark.py
+
+# 錄製真正網站的回應 (需要網路)，之後以錄製的資料執行
+python benchmark.py record fixtures
+python benchmark.py run --fixtures fixtures
+```
+"""
+
+import argparse
+import http.server
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from main import (
+    BaseRequset,
+    CMoneyCrawler,
+    ExcelWriter,
+    ExeclUpdater,
+    HttpDiskCache,
+    LazyPriceTable,
+    StatementDogCrawler,
+    StockPrice,
+    StreamingExcelWriter,
+    _BaseCrawler,
+    lxml_html,
+)
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+DAY_TYPE_ARGS = ["1day", "1week", "1month", "3months"]
+
+TWSE_URL = "https://www.twse.com.tw/exchangeReport/STOCK_DAY_ALL"
+TPEX_URL = "https://www.tpex.org.tw/openapi/v1/tpex_mainboard_quotes"
+STATEMENT_DOG_TREND_URL = "https://statementdog.com/api/v1/market-trend/tw/{day_type_arg}"
+
+
+class Fixtures:
+    """
+    測試資料
+
+    以 `HttpDiskCache` 的格式存放在資料夾中 (url -> 回應內容)，錄製時直接把快取資料夾當作測試資料
+    """
+
+    def __init__(self, fixture_dir: str):
+        """
+
+        fixture_dir (str): 測試資料資料夾路徑
+        """
+
+        self.fixture_dir = fixture_dir
+        self.cache = HttpDiskCache(fixture_dir, max_size=float("inf"), offline=True)
+
+    def urls(self) -> list:
+        return sorted(entry["url"] for entry in self.cache.entries())
+
+    def get(self, url: str) -> requests.Response:
+        """取得 url 的回應，沒有的話回傳 None"""
+
+        entry = self.cache.get(url)
+
+        return self.cache.to_response(entry) if entry is not None else None
+
+    def hosts(self) -> set:
+        return {urlsplit(url).netloc for url in self.urls()}
+
+    @staticmethod
+    def record(fixture_dir: str):
+        """爬取真正的網站，將所有回應錄製到 `fixture_dir`"""
+
+        # 錄製時所有回應都要存入 (存活時間是 0 的 url 不會存入快取)
+        BaseRequset.CACHE = HttpDiskCache(
+            fixture_dir, ttls={}, default_ttl=365 * 24 * 60 * 60, max_size=float("inf")
+        )
+
+        try:
+            StockPrice.get_stock_day_all()
+            StockPrice.get_mainborad_day_all()
+            StatementDogCrawler()._get_datas(DAY_TYPE_ARGS)
+
+            with CMoneyCrawler() as cmoney_crawler:
+                cmoney_crawler._get_datas(DAY_TYPE_ARGS)
+
+        finally:
+            BaseRequset.CACHE = None
+            BaseRequset.close()
+
+    @staticmethod
+    def _store(cache: HttpDiskCache, url: str, body: str, content_type: str):
+        response = requests.Response()
+        response._content = body.encode("utf-8")
+        response.status_code = 200
+        response.encoding = "utf-8"
+        response.headers = CaseInsensitiveDict({"Content-Type": content_type})
+
+        cache.set(url, response)
+
+    @staticmethod
+    def synthesize(
+        fixture_dir: str,
+        seed: int = 0,
+        twse_number: int = 1000,
+        tpex_number: int = 800,
+        group_number: int = 40,
+        group_size: int = 30,
+    ):
+        """
+        產生格式和真正網站相同的合成測試資料
+
+        Args:
+            fixture_dir (str): 測試資料資料夾路徑
+            seed (int): 亂數種子，相同的種子會產生相同的資料
+            twse_number (int): 上市股票數量
+            tpex_number (int): 上櫃股票數量
+            group_number (int): 每個來源的產業類別數量
+            group_size (int): 每個產業類別頁面中的股票數量
+        """
+
+        rng = random.Random(seed)
+        cache = HttpDiskCache(fixture_dir, ttls={}, max_size=float("inf"))
+
+        codes = [str(1101 + i) for i in range(twse_number + tpex_number)]
+        names = {code: f"股票{code}" for code in codes}
+
+        def price() -> str:
+            return f"{rng.uniform(10, 1000):,.2f}"
+
+        # 證交所
+        Fixtures._store(
+            cache,
+            TWSE_URL,
+            json.dumps(
+                {
+                    "stat": "OK",
+                    "date": "20231016",
+                    "data": [
+                        [code, names[code], "1,000", "100,000", price(), price(), price(), price()]
+                        + ["+1.00", "100"]
+                        for code in codes[:twse_number]
+                    ],
+                },
+                ensure_ascii=False,
+            ),
+            "application/json",
+        )
+
+        # 櫃買中心，停牌的股票沒有價格
+        Fixtures._store(
+            cache,
+            TPEX_URL,
+            json.dumps(
+                [
+                    {
+                        "Date": "1121016",
+                        "SecuritiesCompanyCode": code,
+                        "CompanyName": names[code],
+                        "Close": price() if rng.random() > 0.05 else "----",
+                        "Open": price(),
+                        "High": price(),
+                        "Low": price(),
+                        "TradingShares": "1000",
+                    }
+                    for code in codes[twse_number:]
+                ],
+                ensure_ascii=False,
+            ),
+            "application/json",
+        )
+
+        # 財報狗
+        for day_type_arg in DAY_TYPE_ARGS:
+            Fixtures._store(
+                cache,
+                STATEMENT_DOG_TREND_URL.format(day_type_arg=day_type_arg),
+                json.dumps(
+                    {
+                        "data": [
+                            {
+                                "name": f"族群{i}",
+                                "url": f"https://statementdog.com/tags/{i}",
+                                "diff_percentage": rng.uniform(-10, 10),
+                            }
+                            for i in range(group_number)
+                        ]
+                    },
+                    ensure_ascii=False,
+                ),
+                "application/json",
+            )
+
+        for i in range(group_number):
+            rows = "".join(
+                f'<tr><td class="stock-tags-list-item ticker-name">\n{code} {names[code]}\n</td>'
+                f'<td class="stock-tags-list-item">{price()}</td></tr>'
+                for code in rng.sample(codes, group_size)
+            )
+
+            Fixtures._store(
+                cache,
+                f"https://statementdog.com/tags/{i}?country=tw",
+                f'<html><body><div class="nav">{"<a>選單</a>" * 200}</div><table>'
+                f'<tbody id="stock-tags-list-body">{rows}</tbody></table></body></html>',
+                "text/html; charset=utf-8",
+            )
+
+        # CMoney
+        for url_arg in range(1, 5):
+            for order in (1, 2):
+                rows = "".join(
+                    f'<tr><td><a href="f00018.aspx?o=3&o2={url_arg}&id={i}">族群 {i}</a></td>'
+                    f"<td>{price()}</td></tr>"
+                    for i in rng.sample(range(group_number), group_number)
+                )
+
+                Fixtures._store(
+                    cache,
+                    CMoneyCrawler.RANKING_URL.format(order=order, url_arg=url_arg),
+                    f'<html><body><table id="MainContent"><tr><th>族群</th><th>金額</th></tr>'
+                    f"{rows}</table></body></html>",
+                    "text/html; charset=utf-8",
+                )
+
+        for url_arg in range(1, 5):
+            for i in range(group_number):
+                rows = "".join(
+                    f"<tr><td>{rank}</td><td>{code}</td><td>{names[code]}</td><td>{price()}</td></tr>"
+                    for rank, code in enumerate(rng.sample(codes, group_size), 1)
+                )
+
+                Fixtures._store(
+                    cache,
+                    f"https://www.cmoney.tw/finance/f00018.aspx?o=3&o2={url_arg}&id={i}",
+                    f'<html><body><table id="table1"><tr><th>名次</th><th>代號</th><th>名稱</th>'
+                    f"<th>成交量</th></tr>{rows}</table></body></html>",
+                    "text/html; charset=utf-8",
+                )
+
+
+class FixtureServer:
+    """
+    以測試資料回應請求的本機 HTTP 伺服器
+
+    `http://127.0.0.1:<port>/<host>/<path>` 會回應 `https://<host>/<path>` 的測試資料，
+    啟動時會設定 `BaseRequset.URL_REWRITES`，讓所有請求都送到這個伺服器
+    """
+
+    def __init__(self, fixtures: Fixtures):
+        self.fixtures = fixtures
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                response = self.server.fixtures.get(f"https:/{self.path}")
+
+                if response is None:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", response.headers.get("Content-Type", ""))
+                self.send_header("Content-Length", str(len(response.content)))
+                self.end_headers()
+                self.wfile.write(response.content)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.fixtures = fixtures
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+
+        port = self.server.server_address[1]
+
+        BaseRequset.CACHE = None
+        BaseRequset.URL_REWRITES = {
+            f"https://{host}": f"http://127.0.0.1:{port}/{host}" for host in self.fixtures.hosts()
+        }
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        BaseRequset.URL_REWRITES = {}
+        BaseRequset.close()
+
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Benchmark:
+    """
+    執行所有效能測試
+
+    每個測試會執行 `repeat` 次，記錄最短、中位數和平均秒數
+    """
+
+    def __init__(self, fixtures: Fixtures, work_dir: str, repeat: int = 5):
+        """
+
+        fixtures (Fixtures): 測試資料
+        work_dir (str): 存放 excel 輸出檔案的暫存資料夾
+        repeat (int): 每個測試執行的次數
+        """
+
+        self.fixtures = fixtures
+        self.work_dir = work_dir
+        self.repeat = repeat
+
+    def _json(self, url: str):
+        return self.fixtures.get(url).json()
+
+    def _texts(self, predicate) -> list:
+        """取得符合條件的 url 的 (url, 頁面內容)"""
+
+        return [
+            (url, self.fixtures.get(url).text) for url in self.fixtures.urls() if predicate(url)
+        ]
+
+    def measure(self, func) -> dict:
+        times = []
+
+        for _ in range(self.repeat):
+            start_time = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start_time)
+
+        return {
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+        }
+
+    def cases(self) -> dict:
+        """
+        建立所有測試，回傳 {測試名稱 : 函式}
+
+        需要透過網路取得資料的測試會送到 `FixtureServer`，所以要在伺服器啟動後呼叫
+        """
+
+        twse_data = self._json(TWSE_URL)
+        tpex_data = self._json(TPEX_URL)
+
+        ranking_urls = {
+            CMoneyCrawler.RANKING_URL.format(order=order, url_arg=url_arg)
+            for url_arg in range(1, 5)
+            for order in (1, 2)
+        }
+        cmoney_rankings = self._texts(lambda url: url in ranking_urls)
+        cmoney_groups = self._texts(
+            lambda url: url.startswith("https://www.cmoney.tw/") and url not in ranking_urls
+        )
+
+        statement_dog_group_urls = [
+            url[: -len("?country=tw")]
+            for url in self.fixtures.urls()
+            if url.startswith("https://statementdog.com/") and url.endswith("?country=tw")
+        ]
+
+        price_data = StockPrice.merge_market_tables(
+            StockPrice._translate_stock_data(twse_data),
+            StockPrice._translate_mainborad_data(tpex_data),
+        )
+
+        statement_dog_metas = StatementDogCrawler()._get_datas(DAY_TYPE_ARGS)
+
+        with CMoneyCrawler() as cmoney_crawler:
+            cmoney_metas = cmoney_crawler._get_datas(DAY_TYPE_ARGS)
+
+        def merge():
+            return [
+                {
+                    day_type_arg: _BaseCrawler._merge_price_data(meta_data, price_data)
+                    for day_type_arg, meta_data in metas.items()
+                }
+                for metas in (statement_dog_metas, cmoney_metas)
+            ]
+
+        statement_dog_datas, cmoney_datas = merge()
+
+        base_filename = os.path.join(BASE_DIR, "base.xlsx")
+        excel_filename = os.path.join(self.work_dir, "2023-10-16.xlsx")
+
+        def write_excel(writer_class):
+            def write():
+                if writer_class is StreamingExcelWriter:
+                    excel = StreamingExcelWriter(base_filename, excel_filename)
+
+                else:
+                    excel = ExcelWriter(base_filename, excel_filename, batch=True)
+
+                with excel:
+                    excel.write_date("2023-10-16", "2023-10-16")
+
+                    for day_type_arg in DAY_TYPE_ARGS:
+                        excel.write_statement_dog_data(
+                            statement_dog_datas[day_type_arg], day_type_arg
+                        )
+                        excel.write_cmoney_data(cmoney_datas[day_type_arg], day_type_arg)
+
+            return write
+
+        # 更新測試使用的檔案
+        write_excel(ExcelWriter)()
+
+        def update_excel():
+            excel_updater = ExeclUpdater(excel_filename)
+            excel_updater.update_file(price_data)
+            excel_updater.wb.close()
+
+        statement_dog_pages = [
+            (url, self.fixtures.get(f"{url}?country=tw").text) for url in statement_dog_group_urls
+        ]
+
+        def get_statement_dog_group_pages():
+            crawler = StatementDogCrawler()
+
+            for url in statement_dog_group_urls:
+                crawler._get_top_3_stock_of_group_data(url, "")
+
+        def parse_statement_dog_group_pages(parser: str):
+            crawler = StatementDogCrawler(parser=parser)
+
+            def parse():
+                for url, html in statement_dog_pages:
+                    crawler._parse_top_3_stock_data(html, url)
+
+            return parse
+
+        parser_cases = {
+            f"statementdog_group_parse_{parser}": parse_statement_dog_group_pages(parser)
+            for parser in StatementDogCrawler.PARSERS
+            if parser != "auto" and (parser != "lxml" or lxml_html is not None)
+        }
+
+        def lookup_lazy():
+            table = LazyPriceTable.merge(
+                LazyPriceTable(
+                    twse_data["data"], StockPrice._parse_stock_row, StockPrice._get_stock_row_code
+                ),
+                LazyPriceTable(
+                    tpex_data,
+                    StockPrice._parse_mainborad_row,
+                    StockPrice._get_mainborad_row_code,
+                ),
+            )
+            _BaseCrawler._merge_price_data(statement_dog_metas["1day"], table)
+
+        def get_cmoney_datas():
+            with CMoneyCrawler() as crawler:
+                crawler._get_datas(DAY_TYPE_ARGS)
+
+        return {
+            "twse_translate": lambda: StockPrice._translate_stock_data(twse_data),
+            "tpex_translate": lambda: StockPrice._translate_mainborad_data(tpex_data),
+            "lazy_price_lookup": lookup_lazy,
+            "statementdog_group_pages": get_statement_dog_group_pages,
+            **parser_cases,
+            "statementdog_get_datas": lambda: StatementDogCrawler()._get_datas(DAY_TYPE_ARGS),
+            "cmoney_ranking_parse": lambda: [
+                CMoneyCrawler._parse_group_data(html, url) for url, html in cmoney_rankings
+            ],
+            "cmoney_group_parse": lambda: [
+                CMoneyCrawler._parse_top_3_stock_data(html, url) for url, html in cmoney_groups
+            ],
+            "cmoney_get_datas": get_cmoney_datas,
+            "merge_price_data": merge,
+            "excel_write": write_excel(ExcelWriter),
+            "excel_write_streaming": write_excel(StreamingExcelWriter),
+            "excel_update": update_excel,
+        }
+
+    def run(self, names: list = None) -> dict:
+        """執行測試，`names` 沒有指定時執行全部，回傳 {測試名稱 : 結果}"""
+
+        with FixtureServer(self.fixtures):
+            cases = self.cases()
+
+            if names:
+                cases = {name: cases[name] for name in names}
+
+            return {name: self.measure(func) for name, func in cases.items()}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_last_record(results_file: str) -> dict:
+    """取得結果檔案中的最後一筆結果，沒有的話回傳 None"""
+
+    if not os.path.exists(results_file):
+        return None
+
+    with open(results_file, encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+
+    return json.loads(lines[-1]) if lines else None
+
+
+def print_results(results: dict, last_record: dict = None):
+    last_results = last_record["results"] if last_record else {}
+
+    print(f"{'benchmark':<36}{'min':>10}{'median':>10}{'mean':>10}{'change':>10}")
+
+    for name, result in results.items():
+        change = ""
+
+        if name in last_results:
+            last_median = last_results[name]["median"]
+            change = f"{(result['median'] - last_median) / last_median * 100:+.1f}%"
+
+        print(
+            f"{name:<36}{result['min']:>10.4f}{result['median']:>10.4f}"
+            f"{result['mean']:>10.4f}{change:>10}"
+        )
+
+    if last_record:
+        print(
+            f"change 為和上一次結果 ({last_record['time']}, {last_record['commit']}) 的中位數比較"
+        )
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="離線效能測試")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="執行效能測試 (預設)")
+    run_parser.add_argument("--fixtures", help="錄製的測試資料資料夾，沒有指定時使用合成的資料")
+    run_parser.add_argument("--repeat", type=int, default=5, help="每個測試執行的次數")
+    run_parser.add_argument(
+        "--results",
+        default=os.path.join(BASE_DIR, "data", "benchmark.jsonl"),
+        help="結果檔案，每次執行會附加一行 JSON",
+    )
+    run_parser.add_argument("names", nargs="*", help="只執行指定的測試")
+
+    record_parser = subparsers.add_parser("record", help="錄製真正網站的回應作為測試資料")
+    record_parser.add_argument("fixture_dir", help="測試資料資料夾")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        Fixtures.record(args.fixture_dir)
+        print(f"錄製完成, 共 {len(Fixtures(args.fixture_dir).urls())} 個回應")
+
+        return
+
+    if args.command is None:
+        args = run_parser.parse_args([])
+
+    work_dir = tempfile.mkdtemp()
+
+    try:
+        if args.fixtures:
+            fixtures = Fixtures(args.fixtures)
+
+        else:
+            fixture_dir = os.path.join(work_dir, "fixtures")
+            Fixtures.synthesize(fixture_dir)
+            fixtures = Fixtures(fixture_dir)
+
+        results = Benchmark(fixtures, work_dir, args.repeat).run(args.names)
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    last_record = load_last_record(args.results)
+    print_results(results, last_record)
+
+    record = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "fixtures": args.fixtures or "synthetic",
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,886 +1,5872 @@
+import argparse
+import hashlib
+import heapq
+import math
+import json
+import glob
+import multiprocessing
 import os
+import pickle
+import queue
+import signal
+import sqlite3
+import tempfile
+import threading
+import time
+from array import array
 from collections import defaultdict
-from datetime import datetime, timedelta
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
 
 import requests
 import openpyxl
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import column_index_from_string
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+try:
+    from lxml import html as lxml_html
+
+except ImportError:
+    # 沒有安裝 lxml 時不能使用 lxml 解析器
+    lxml_html = None
+
+
+class HttpDiskCache:
+    """
+    存放在本機硬碟上的 HTTP 回應快取
+
+    以 url 作為 key，依照 url 的前綴設定各個 API 的存活時間 (TTL)，存活時間是 0 的 url 不會存入快取。
+    過期後會帶著 ETag / Last-Modified 重新驗證，伺服器回傳 304 時直接使用快取的內容。
+    快取總大小超過上限時，會刪除最久沒有被使用的資料 (LRU)。
+
+    離線模式 (offline) 下不管是否過期都只會使用快取，可以用來重播某一天的執行過程
+    """
+
+    # 排行和產業類別頁面每天都會變動，只保留到中斷後重新執行 (`Checkpoint`) 時可以重複使用
+    REPLAY_TTL = 30 * 60
+
+    # url 前綴 -> 存活秒數，會使用最長的符合前綴
+    # (每日交易資料的 API 還沒更新時的回應不會存入，參考 `StockPrice._day_all_cache_ttl()`)
+    DEFAULT_TTLS = {
+        "https://www.twse.com.tw/exchangeReport/STOCK_DAY_ALL": 6 * 60 * 60,
+        "https://www.tpex.org.tw/openapi/v1/tpex_mainboard_quotes": 6 * 60 * 60,
+        "https://www.twse.com.tw/exchangeReport/MI_INDEX": 30 * 24 * 60 * 60,
+        "https://www.tpex.org.tw/web/stock/aftertrading/otc_quotes_no1430/": 30 * 24 * 60 * 60,
+        "https://www.twse.com.tw/holidaySchedule/": 7 * 24 * 60 * 60,
+        "https://statementdog.com/": REPLAY_TTL,
+        "https://www.cmoney.tw/": REPLAY_TTL,
+    }
+
+    def __init__(
+        self,
+        cache_dir: str,
+        ttls: dict = None,
+        default_ttl: int = 0,
+        max_size: int = 200 * 1024 * 1024,
+        offline: bool = False,
+    ):
+        """
+
+        cache_dir (str): 快取資料夾路徑
+
+        ttls (dict): url 前綴和存活秒數的對應，沒有給的話使用 `HttpDiskCache.DEFAULT_TTLS`
+
+        default_ttl (int): 沒有符合任何前綴時的存活秒數，0 代表不存入快取
+
+        max_size (int): 快取的總大小上限 (bytes)
+
+        offline (bool): 是否只使用快取，不發出任何請求
+        """
+
+        self.cache_dir = cache_dir
+        self.ttls = ttls if ttls is not None else dict(self.DEFAULT_TTLS)
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.offline = offline
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._index_path = os.path.join(cache_dir, "index.json")
+        self._index = self._load_index()
+        self._lock = threading.Lock()
+
+    def _load_index(self) -> dict:
+        if not os.path.exists(self._index_path):
+            return {}
+
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                return json.load(f)
+
+        except (OSError, ValueError):
+            # 索引檔損毀時當作沒有快取
+            return {}
+
+    def _save_index(self):
+        tmp_path = f"{self._index_path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False)
+
+        os.replace(tmp_path, self._index_path)
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.body")
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def get_ttl(self, url: str) -> int:
+        """取得 url 的存活秒數"""
+
+        prefixes = [prefix for prefix in self.ttls if url.startswith(prefix)]
+
+        if not prefixes:
+            return self.default_ttl
+
+        return self.ttls[max(prefixes, key=len)]
+
+    def get(self, url: str) -> dict:
+        """取得 url 的快取資料，沒有的話回傳 None"""
+
+        key = self._key(url)
+
+        with self._lock:
+            entry = self._index.get(key)
+
+            if entry is None or not os.path.exists(self._body_path(key)):
+                return None
+
+            entry["last_access"] = time.time()
+
+            return dict(entry)
+
+    def entries(self) -> list:
+        """取得所有快取資料的複本"""
+
+        with self._lock:
+            return [dict(entry) for entry in self._index.values()]
+
+    def is_fresh(self, entry: dict) -> bool:
+        """快取資料是否還在存活時間內，存入時有指定存活秒數的話以指定的為準"""
+
+        ttl = entry.get("ttl")
+
+        if ttl is None:
+            ttl = self.get_ttl(entry["url"])
+
+        return time.time() - entry["stored_at"] < ttl
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> dict:
+        """產生重新驗證快取用的 header"""
+
+        headers = {}
+
+        if entry is None:
+            return headers
+
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+    def set(self, url: str, response: requests.Response, ttl: int = None):
+        """將 200 的回應存入快取
+
+        Args:
+            url (str): 請求的 url
+            response (requests.Response): 回應
+            ttl (int): 這筆回應的存活秒數，None 代表依照 url 的前綴決定
+        """
+
+        key = self._key(url)
+        body = response.content
+        now = time.time()
+
+        with self._lock:
+            body_path = self._body_path(key)
+            tmp_path = f"{body_path}.tmp"
+
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+
+            os.replace(tmp_path, body_path)
+
+            self._index[key] = {
+                "url": url,
+                "content_type": response.headers.get("Content-Type"),
+                "encoding": response.encoding,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "stored_at": now,
+                "last_access": now,
+                "size": len(body),
+                "ttl": ttl,
+            }
+
+            self._evict()
+            self._save_index()
+
+    def invalidate(self, url: str):
+        """刪除 url 的快取，下一次請求一定會重新取得"""
+
+        key = self._key(url)
+
+        with self._lock:
+            if self._index.pop(key, None) is None:
+                return
+
+            try:
+                os.remove(self._body_path(key))
+
+            except FileNotFoundError:
+                pass
+
+            self._save_index()
+
+    def touch(self, url: str):
+        """重新驗證成功 (304) 後，重新計算快取的存活時間"""
+
+        key = self._key(url)
+
+        with self._lock:
+            if key in self._index:
+                self._index[key]["stored_at"] = time.time()
+                self._save_index()
+
+    def _evict(self):
+        total_size = sum(entry["size"] for entry in self._index.values())
+
+        if total_size <= self.max_size:
+            return
+
+        for key, entry in sorted(self._index.items(), key=lambda i: i[1]["last_access"]):
+            if total_size <= self.max_size:
+                break
+
+            try:
+                os.remove(self._body_path(key))
+
+            except FileNotFoundError:
+                pass
+
+            total_size -= entry["size"]
+            del self._index[key]
+
+    def to_response(self, entry: dict) -> requests.Response:
+        """將快取資料轉換成 `requests.Response`"""
+
+        with open(self._body_path(self._key(entry["url"])), "rb") as f:
+            body = f.read()
+
+        response = requests.Response()
+        response._content = body
+        response.status_code = 200
+        response.url = entry["url"]
+        response.encoding = entry["encoding"]
+        response.headers = CaseInsensitiveDict()
+
+        if entry["content_type"]:
+            response.headers["Content-Type"] = entry["content_type"]
+
+        return response
+
+
+class Metrics:
+    """
+    執行過程的計量資料
+
+    分成計數器 (counter，i.e: 傳輸的 bytes 數、快取命中次數) 和計時器 (timer，i.e: 請求延遲、解析時間)，
+    每筆資料都可以帶上標籤 (label，i.e: `host="www.twse.com.tw"`)，相同名稱和標籤的資料會累計在一起
+
+    i.e:
+    ```
+    with Metrics.timer("parse_seconds", parser="statementdog"):
+        ...
+
+    Metrics.increment("http_response_bytes", len(response.content), host="statementdog.com")
+    print(Metrics.summary())
+    ```
+
+    設定 `Metrics.LOG_FILE` 後，每筆資料都會以一行 JSON 寫入該檔案
+
+    NOTE: 資料只存在目前的 process 中，process pool 中的工作要用 `snapshot()` 和 `merge()` 帶回來
+    """
+
+    # JSON log 檔案路徑，None 代表不寫入 log
+    LOG_FILE = None
+
+    _lock = threading.Lock()
+
+    # (名稱, 標籤) -> 累計數值
+    _counters = defaultdict(float)
+
+    # (名稱, 標籤) -> [次數, 總秒數, 最大秒數]
+    _timers = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    @classmethod
+    def _log(cls, kind: str, name: str, value: float, labels: dict):
+        if cls.LOG_FILE is None:
+            return
+
+        record = {"time": time.time(), "type": kind, "name": name, "value": value}
+        record.update(labels)
+
+        with cls._lock, open(cls.LOG_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @classmethod
+    def increment(cls, name: str, value: float = 1, **labels):
+        """累加計數器"""
+
+        with cls._lock:
+            cls._counters[cls._key(name, labels)] += value
+
+        cls._log("counter", name, value, labels)
+
+    @classmethod
+    def observe(cls, name: str, seconds: float, **labels):
+        """記錄一次計時器的秒數"""
+
+        key = cls._key(name, labels)
+
+        with cls._lock:
+            timer = cls._timers.setdefault(key, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+        cls._log("timer", name, seconds, labels)
+
+    @classmethod
+    @contextmanager
+    def timer(cls, name: str, **labels):
+        """計算 with 區塊執行的秒數，區塊中發生錯誤時也會記錄"""
+
+        start_time = time.perf_counter()
+
+        try:
+            yield
+
+        finally:
+            cls.observe(name, time.perf_counter() - start_time, **labels)
+
+    @classmethod
+    def reset(cls):
+        """清除所有資料"""
+
+        with cls._lock:
+            cls._counters.clear()
+            cls._timers.clear()
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        """取得目前所有資料的複本，可以傳給其他 process 的 `merge()`"""
+
+        with cls._lock:
+            return {
+                "counters": dict(cls._counters),
+                "timers": {key: list(timer) for key, timer in cls._timers.items()},
+            }
+
+    @classmethod
+    def merge(cls, snapshot: dict):
+        """合併 `snapshot()` 取得的資料"""
+
+        with cls._lock:
+            for key, value in snapshot["counters"].items():
+                cls._counters[key] += value
+
+            for key, (count, total, maximum) in snapshot["timers"].items():
+                timer = cls._timers.setdefault(key, [0, 0.0, 0.0])
+                timer[0] += count
+                timer[1] += total
+                timer[2] = max(timer[2], maximum)
+
+    @staticmethod
+    def _format_labels(labels: tuple) -> str:
+        return ",".join(f"{k}={v}" for k, v in labels)
+
+    @classmethod
+    def summary(cls) -> str:
+        """產生所有資料的摘要表格"""
+
+        snapshot = cls.snapshot()
+        lines = []
+
+        if snapshot["timers"]:
+            lines.append(
+                f"{'timer':<30}{'labels':<40}{'count':>8}{'total':>10}{'avg':>10}{'max':>10}"
+            )
+
+            for (name, labels), (count, total, maximum) in sorted(snapshot["timers"].items()):
+                lines.append(
+                    f"{name:<30}{cls._format_labels(labels):<40}{count:>8}"
+                    f"{total:>10.3f}{total / count:>10.3f}{maximum:>10.3f}"
+                )
+
+        if snapshot["counters"]:
+            lines.append(f"{'counter':<30}{'labels':<40}{'value':>14}")
+
+            for (name, labels), value in sorted(snapshot["counters"].items()):
+                lines.append(f"{name:<30}{cls._format_labels(labels):<40}{value:>14g}")
+
+        return "\n".join(lines)
+
+    @classmethod
+    def to_prometheus(cls) -> str:
+        """
+        轉換成 Prometheus 的文字格式，計時器會轉換成 summary 型態 (`_count`、`_sum`)
+        和記錄最大值的 `_max` gauge
+        """
+
+        snapshot = cls.snapshot()
+        lines = []
+
+        def format_labels(labels: tuple) -> str:
+            if not labels:
+                return ""
+
+            return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+        counter_names = sorted({name for name, _ in snapshot["counters"]})
+
+        for metric_name in counter_names:
+            lines.append(f"# TYPE stock_crawler_{metric_name} counter")
+
+            for (name, labels), value in sorted(snapshot["counters"].items()):
+                if name == metric_name:
+                    lines.append(f"stock_crawler_{name}{format_labels(labels)} {value:g}")
+
+        timer_names = sorted({name for name, _ in snapshot["timers"]})
+
+        for metric_name in timer_names:
+            lines.append(f"# TYPE stock_crawler_{metric_name} summary")
+
+            for (name, labels), (count, total, _) in sorted(snapshot["timers"].items()):
+                if name == metric_name:
+                    lines.append(f"stock_crawler_{name}_count{format_labels(labels)} {count}")
+                    lines.append(f"stock_crawler_{name}_sum{format_labels(labels)} {total:.6f}")
+
+            lines.append(f"# TYPE stock_crawler_{metric_name}_max gauge")
+
+            for (name, labels), (_, _, maximum) in sorted(snapshot["timers"].items()):
+                if name == metric_name:
+                    lines.append(f"stock_crawler_{name}_max{format_labels(labels)} {maximum:.6f}")
+
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def write_prometheus(cls, filename: str):
+        """將 Prometheus 的文字格式寫入檔案 (i.e: 給 node_exporter 的 textfile collector 讀取)"""
+
+        fd, tmp_filename = tempfile.mkstemp(
+            suffix=".prom.tmp", dir=os.path.dirname(os.path.abspath(filename))
+        )
+
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(cls.to_prometheus())
+
+        os.replace(tmp_filename, filename)
+
 
 class BaseRequset:
     """
     封裝 request 模組
+
+    所有的請求都共用同一個 `requests.Session`，會保留和各個 host 的連線 (keep-alive)，
+    並且在連線失敗、被重置或是回傳 429、5xx 時以指數退避 (exponential backoff) 的方式重試
+    """
+
+    # (連線 timeout, 讀取 timeout) 秒數
+    TIMEOUT = (5, 30)
+
+    # 重試次數和退避係數，第 n 次重試前會等待 backoff_factor * (2 ** (n - 1)) 秒
+    RETRY_TOTAL = 3
+    RETRY_BACKOFF_FACTOR = 0.5
+    RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+
+    # 連線池中保留的 host 數量，和每個 host 最多保留的連線數量
+    POOL_CONNECTIONS = 10
+    POOL_MAXSIZE = 10
+
+    # 硬碟快取，設定成 `HttpDiskCache` 後所有請求都會先經過快取
+    CACHE = None
+
+    # url 前綴 -> 實際請求的 url 前綴，會使用最長的符合前綴，快取仍然以原本的 url 作為 key
+    # i.e: {"https://statementdog.com": "http://127.0.0.1:8000/statementdog.com"} (給本機測試伺服器使用)
+    URL_REWRITES = {}
+
+    _session = None
+    _session_lock = threading.Lock()
+
+    @classmethod
+    def configure(
+        cls,
+        timeout: tuple = None,
+        retry_total: int = None,
+        retry_backoff_factor: float = None,
+        pool_maxsize: int = None,
+    ):
+        """設定請求參數，會重新建立 session
+
+        Args:
+            timeout (tuple): (連線 timeout, 讀取 timeout) 秒數
+            retry_total (int): 最多重試次數
+            retry_backoff_factor (float): 指數退避的係數
+            pool_maxsize (int): 每個 host 最多保留的連線數量
+        """
+
+        if timeout is not None:
+            cls.TIMEOUT = timeout
+
+        if retry_total is not None:
+            cls.RETRY_TOTAL = retry_total
+
+        if retry_backoff_factor is not None:
+            cls.RETRY_BACKOFF_FACTOR = retry_backoff_factor
+
+        if pool_maxsize is not None:
+            cls.POOL_MAXSIZE = pool_maxsize
+
+        cls.close()
+
+    @classmethod
+    def _create_session(cls) -> requests.Session:
+        retry = Retry(
+            total=cls.RETRY_TOTAL,
+            backoff_factor=cls.RETRY_BACKOFF_FACTOR,
+            status_forcelist=cls.RETRY_STATUS_FORCELIST,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+        )
+
+        adapter = HTTPAdapter(
+            pool_connections=cls.POOL_CONNECTIONS, pool_maxsize=cls.POOL_MAXSIZE, max_retries=retry
+        )
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        # 有安裝 brotli 時會一併支援 br 壓縮
+        session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+        return session
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        """取得共用的 session，第一次呼叫時才會建立"""
+
+        with cls._session_lock:
+            if cls._session is None:
+                cls._session = cls._create_session()
+
+            return cls._session
+
+    @classmethod
+    def close(cls):
+        """關閉共用的 session 和連線池中的所有連線"""
+
+        with cls._session_lock:
+            if cls._session is not None:
+                cls._session.close()
+                cls._session = None
+
+    @staticmethod
+    def _record_metrics(host: str, response: requests.Response, seconds: float):
+        """記錄請求的延遲、傳輸的 bytes 數和重試次數"""
+
+        Metrics.observe("http_request_seconds", seconds, host=host)
+        Metrics.increment("http_requests", host=host, status=response.status_code)
+        Metrics.increment("http_response_bytes", len(response.content), host=host)
+
+        retries = getattr(response.raw, "retries", None)
+
+        if retries is not None and retries.history:
+            Metrics.increment("http_retries", len(retries.history), host=host)
+
+    @classmethod
+    def _rewrite_url(cls, url: str) -> str:
+        prefixes = [prefix for prefix in cls.URL_REWRITES if url.startswith(prefix)]
+
+        if not prefixes:
+            return url
+
+        prefix = max(prefixes, key=len)
+
+        return cls.URL_REWRITES[prefix] + url[len(prefix) :]
+
+    @classmethod
+    def get_requset(cls, url: str, cache_ttl=None):
+        """
+        發出 GET 請求，有設定 `CACHE` 時會先經過快取
+
+        url (str): 請求的 url
+
+        cache_ttl: 決定回應是否存入快取的函式，傳入回應，回傳存活秒數，回傳 None 代表不存入快取
+        (i.e: 錯誤或資料還沒公布的回應)，沒有給的話所有 200 的回應都依照 url 的前綴決定存活秒數。
+        存活秒數是 0 的回應不會存入快取
+        """
+
+        host = urlsplit(url).netloc
+        cache = cls.CACHE
+        entry = cache.get(url) if cache is not None else None
+
+        if entry is not None and (cache.offline or cache.is_fresh(entry)):
+            Metrics.increment("http_cache_hits", host=host)
+
+            return cache.to_response(entry)
+
+        if cache is not None and cache.offline:
+            raise RuntimeError(f"Offline mode, no cached response for: [{url}]")
+
+        start_time = time.perf_counter()
+
+        response = cls.get_session().get(
+            cls._rewrite_url(url),
+            timeout=cls.TIMEOUT,
+            headers=HttpDiskCache.conditional_headers(entry),
+        )
+
+        cls._record_metrics(host, response, time.perf_counter() - start_time)
+
+        if response.status_code == 304 and entry is not None:
+            cache.touch(url)
+            Metrics.increment("http_cache_revalidated", host=host)
+
+            return cache.to_response(entry)
+
+        if response.status_code != 200:
+            raise RuntimeError(f"Response error, status code: [{response.status_code}]")
+
+        if cache is None:
+            return response
+
+        if cache_ttl is None:
+            if cache.get_ttl(url) > 0:
+                cache.set(url, response)
+
+        else:
+            ttl = cache_ttl(response)
+
+            if ttl:
+                cache.set(url, response, ttl)
+
+        return response
+
+
+class HostLimiter:
+    """
+    限制對同一個 host 同時進行中的請求數量，避免並行爬取時對網站造成太大的負擔
+    """
+
+    def __init__(self, max_per_host: int = 4):
+        """
+
+        max_per_host (int): 每個 host 同時進行中的請求數量上限
+        """
+
+        self.max_per_host = max_per_host
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _get_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+
+            return self._semaphores[host]
+
+    @contextmanager
+    def limit(self, url: str):
+        """在 with 區塊中佔用該 url 所屬 host 的一個名額"""
+
+        with self._get_semaphore(url):
+            yield
+
+
+class RateLimiter:
+    """
+    限制對同一個 host 每秒發出的請求數量，請求之間至少間隔 `1 / requests_per_second` 秒
+
+    證交所、櫃買中心短時間內請求太多次會暫時封鎖 IP，大量抓取歷史資料時要控制請求的頻率
+    """
+
+    def __init__(self, requests_per_second: float = 0.5):
+        """
+
+        requests_per_second (float): 每個 host 每秒的請求數量上限
+        """
+
+        self.interval = 1 / requests_per_second
+        self._next_times = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        """等待到可以對該 url 所屬的 host 發出下一個請求"""
+
+        host = urlsplit(url).netloc
+
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_times.get(host, now))
+            self._next_times[host] = request_time + self.interval
+
+        if request_time > now:
+            time.sleep(request_time - now)
+
+
+class MemoCache:
+    """
+    執行期間的記憶快取，相同的 key 只會計算一次
+
+    多個 thread 同時要求同一個 key 時，只有第一個會實際計算，其他的會等待它的結果。
+    計算失敗時不會快取，下一次要求會重新計算
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, func):
+        """取得 key 的快取結果，如果沒有的話就呼叫 func() 計算並快取
+
+        Args:
+            key: 快取的 key
+            func: 沒有快取時用來計算結果的函式
+        """
+
+        with self._lock:
+            future = self._futures.get(key)
+            is_owner = future is None
+
+            if is_owner:
+                future = Future()
+                self._futures[key] = future
+                self.misses += 1
+
+            else:
+                self.hits += 1
+
+        if is_owner:
+            try:
+                future.set_result(func())
+
+            except BaseException as e:
+                with self._lock:
+                    self._futures.pop(key, None)
+
+                future.set_exception(e)
+
+        return future.result()
+
+    def clear(self):
+        """清除所有快取和計數"""
+
+        with self._lock:
+            self._futures.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """回傳命中和未命中的次數 i.e: {"hits" : 3, "misses" : 17}"""
+
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class RetryLaterError(RuntimeError):
+    """
+    幾秒內重試也不會成功的錯誤 (i.e: 交易所還沒公布當天的資料)
+
+    `Checkpoint` 不會立刻重試，由呼叫端 (i.e: `DailyDaemon`) 等待一段時間後再重新執行
+    """
+
+
+class Checkpoint:
+    """
+    可以中斷後繼續執行的工作紀錄
+
+    每個工作以名稱識別 (i.e: "statementdog/ranking/1day")，完成後結果會以 pickle 附加到紀錄檔中。
+    重新執行時已完成的工作直接回傳紀錄的結果，只有還沒完成或失敗的工作會實際執行。
+    工作失敗時會以指數退避的方式重試，最多重試 `retries` 次 (`RetryLaterError` 不會重試)
+
+    紀錄檔是只會附加的檔案，程式在寫入途中中斷時，只會遺失最後一筆寫到一半的紀錄
+    """
+
+    # 第 n 次重試前會等待 RETRY_DELAY * (2 ** (n - 1)) 秒
+    RETRY_DELAY = 1
+
+    def __init__(self, filename: str, retries: int = 2):
+        """
+
+        filename (str): 紀錄檔路徑
+
+        retries (int): 每個工作失敗後最多重試的次數
+        """
+
+        self.filename = filename
+        self.retries = retries
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+
+        # 工作名稱 -> 結果
+        self.results = self._load()
+
+        # 從紀錄檔讀取的工作名稱
+        self.restored = set(self.results)
+
+    def _load(self) -> dict:
+        results = {}
+
+        if not os.path.exists(self.filename):
+            return results
+
+        with open(self.filename, "rb+") as f:
+            while True:
+                offset = f.tell()
+
+                try:
+                    name, result = pickle.load(f)
+
+                except EOFError:
+                    break
+
+                except (pickle.UnpicklingError, ValueError, TypeError):
+                    # 最後一筆紀錄寫到一半，刪除它避免之後附加的紀錄讀不到
+                    f.truncate(offset)
+                    break
+
+                results[name] = result
+
+            # 讀到一半中斷 (EOFError) 的紀錄也一併刪除
+            f.truncate(offset)
+
+        return results
+
+    def _append(self, name: str, result):
+        data = pickle.dumps((name, result), protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            self.results[name] = result
+
+            with open(self.filename, "ab") as f:
+                f.write(data)
+
+    def is_done(self, name: str) -> bool:
+        with self._lock:
+            return name in self.results
+
+    def run(self, name: str, func, *args):
+        """
+        執行工作，已經完成的工作直接回傳紀錄的結果
+
+        Args:
+            name (str): 工作名稱
+            func (callable): 要執行的函式，結果必須可以 pickle
+            *args: 傳給 `func` 的參數
+
+        重試 `retries` 次後還是失敗時，會拋出最後一次的錯誤，`RetryLaterError` 會直接拋出
+        """
+
+        with self._lock:
+            if name in self.results:
+                Metrics.increment("checkpoint_restored_tasks")
+
+                return self.results[name]
+
+        for attempt in range(self.retries + 1):
+            try:
+                result = func(*args)
+                break
+
+            except Exception as e:
+                if attempt == self.retries or isinstance(e, RetryLaterError):
+                    Metrics.increment("checkpoint_failed_tasks")
+                    raise
+
+                Metrics.increment("checkpoint_task_retries")
+                time.sleep(self.RETRY_DELAY * (2**attempt))
+
+        self._append(name, result)
+
+        return result
+
+    def clear(self):
+        """清除所有紀錄，刪除紀錄檔"""
+
+        with self._lock:
+            self.results.clear()
+            self.restored.clear()
+
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+
+
+class GroupMembershipIndex:
+    """
+    產業類別成分股的反向索引 (產業類別 -> 成分股、股票 -> 產業類別)，以 JSON 格式存放在本機
+
+    成分股很少變動，索引中的資料還沒過期時，每日執行只要從索引中取出成分股，
+    再搭配當天的交易資料選出前三檔，不需要再爬取產業類別頁面。
+    重新爬取頁面時會比對成分股的 hash (頁面中有每天變動的股價，不能比對整個頁面)，
+    成分股沒有變動時只會重新計算存活時間
+
+    NOTE: 成分股的順序是最後一次爬取頁面時頁面上的順序，只用來在排序依據相同時決定先後，
+    選出前三檔時會依照當天的漲跌幅 (財報狗) 或成交股數 (CMoney) 重新排序
+    (參考 `_BaseCrawler._select_traded_stocks()`)
+
+    檔案格式:
+    ```
+    {
+    "groups" : {
+        "https://statementdog.com/tags/..." : {
+            "source" : "statementdog", "name" : "砷化鎵", "members" : [["3105", "穩懋"], ...],
+            "hash" : "...", "updated_at" : 1694160000.0, "checked_at" : 1694160000.0
+        }, ...
+    },
+    "stocks" : {"3105" : ["https://statementdog.com/tags/...", ...], ...}
+    }
+    ```
+    """
+
+    def __init__(self, filename: str, max_age_days: float = 7):
+        """
+
+        filename (str): 索引檔案路徑
+
+        max_age_days (float): 頁面最後一次確認後，索引中的資料可以使用的天數
+        """
+
+        self.filename = filename
+        self.max_age = max_age_days * 24 * 60 * 60
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        # 這次執行中成分股有變動的頁面
+        self.changed = set()
+
+        self._groups = self._load()
+        self._stocks = defaultdict(set)
+
+        for url, entry in self._groups.items():
+            for code, _ in entry["members"]:
+                self._stocks[code].add(url)
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.filename):
+            return {}
+
+        try:
+            with open(self.filename, encoding="utf-8") as f:
+                return json.load(f)["groups"]
+
+        except (OSError, ValueError, KeyError):
+            # 索引檔損毀時當作沒有索引
+            return {}
+
+    def save(self):
+        """有變動時將索引寫入檔案"""
+
+        with self._lock:
+            if not self._dirty:
+                return
+
+            data = {
+                "groups": self._groups,
+                "stocks": {code: sorted(urls) for code, urls in self._stocks.items() if urls},
+            }
+
+            tmp_path = f"{self.filename}.tmp"
+
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+
+            os.replace(tmp_path, self.filename)
+            self._dirty = False
+
+    def is_fresh(self, url: str) -> bool:
+        """索引中是否有這個頁面，並且還在存活時間內"""
+
+        with self._lock:
+            entry = self._groups.get(url)
+
+            return entry is not None and time.time() - entry["checked_at"] < self.max_age
+
+    @staticmethod
+    def members_hash(members: list) -> str:
+        """成分股的 hash，和頁面上的順序無關"""
+
+        codes = sorted(code for code, _ in members)
+
+        return hashlib.sha256(json.dumps(codes).encode("utf-8")).hexdigest()
+
+    def has_hash(self, url: str, members_hash: str) -> bool:
+        with self._lock:
+            entry = self._groups.get(url)
+
+            return entry is not None and entry["hash"] == members_hash
+
+    def touch(self, url: str):
+        """成分股沒有變動，重新計算存活時間"""
+
+        with self._lock:
+            self._groups[url]["checked_at"] = time.time()
+            self._dirty = True
+
+    def update(self, source: str, url: str, name: str, members: list, members_hash: str):
+        """更新頁面的成分股
+
+        Args:
+            source (str): 資料來源 ("statementdog" 或 "cmoney")
+            url (str): 產業類別頁面 url
+            name (str): 產業類別名稱
+            members (list): 依照頁面順序的成分股 i.e: [["3105", "穩懋"], ...]
+            members_hash (str): 成分股的 hash，參考 `members_hash()`
+        """
+
+        now = time.time()
+
+        with self._lock:
+            old_entry = self._groups.get(url)
+
+            if old_entry is not None:
+                for code, _ in old_entry["members"]:
+                    self._stocks[code].discard(url)
+
+            self._groups[url] = {
+                "source": source,
+                "name": name,
+                "members": [list(member) for member in members],
+                "hash": members_hash,
+                "updated_at": now,
+                "checked_at": now,
+            }
+
+            for code, _ in members:
+                self._stocks[code].add(url)
+
+            self.changed.add(url)
+            self._dirty = True
+
+    def group_members(self, source: str = None) -> dict:
+        """
+        取得所有產業類別的成分股代碼，可以只取得指定來源的產業類別
+
+        回傳格式:
+        ```
+        {"砷化鎵" : ["3105", "2455", ...], ...}
+        ```
+        """
+
+        with self._lock:
+            return {
+                entry["name"]: [code for code, _ in entry["members"]]
+                for entry in self._groups.values()
+                if source is None or entry["source"] == source
+            }
+
+    def members_of(self, url: str) -> list:
+        """取得頁面的成分股 (依照頁面順序)，沒有的話回傳 None"""
+
+        with self._lock:
+            entry = self._groups.get(url)
+
+            return [list(member) for member in entry["members"]] if entry is not None else None
+
+    def groups_of(self, code: str) -> list:
+        """
+        取得股票所屬的產業類別
+
+        回傳格式:
+        ```
+        [{"source" : "statementdog", "name" : "砷化鎵", "url" : "https://..."}, ...]
+        ```
+        """
+
+        with self._lock:
+            return [
+                {
+                    "source": self._groups[url]["source"],
+                    "name": self._groups[url]["name"],
+                    "url": url,
+                }
+                for url in sorted(self._stocks.get(code, ()))
+            ]
+
+
+class _BaseCrawler:
+    """
+    針對 CMoney 和 財報狗爬蟲的 interface
+    """
+
+    # 資料來源名稱，也是 `Checkpoint` 中工作名稱的前綴
+    SOURCE = None
+
+    # 每個產業類別取前幾檔股票
+    STOCK_NUMBER = 3
+
+    # 產業類別頁面上前幾檔股票的排序依據，從成分股索引選股時依照這個欄位重新排序
+    # ("change": 當天的漲跌幅, "volume": 當天的成交股數)
+    TOP_STOCK_ORDER = "change"
+
+    def __init__(self, max_workers: int = 1, max_per_host: int = 4):
+        """
+
+        max_workers (int): 同時進行中的爬取工作數量上限
+
+        max_per_host (int): 對同一個 host 同時進行中的請求數量上限
+        """
+
+        self.max_workers = max_workers
+        self.host_limiter = HostLimiter(max_per_host)
+
+        # 同一個產業類別常常同時出現在不同天數的排行中，同一次執行中每個頁面只爬一次
+        self.group_page_cache = MemoCache()
+
+        # 設定成 `Checkpoint` 後，排行和產業類別頁面都會是可以中斷後繼續、失敗時重試的工作
+        self.checkpoint = None
+
+        # 設定成 `GroupMembershipIndex` 後，索引中還沒過期的產業類別不會再爬取頁面
+        self.membership_index = None
+
+    def _run_task(self, name: str, func, *args):
+        """執行 `func(*args)`，有設定 `self.checkpoint` 時以 `Checkpoint` 執行"""
+
+        if self.checkpoint is None:
+            return func(*args)
+
+        return self.checkpoint.run(f"{self.SOURCE}/{name}", func, *args)
+
+    def _get_group_data(self) -> list:
+        """
+        取得產業類別的資料
+
+        回傳格式:
+        ```
+        [
+            {"name" : "IC-設計", "url" : "http...."},...
+        ]
+        ```
+        """
+
+        raise NotImplementedError
+
+    def _get_increase_reduce_group_data(self, day_type_arg: str = "1day") -> dict:
+        """
+        取得增加、減少的產業類別的資料
+
+        Args:
+
+        day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+
+        回傳格式:
+        ```
+        {
+        "increase" : [{"name" : "砷化鎵", "url" : "http...."}, ...],
+        "reduce" : [{"name" : "家電", "url" : "http...."}, ...]
+        }
+        ```
+        """
+
+        raise NotImplementedError
+
+    def _get_top_3_stock_of_group_data(self, url: str, group_name: str) -> dict:
+        """
+        取得產業類別的前三名股票資料
+
+        Args:
+
+        url (str): 產業類別的股票詳細頁面 url
+
+        group_name (str): 產業類別名稱
+
+        回傳格式:
+        ```
+        {
+        "group" : "砷化鎵",
+        "data" : [["3105", "穩懋"], ["2455", "全新"], ["8086", "宏捷科"]]
+        }
+        ```
+        """
+
+        raise NotImplementedError
+
+    def _get_all_group_data(self, day_type_arg: str = "1day") -> list:
+        """
+        取得排行中所有的產業類別資料，給完整更新成分股索引使用
+
+        回傳格式和 `_get_group_data()` 相同
+        """
+
+        raise NotImplementedError
+
+    def _fetch_group_page(self, url: str) -> str:
+        """取得產業類別頁面的 HTML"""
+
+        raise NotImplementedError
+
+    def _parse_group_members(self, html: str, url: str) -> list:
+        """
+        解析產業類別頁面的 HTML，取得所有成分股 (依照頁面順序)
+
+        回傳格式: [["3105", "穩懋"], ...]
+        """
+
+        raise NotImplementedError
+
+    def _load_group_members(self, url: str, group_name: str) -> list:
+        """
+        爬取產業類別頁面的所有成分股並更新成分股索引，成分股沒有變動時只會重新計算存活時間
+
+        只有在完整更新索引，或是索引中沒有這個頁面、已經過期時才會呼叫
+
+        回傳格式和 `_parse_group_members()` 相同
+        """
+
+        index = self.membership_index
+        members = self._parse_group_members(self._fetch_group_page(url), url)
+        members_hash = index.members_hash(members)
+
+        if index.has_hash(url, members_hash):
+            index.touch(url)
+
+        else:
+            index.update(self.SOURCE, url, group_name, members, members_hash)
+
+        return members
+
+    def refresh_membership_index(self, day_type_args: list) -> int:
+        """
+        完整爬取排行中所有的產業類別頁面，更新成分股索引
+
+        Args:
+
+        day_type_args (list): 要列舉產業類別的天數參數 i.e: ["1day", "1week"]
+
+        回傳成分股有變動的頁面數量
+        """
+
+        index = self.membership_index
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            groups = {}
+
+            for group_list in executor.map(self._get_all_group_data, day_type_args):
+                for group in group_list:
+                    groups.setdefault(group["url"], group["name"])
+
+            def refresh(url: str, group_name: str):
+                with self.host_limiter.limit(url):
+                    self._run_task(f"index/{url}", self._load_group_members, url, group_name)
+
+            # 索引可能同時被其他爬蟲更新，只計算這個爬蟲的頁面
+            changed_before = index.changed & groups.keys()
+
+            futures = [executor.submit(refresh, url, name) for url, name in groups.items()]
+
+            for future in futures:
+                future.result()
+
+        return len((index.changed & groups.keys()) - changed_before)
+
+    def _get_data(self, day_type_arg: str = "1day") -> dict:
+        """
+        取得增加、減少的產業類別資料，和股票的資料
+
+        Args:
+
+        day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+
+        回傳格式:
+        ```
+        {
+        "increase" : [
+            {
+                "group" : "砷化鎵",
+                "data" : [["3105" : "穩懋"], ...]
+            }, ...],
+        "reduce" : [
+            {
+                "group" : "LCD塑膠框",
+                "data" : [["2371" : "大同"]. ...]
+            }, ...]
+        }
+        ```
+        """
+
+        return self._get_datas([day_type_arg])[day_type_arg]
+
+    def _get_cached_top_3_stock_of_group_data(self, url: str, group_name: str) -> dict:
+        """
+        有快取的 `_get_top_3_stock_of_group_data`，同一個 url 只會爬取、解析一次，
+        實際爬取時會受到 host 的並行數量限制
+
+        回傳格式和 `_get_top_3_stock_of_group_data()` 相同
+        """
+
+        index = self.membership_index
+
+        def fetch():
+            with self.host_limiter.limit(url):
+                if index is None:
+                    return self._get_top_3_stock_of_group_data(url, group_name)
+
+                Metrics.increment("membership_index_misses", source=self.SOURCE)
+                members = self._load_group_members(url, group_name)
+
+                return {"group": group_name, "candidates": members}
+
+        if index is not None and index.is_fresh(url):
+            Metrics.increment("membership_index_hits", source=self.SOURCE)
+            data = {"group": group_name, "candidates": index.members_of(url)}
+
+        else:
+            data = self.group_page_cache.get_or_compute(
+                url, lambda: self._run_task(f"group/{url}", fetch)
+            )
+
+        if "candidates" not in data:
+            return {"group": group_name, "data": [list(stock) for stock in data["data"]]}
+
+        # 從索引取得時，`data` 先放前三檔，和交易資料合併時再從 `candidates` 依照 `order_by` 選出當天有成交的股票
+        candidates = [list(stock) for stock in data["candidates"]]
+
+        return {
+            "group": group_name,
+            "data": candidates[: self.STOCK_NUMBER],
+            "candidates": candidates,
+            "order_by": self.TOP_STOCK_ORDER,
+        }
+
+    def _get_datas(self, day_type_args: list) -> dict:
+        """
+        一次取得多個天數參數的增加、減少的產業類別資料，和股票的資料
+
+        所有天數參數的排行資料和產業類別頁面會同時丟進同一個 thread pool 中爬取
+        (最多同時 `self.max_workers` 個)，最後再依照原本的增加、減少順序組回來
+
+        Args:
+
+        day_type_args (list): 指定天數參數的 list i.e: ["1day", "1week"]
+
+        回傳格式:
+        ```
+        {
+        "1day" : {"increase" : [...], "reduce" : [...]},
+        "1week" : {"increase" : [...], "reduce" : [...]}
+        }
+        ```
+        每個天數參數的資料格式和 `_get_data()` 相同
+        """
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            group_futures = {
+                day_type_arg: executor.submit(
+                    self._run_task,
+                    f"ranking/{day_type_arg}",
+                    self._get_increase_reduce_group_data,
+                    day_type_arg,
+                )
+                for day_type_arg in day_type_args
+            }
+
+            stock_futures = {}
+
+            for day_type_arg, group_future in group_futures.items():
+                group_data = group_future.result()
+
+                stock_futures[day_type_arg] = {
+                    k: [
+                        executor.submit(
+                            self._get_cached_top_3_stock_of_group_data, group["url"], group["name"]
+                        )
+                        for group in group_data[k]
+                    ]
+                    for k in group_data
+                }
+
+            result = {}
+
+            for day_type_arg, futures in stock_futures.items():
+                result[day_type_arg] = defaultdict(list)
+
+                for k in futures:
+                    result[day_type_arg][k] = [future.result() for future in futures[k]]
+
+        return result
+
+    @staticmethod
+    def _select_traded_stocks(
+        candidates: list, price_data: "PriceTable", previous_closes: dict, order_by: str = "change"
+    ) -> list:
+        """
+        從成分股中選出當天有成交的前幾檔股票 (和產業類別頁面上的排序相同)，
+        都沒有成交時使用原本的前幾檔
+
+        order_by (str): "change" 依照漲幅由大到小，漲幅以前一個交易日的收盤價 (`previous_closes`) 計算，
+        沒有的話以當天的開盤價計算；"volume" 依照成交股數由大到小。相同時依照成分股原本的順序
+        """
+
+        ranked = []
+
+        for position, stock in enumerate(candidates):
+            stock_price = price_data.get(stock[0])
+
+            if not stock_price or stock_price["cloesing_price"] is None:
+                continue
+
+            if order_by == "volume":
+                ranked.append((-(stock_price.get("volume") or 0.0), position, stock))
+
+                continue
+
+            base_price = previous_closes.get(stock[0]) or stock_price["opening_price"]
+            change = stock_price["cloesing_price"] / base_price - 1 if base_price else 0.0
+
+            ranked.append((-change, position, stock))
+
+        result = [stock for _, _, stock in heapq.nsmallest(_BaseCrawler.STOCK_NUMBER, ranked)]
+
+        return result or candidates[: _BaseCrawler.STOCK_NUMBER]
+
+    @staticmethod
+    def _merge_price_data(
+        meta_data: dict, price_data: "PriceTable", previous_closes: dict = None
+    ) -> dict:
+        """
+        將 `_get_data()` 取得的資料和開高低收資料合併
+
+        previous_closes (dict): 從成分股索引選股時計算漲幅用的前一個交易日收盤價 i.e: {"3105" : 144.0}，
+        None 代表從歷史資料庫讀取 (`StockPrice.previous_closes()`)
+
+        回傳格式和 `get_data()` 相同
+        """
+
+        result = defaultdict(list)
+
+        if previous_closes is None:
+            candidate_codes = {
+                stock[0]
+                for k in meta_data
+                for group_data in meta_data[k]
+                for stock in group_data.get("candidates") or ()
+            }
+
+            previous_closes = {}
+
+            if candidate_codes and StockPrice.TRADING_DATE is not None:
+                previous_closes = StockPrice.previous_closes(
+                    candidate_codes, datetime.strptime(StockPrice.TRADING_DATE, "%Y%m%d").date()
+                )
+
+        for k in meta_data:
+            for group_data in meta_data[k]:
+                tmp = {}
+                tmp["group"] = group_data["group"]
+                tmp["data"] = []
+
+                stocks = group_data["data"]
+
+                if group_data.get("candidates"):
+                    stocks = _BaseCrawler._select_traded_stocks(
+                        group_data["candidates"],
+                        price_data,
+                        previous_closes,
+                        group_data.get("order_by", "change"),
+                    )
+
+                for stock in stocks:
+                    stock_price = price_data.get(stock[0])
+
+                    if stock_price:
+                        tmp["data"].append(stock_price)
+
+                    else:
+                        # 如果找不到股票資料
+                        tmp["data"].append(
+                            {
+                                "code": stock[0],
+                                "name": stock[1],
+                                "opening_price": None,
+                                "highest_price": None,
+                                "lowest_price": None,
+                                "cloesing_price": None,
+                                "volume": None,
+                            }
+                        )
+
+                result[k].append(tmp)
+
+        return result
+
+    def get_data(self, price_data: "PriceTable", day_type_arg: str = "1day") -> dict:
+        """
+        取得最終處裡完的資料。
+        換句話說，就是取得增加、減少的產業資料和股票名稱、代碼，和開高低收資料
+
+        Args:
+
+        price_data (PriceTable): 上市、上櫃公司股票交易資料，i.e: `StockPrice.get_market_day_all()`
+
+        data_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+
+        回傳格式:
+        ```
+        {
+        "increase" : [
+            {"group" : "砷化鎵", "data" : [
+                {"code" : "3105", "name" : "穩懋", "opening_price" : 101.1, "highest_price" : 120.0, "lowest_price" : 100.0, "cloesing_price" : 102.2}, ...]
+            }, ...],
+        "reduce: [....]
+        }
+        ```
+        """
+
+        meta_data = self._get_data(day_type_arg)
+
+        return self._merge_price_data(meta_data, price_data)
+
+    def get_datas(self, price_data: "PriceTable", day_type_args: list) -> dict:
+        """
+        一次取得多個天數參數的最終處裡完的資料，會並行爬取所有天數參數的資料
+
+        Args:
+
+        price_data (PriceTable): 上市、上櫃公司股票交易資料，i.e: `StockPrice.get_market_day_all()`
+
+        day_type_args (list): 指定天數參數的 list i.e: ["1day", "1week", "1month", "3months"]
+
+        回傳格式:
+        ```
+        {
+        "1day" : <get_data() 的回傳格式>,
+        "1week" : <get_data() 的回傳格式>, ...
+        }
+        ```
+        """
+
+        meta_datas = self._get_datas(day_type_args)
+
+        return {
+            day_type_arg: self._merge_price_data(meta_data, price_data)
+            for day_type_arg, meta_data in meta_datas.items()
+        }
+
+
+class _TickerNameParser(HTMLParser):
+    """
+    財報狗產業類別頁面的串流解析器
+
+    只取出 `tbody#stock-tags-list-body` 中 `td.ticker-name` 儲存格的文字，
+    取得 `limit` 個儲存格後就停止解析 (None 代表全部)，不會建立整個頁面的樹狀結構
+    """
+
+    class _Stop(Exception):
+        pass
+
+    def __init__(self, limit: int):
+        super().__init__()
+
+        self.limit = limit
+        self.found_tbody = False
+        self.cells = []
+
+        self._in_tbody = False
+        self._tbody_depth = 0
+        self._cell_parts = None
+        self._cell_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: list):
+        attrs = dict(attrs)
+
+        if not self._in_tbody:
+            if tag == "tbody" and attrs.get("id") == "stock-tags-list-body":
+                self._in_tbody = True
+                self.found_tbody = True
+
+            return
+
+        if tag == "tbody":
+            self._tbody_depth += 1
+
+        if self._cell_parts is not None:
+            if tag == "td":
+                self._cell_depth += 1
+
+            return
+
+        classes = (attrs.get("class") or "").split()
+
+        if tag == "td" and "stock-tags-list-item" in classes and "ticker-name" in classes:
+            self._cell_parts = []
+            self._cell_depth = 0
+
+    def handle_endtag(self, tag: str):
+        if not self._in_tbody:
+            return
+
+        if self._cell_parts is not None and tag == "td":
+            if self._cell_depth:
+                self._cell_depth -= 1
+                return
+
+            self.cells.append("".join(self._cell_parts))
+            self._cell_parts = None
+
+            if self.limit is not None and len(self.cells) >= self.limit:
+                raise self._Stop
+
+        elif tag == "tbody":
+            if self._tbody_depth:
+                self._tbody_depth -= 1
+
+            else:
+                self._in_tbody = False
+                raise self._Stop
+
+    def handle_data(self, data: str):
+        if self._cell_parts is not None:
+            self._cell_parts.append(data)
+
+    def parse(self, html: str) -> list:
+        """解析 HTML，回傳儲存格的文字，找不到 `tbody` 時回傳 None"""
+
+        try:
+            self.feed(html)
+            self.close()
+
+        except self._Stop:
+            pass
+
+        return self.cells if self.found_tbody else None
+
+
+class StatementDogCrawler(_BaseCrawler):
+    """
+    財報狗爬蟲
+
+    使用 API 和解析 HTML 獲得資料
+
+    產業類別頁面的解析器可以選擇:
+    - "auto": 有安裝 lxml 時使用 "lxml"，否則使用 "stream" (預設)
+    - "stream": 標準函式庫的串流解析器，取得前三檔股票後就停止解析
+    - "lxml": 使用 lxml 解析整個頁面，需要另外安裝 lxml
+    - "bs4": 使用 BeautifulSoup 的 html.parser 解析整個頁面
+    """
+
+    SOURCE = "statementdog"
+
+    PARSERS = ("auto", "stream", "lxml", "bs4")
+
+    def __init__(self, max_workers: int = 8, max_per_host: int = 4, parser: str = "auto"):
+        """
+
+        max_workers (int): 同時進行中的爬取工作數量上限
+
+        max_per_host (int): 對同一個 host 同時進行中的請求數量上限
+
+        parser (str): 產業類別頁面的解析器 ("auto", "stream", "lxml", "bs4")
+        """
+
+        if parser not in self.PARSERS:
+            raise ValueError(f"Invalid value for 'parser': [{parser}]")
+
+        if parser == "auto":
+            parser = "lxml" if lxml_html is not None else "stream"
+
+        if parser == "lxml" and lxml_html is None:
+            raise ValueError("lxml is not installed, can not use 'lxml' parser")
+
+        super().__init__(max_workers, max_per_host)
+
+        self.parser = parser
+
+    @staticmethod
+    def _split_code_name(text: str) -> list:
+        """將儲存格的文字 (i.e: "3105 穩懋") 拆成 [代碼, 名稱]"""
+
+        code_name = text.replace("\n", "").split(" ")
+
+        # 針對像 [1111, "iphone", "12"] 這樣的資料進行處理
+        if len(code_name) > 2:
+            code_name = [code_name[0], "".join(code_name[1:])]
+
+        return code_name
+
+    @staticmethod
+    def _find_ticker_names_by_stream(html: str, limit: int) -> list:
+        return _TickerNameParser(limit).parse(html)
+
+    @staticmethod
+    def _find_ticker_names_by_lxml(html: str, limit: int) -> list:
+        tree = lxml_html.fromstring(html)
+        tbody = tree.xpath('//tbody[@id="stock-tags-list-body"]')
+
+        if not tbody:
+            return None
+
+        items = tbody[0].xpath(
+            './/td[contains(concat(" ", normalize-space(@class), " "), " stock-tags-list-item ")'
+            ' and contains(concat(" ", normalize-space(@class), " "), " ticker-name ")]'
+        )
+
+        return [item.text_content() for item in items[:limit]]
+
+    @staticmethod
+    def _find_ticker_names_by_bs4(html: str, limit: int) -> list:
+        soup = BeautifulSoup(html, "html.parser")
+
+        tbody = soup.find("tbody", id="stock-tags-list-body")
+
+        if tbody is None:
+            return None
+
+        items = tbody.find_all("td", class_="stock-tags-list-item ticker-name", limit=limit)
+
+        return [item.text for item in items]
+
+    def _parse_top_3_stock_data(self, html: str, url: str, limit: int = 3) -> list:
+        """
+        以選擇的解析器解析產業類別頁面的 HTML，取得前三名股票的代碼和名稱
+
+        limit (int): 取前幾檔股票，None 代表全部
+
+        回傳格式: [["3105", "穩懋"], ...]
+        """
+
+        find_ticker_names = {
+            "stream": self._find_ticker_names_by_stream,
+            "lxml": self._find_ticker_names_by_lxml,
+            "bs4": self._find_ticker_names_by_bs4,
+        }[self.parser]
+
+        with Metrics.timer("parse_seconds", parser=f"statementdog_group_{self.parser}"):
+            texts = find_ticker_names(html, limit)
+
+        if texts is None:
+            raise RuntimeError(f"Error: 找不到股票列表, url: {url}")
+
+        return [self._split_code_name(text) for text in texts]
+
+    def _get_trend_data(self, day_type_arg: str) -> list:
+        response = BaseRequset.get_requset(
+            f"https://statementdog.com/api/v1/market-trend/tw/{day_type_arg}"
+        )
+
+        datas = response.json()["data"]
+
+        if not datas:
+            raise RuntimeError(f"Error: 取得財報狗 [{day_type_arg}] 的增加減少產業族群資料時發生錯誤.")
+
+        return datas
+
+    def _get_all_group_data(self, day_type_arg: str = "1day") -> list:
+        return [{"name": d["name"], "url": d["url"]} for d in self._get_trend_data(day_type_arg)]
+
+    def _fetch_group_page(self, url: str) -> str:
+        return BaseRequset.get_requset(f"{url}?country=tw").text
+
+    def _parse_group_members(self, html: str, url: str) -> list:
+        return self._parse_top_3_stock_data(html, url, limit=None)
+
+    def _get_increase_reduce_group_data(self, day_type_arg: str = "1day") -> dict:
+        datas = self._get_trend_data(day_type_arg)
+
+        sorted_datas = sorted(datas, key=lambda i: i["diff_percentage"], reverse=True)
+
+        get_group_data = lambda s: [{"name": d["name"], "url": d["url"]} for d in sorted_datas[s]]
+
+        increase = get_group_data(slice(0, 5))
+
+        reduce = get_group_data(slice(-1, -6, -1))
+
+        result = {}
+
+        result["increase"] = increase
+        result["reduce"] = reduce
+
+        return result
+
+    def _get_top_3_stock_of_group_data(self, url: str, group_name: str) -> dict:
+        response = BaseRequset.get_requset(f"{url}?country=tw")
+
+        stock_list = self._parse_top_3_stock_data(response.text, url, self.STOCK_NUMBER)
+
+        result = {}
+
+        result["group"] = group_name
+        result["data"] = stock_list
+
+        return result
+
+
+class DriverPool:
+    """
+    瀏覽器 driver 池
+
+    最多同時啟動 `size` 個 driver，需要時才會啟動，用完後放回池中給下一個工作使用。
+    driver 當掉 (非 timeout 的 `WebDriverException`) 時會被關閉並從池中移除，之後需要時再重新啟動
+    """
+
+    def __init__(self, size: int, driver_factory):
+        """
+
+        size (int): driver 數量上限
+
+        driver_factory: 用來啟動新 driver 的函式
+        """
+
+        self.size = size
+        self._driver_factory = driver_factory
+
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def _get(self) -> webdriver.Chrome:
+        while True:
+            try:
+                return self._idle.get_nowait()
+
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                # 先佔用名額，避免多個 thread 同時啟動超過上限的 driver
+                is_creating = len(self._drivers) < self.size
+
+                if is_creating:
+                    self._drivers.append(None)
+
+            if is_creating:
+                break
+
+            # 定期醒來檢查，避免 driver 當掉被移除後一直等不到可用的 driver
+            try:
+                return self._idle.get(timeout=1)
+
+            except queue.Empty:
+                continue
+
+        try:
+            driver = self._driver_factory()
+
+        except BaseException:
+            with self._lock:
+                self._drivers.remove(None)
+
+            raise
+
+        with self._lock:
+            self._drivers[self._drivers.index(None)] = driver
+
+        return driver
+
+    def _discard(self, driver: webdriver.Chrome):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+
+        try:
+            driver.quit()
+
+        except WebDriverException:
+            pass
+
+    @contextmanager
+    def acquire(self):
+        """在 with 區塊中取得一個 driver，離開時放回池中"""
+
+        driver = self._get()
+
+        try:
+            yield driver
+
+        except TimeoutException:
+            self._idle.put(driver)
+            raise
+
+        except WebDriverException:
+            self._discard(driver)
+            raise
+
+        except BaseException:
+            self._idle.put(driver)
+            raise
+
+        else:
+            self._idle.put(driver)
+
+    def close(self):
+        """關閉所有 driver"""
+
+        with self._lock:
+            drivers = [driver for driver in self._drivers if driver is not None]
+            self._drivers = [driver for driver in self._drivers if driver is None]
+
+        while True:
+            try:
+                self._idle.get_nowait()
+
+            except queue.Empty:
+                break
+
+        for driver in drivers:
+            try:
+                driver.quit()
+
+            except WebDriverException:
+                pass
+
+
+class CMoneyCrawler(_BaseCrawler):
+    """
+
+    CMoney 爬蟲
+
+    預設直接以 HTTP 取得頁面並解析 HTML，解析失敗時 (例如頁面改成由 JS 產生表格) 才會改用 selenium。
+    `use_selenium=True` 時則全部使用 selenium，爬取工作會分散給 driver 池中的多個瀏覽器同時執行
+
+    使用完畢後要呼叫 `close_driver()` 或使用 with 語法，確保所有瀏覽器都被關閉
+    """
+
+    SOURCE = "cmoney"
+
+    # 資金流向的產業類別頁面上是成交量前三檔的股票
+    TOP_STOCK_ORDER = "volume"
+
+    RANKING_URL = "https://www.cmoney.tw/finance/f00018.aspx?o={order}&o2={url_arg}"
+
+    # 精簡模式下瀏覽器的啟動參數
+    LEAN_BROWSER_ARGUMENTS = (
+        "--disable-extensions",
+        "--disable-gpu",
+        "--disable-dev-shm-usage",
+        "--blink-settings=imagesEnabled=false",
+        "--window-size=1024,768",
+    )
+
+    # 精簡模式下不載入的資源 (圖片、字型、樣式和常見的廣告、追蹤服務)
+    LEAN_BROWSER_BLOCKED_URLS = (
+        "*.png",
+        "*.jpg",
+        "*.jpeg",
+        "*.gif",
+        "*.webp",
+        "*.svg",
+        "*.ico",
+        "*.woff",
+        "*.woff2",
+        "*.ttf",
+        "*.css",
+        "*googlesyndication.com*",
+        "*doubleclick.net*",
+        "*google-analytics.com*",
+        "*googletagmanager.com*",
+        "*googletagservices.com*",
+        "*facebook.net*",
+        "*facebook.com*",
+        "*scorecardresearch.com*",
+    )
+
+    def __init__(
+        self,
+        is_headless: bool = True,
+        use_selenium: bool = False,
+        max_workers: int = 8,
+        max_per_host: int = 4,
+        driver_pool_size: int = 2,
+        lean_browser: bool = True,
+    ):
+        """
+
+        is_headless (bool): 使用 selenium 時是否以 headless 模式啟動瀏覽器
+
+        use_selenium (bool): 是否全部使用 selenium 爬取
+
+        max_workers (int): 以 HTTP 爬取時，同時進行中的爬取工作數量上限
+
+        max_per_host (int): 以 HTTP 爬取時，對同一個 host 同時進行中的請求數量上限
+
+        driver_pool_size (int): 同時啟動的瀏覽器數量上限，使用 selenium 時也是同時進行中的爬取工作數量上限
+
+        lean_browser (bool): 是否以精簡模式啟動瀏覽器 (eager 載入策略、不載入圖片、字型、樣式和廣告)
+        """
+
+        super().__init__(driver_pool_size if use_selenium else max_workers, max_per_host)
+
+        self.is_headless = is_headless
+        self.use_selenium = use_selenium
+        self.lean_browser = lean_browser
+
+        # 每次以 selenium 載入頁面所花的時間 i.e: [("https://...", 1.23), ...]
+        self.page_load_times = []
+
+        self.driver_pool = DriverPool(driver_pool_size, self._create_driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_driver()
+
+    def _create_driver(self) -> webdriver.Chrome:
+        options = webdriver.ChromeOptions()
+
+        if self.is_headless:
+            options.add_argument("--headless=new")
+
+        if self.lean_browser:
+            # DOM 解析完成就返回，不等待圖片、廣告等資源載入完成
+            options.page_load_strategy = "eager"
+
+            for argument in self.LEAN_BROWSER_ARGUMENTS:
+                options.add_argument(argument)
+
+            options.add_experimental_option(
+                "prefs", {"profile.managed_default_content_settings.images": 2}
+            )
+
+        driver = webdriver.Chrome(options=options)
+
+        if self.lean_browser:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd(
+                "Network.setBlockedURLs", {"urls": list(self.LEAN_BROWSER_BLOCKED_URLS)}
+            )
+
+        return driver
+
+    def _load_page(self, driver: webdriver.Chrome, url: str, class_name: str, error_message: str):
+        """載入頁面並等待指定 class 的元素出現，會記錄載入所花的時間"""
+
+        start_time = time.perf_counter()
+
+        driver.get(url)
+        locator = (By.CLASS_NAME, class_name)
+        WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located(locator), error_message)
+
+        load_time = time.perf_counter() - start_time
+
+        self.page_load_times.append((url, load_time))
+        Metrics.observe("selenium_page_load_seconds", load_time, host=urlsplit(url).netloc)
+
+    def _run_with_driver(self, func):
+        """
+        從 driver 池中取得 driver 執行 `func(driver)`，
+        如果 driver 在執行途中當掉，會換一個新的 driver 重試一次
+        """
+
+        try:
+            with self.driver_pool.acquire() as driver:
+                return func(driver)
+
+        except TimeoutException:
+            raise
+
+        except WebDriverException:
+            with self.driver_pool.acquire() as driver:
+                return func(driver)
+
+    @staticmethod
+    def _get_ranking_urls(day_type_arg: str) -> tuple:
+        """取得增加和減少排行頁面的 url"""
+
+        if day_type_arg == "1day":
+            url_arg = 1
+        elif day_type_arg == "1week":
+            url_arg = 2
+        elif day_type_arg == "1month":
+            url_arg = 3
+        elif day_type_arg == "3months":
+            url_arg = 4
+        else:
+            raise ValueError("Invalid value for 'day_arg'")
+
+        top_url = CMoneyCrawler.RANKING_URL.format(order=1, url_arg=url_arg)
+        last_url = CMoneyCrawler.RANKING_URL.format(order=2, url_arg=url_arg)
+
+        return top_url, last_url
+
+    @staticmethod
+    def _parse_group_data(html: str, page_url: str, limit: int = 10) -> list:
+        """
+        解析排行頁面的 HTML，取得前 10 個產業類別資料
+
+        limit (int): 取前幾個產業類別，None 代表全部
+
+        HTTP 和 selenium (`driver.page_source`) 都使用這個函式解析，以儲存格為單位取得欄位，
+        不會因為名稱中有空白而切錯欄位
+
+        回傳格式和 `_get_group_data()` 相同
+        """
+
+        with Metrics.timer("parse_seconds", parser="cmoney_ranking"):
+            soup = BeautifulSoup(html, "html.parser")
+
+        table = soup.find(id="MainContent")
+
+        if table is None:
+            raise RuntimeError(f"Error: 找不到排行表格, url: {page_url}")
+
+        result = []
+
+        rows = table.find_all("tr")[1:]
+
+        # 預設取前 10 個
+        for row in rows[:limit]:
+            cells = row.find_all("td")
+            link = row.find("a")
+
+            if not cells or link is None:
+                continue
+
+            # 名稱可能像 "概念股_iPhone 12" 這樣包含空白，和 selenium 版本一樣去掉空白
+            name = "".join(cells[0].get_text().split())
+
+            result.append({"name": name, "url": urljoin(page_url, link.get("href"))})
+
+        if not result:
+            raise RuntimeError(f"Error: 排行表格中沒有資料, url: {page_url}")
+
+        return result
+
+    @staticmethod
+    def _parse_top_3_stock_data(html: str, url: str, limit: int = 3) -> list:
+        """
+        解析產業類別頁面的 HTML，取得前三名股票的代碼和名稱
+
+        limit (int): 取前幾檔股票，None 代表全部
+
+        回傳格式: [["3105", "穩懋"], ...]
+        """
+
+        with Metrics.timer("parse_seconds", parser="cmoney_group"):
+            soup = BeautifulSoup(html, "html.parser")
+
+        table = soup.find(id="table1")
+
+        if table is None:
+            raise RuntimeError(f"Error: 找不到股票表格, url: {url}")
+
+        result = []
+
+        for row in table.find_all("tr")[1:][:limit]:
+            cells = row.find_all("td")
+
+            if len(cells) < 3:
+                continue
+
+            result.append([cells[1].get_text(strip=True), cells[2].get_text(strip=True)])
+
+        if not result:
+            raise RuntimeError(f"Error: 股票表格中沒有資料, url: {url}")
+
+        return result
+
+    def _get_group_data(self, driver: webdriver.Chrome) -> list:
+        # 一次取得整個頁面的 HTML 再解析，不用對每個元素都和 driver 溝通一次
+        return self._parse_group_data(driver.page_source, driver.current_url)
+
+    def _get_increase_reduce_group_data_by_selenium(self, day_type_arg: str) -> dict:
+        top_url, last_url = self._get_ranking_urls(day_type_arg)
+
+        def crawl(driver: webdriver.Chrome) -> dict:
+            result = {}
+
+            self._load_page(
+                driver,
+                top_url,
+                "up",
+                f"Error: 取得增加頁面的資料時出現錯誤, day_type_arg: [{day_type_arg}]",
+            )
+            top_group_data = self._get_group_data(driver)
+
+            self._load_page(
+                driver,
+                last_url,
+                "down",
+                f"Error: 取得減少頁面的資料時出現錯誤, day_type_arg: [{day_type_arg}]",
+            )
+            last_group_data = self._get_group_data(driver)
+
+            result["increase"] = top_group_data
+            result["reduce"] = last_group_data
+
+            return result
+
+        return self._run_with_driver(crawl)
+
+    def _get_increase_reduce_group_data(self, day_type_arg: str = "1day") -> dict:
+        if self.use_selenium:
+            return self._get_increase_reduce_group_data_by_selenium(day_type_arg)
+
+        top_url, last_url = self._get_ranking_urls(day_type_arg)
+
+        try:
+            result = {}
+
+            with self.host_limiter.limit(top_url):
+                result["increase"] = self._parse_group_data(
+                    BaseRequset.get_requset(top_url).text, top_url
+                )
+
+            with self.host_limiter.limit(last_url):
+                result["reduce"] = self._parse_group_data(
+                    BaseRequset.get_requset(last_url).text, last_url
+                )
+
+            return result
+
+        except RuntimeError:
+            return self._get_increase_reduce_group_data_by_selenium(day_type_arg)
+
+    def _get_all_group_data(self, day_type_arg: str = "1day") -> list:
+        result = []
+
+        # 增加、減少頁面載入完成時分別會出現 "up" 和 "down" 的元素
+        for page_url, class_name in zip(self._get_ranking_urls(day_type_arg), ("up", "down")):
+            if not self.use_selenium:
+                try:
+                    with self.host_limiter.limit(page_url):
+                        html = BaseRequset.get_requset(page_url).text
+
+                    result.extend(self._parse_group_data(html, page_url, limit=None))
+
+                    continue
+
+                # 和 `_get_increase_reduce_group_data()` 相同，解析失敗時改用 selenium
+                except RuntimeError:
+                    pass
+
+            html = self._fetch_page_by_selenium(page_url, class_name)
+            result.extend(self._parse_group_data(html, page_url, limit=None))
+
+        return result
+
+    def _fetch_page_by_selenium(self, url: str, class_name: str) -> str:
+        def crawl(driver: webdriver.Chrome) -> str:
+            self._load_page(driver, url, class_name, f"Error: 載入頁面時出現錯誤, url: {url}")
+
+            return driver.page_source
+
+        return self._run_with_driver(crawl)
+
+    def _fetch_group_page(self, url: str) -> str:
+        if self.use_selenium:
+            return self._fetch_page_by_selenium(url, "bk-clr")
+
+        try:
+            return BaseRequset.get_requset(url).text
+
+        except RuntimeError:
+            return self._fetch_page_by_selenium(url, "bk-clr")
+
+    def _parse_group_members(self, html: str, url: str) -> list:
+        return self._parse_top_3_stock_data(html, url, limit=None)
+
+    def _get_top_3_stock_of_group_data_by_selenium(self, url: str, group_name: str) -> dict:
+        def crawl(driver: webdriver.Chrome) -> dict:
+            result = {}
+
+            self._load_page(
+                driver, url, "bk-clr", f"Error: 取得前三名股票頁面的資料時出現錯誤, url: {url}"
+            )
+
+            result["group"] = group_name
+            result["data"] = self._parse_top_3_stock_data(driver.page_source, url)
+
+            return result
+
+        return self._run_with_driver(crawl)
+
+    def _get_top_3_stock_of_group_data(self, url: str, group_name: str) -> dict:
+        if self.use_selenium:
+            return self._get_top_3_stock_of_group_data_by_selenium(url, group_name)
+
+        try:
+            response = BaseRequset.get_requset(url)
+
+            return {"group": group_name, "data": self._parse_top_3_stock_data(response.text, url)}
+
+        except RuntimeError:
+            return self._get_top_3_stock_of_group_data_by_selenium(url, group_name)
+
+    def close_driver(self):
+        """關閉 driver 池中所有的瀏覽器，沒有啟動過 driver 時不做任何事"""
+
+        self.driver_pool.close()
+
+
+class PriceTable:
+    """
+    以陣列儲存的股票開高低收資料表
+
+    代碼對應到列的索引，開高低收和成交股數分別存放在連續的 `array("d")` 中 (沒有資料時為 NaN)，
+    比每檔股票一個 dict 省記憶體。`get()` 回傳的資料格式和原本的 dict 相同
+    """
+
+    PRICE_FIELDS = ("opening_price", "highest_price", "lowest_price", "cloesing_price")
+
+    def __init__(self, codes: list, names: list, prices: dict, volumes: list = None):
+        """
+
+        codes (list): 股票代碼
+
+        names (list): 股票名稱，順序和 codes 相同
+
+        prices (dict): 開高低收的欄位名稱和數值序列的對應，i.e: {"opening_price" : array("d", [...]), ...}
+
+        volumes (list): 成交股數，順序和 codes 相同，None 代表沒有成交股數的資料
+        """
+
+        self.codes = codes
+        self.names = names
+        self.prices = {field: array("d", prices[field]) for field in self.PRICE_FIELDS}
+        self.volumes = (
+            array("d", volumes) if volumes is not None else array("d", [math.nan]) * len(codes)
+        )
+
+        # 代碼重複時以第一筆為準
+        self._index = {}
+
+        for i, code in enumerate(codes):
+            self._index.setdefault(code, i)
+
+    @staticmethod
+    def parse_prices(values: list, empty_value: str = "") -> array:
+        """將 API 回傳的價格字串 (可能有千分位逗號) 一次轉換成 `array("d")`，沒有資料的轉換成 NaN"""
+
+        return array(
+            "d",
+            [
+                float(value.replace(",", "")) if value and value != empty_value else math.nan
+                for value in values
+            ],
+        )
+
+    @classmethod
+    def empty(cls) -> "PriceTable":
+        """建立沒有任何資料的資料表"""
+
+        return cls([], [], {field: [] for field in cls.PRICE_FIELDS})
+
+    @classmethod
+    def from_table(
+        cls,
+        fields: list,
+        rows: list,
+        field_names: tuple,
+        empty_value: str = "",
+        volume_name: str = None,
+    ) -> "PriceTable":
+        """
+        依照欄位名稱處理 API 回傳的表格資料
+
+        Args:
+            fields (list): 表格的欄位名稱
+            rows (list): 表格的資料
+            field_names (tuple): 代碼、名稱、開、高、低、收的欄位名稱
+            empty_value (str): 代表沒有資料的字串
+            volume_name (str): 成交股數的欄位名稱，表格中沒有這個欄位時成交股數為 NaN
+        """
+
+        code_i, name_i, *price_is = [fields.index(name) for name in field_names]
+
+        volumes = None
+
+        if volume_name in fields:
+            volume_i = fields.index(volume_name)
+            volumes = cls.parse_prices([row[volume_i] for row in rows], empty_value)
+
+        return cls(
+            [row[code_i].strip() for row in rows],
+            [row[name_i].strip() for row in rows],
+            {
+                field: cls.parse_prices([row[i] for row in rows], empty_value)
+                for field, i in zip(cls.PRICE_FIELDS, price_is)
+            },
+            volumes,
+        )
+
+    @classmethod
+    def merge(cls, *tables: "PriceTable") -> "PriceTable":
+        """
+        將多個資料表合併成一個，可以用一次查詢同時查上市、上櫃股票
+
+        代碼重複時以先傳入的資料表為準
+        """
+
+        codes = []
+        names = []
+        prices = {field: array("d") for field in cls.PRICE_FIELDS}
+        volumes = array("d")
+
+        for table in tables:
+            codes.extend(table.codes)
+            names.extend(table.names)
+
+            for field in cls.PRICE_FIELDS:
+                prices[field].extend(table.prices[field])
+
+            volumes.extend(table.volumes)
+
+        return cls(codes, names, prices, volumes)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._index
+
+    def get(self, code: str, default=None) -> dict:
+        """
+        取得股票的開高低收資料和成交股數，找不到時回傳 default
+
+        回傳格式:
+        ```
+        {
+        "code" : "3105",
+        "name" : "穩懋",
+        "opening_price" : 141.0,
+        "highest_price" : 146.0,
+        "lowest_price" : 139.0,
+        "cloesing_price" : 144.0,
+        "volume" : 12345678.0
+        }
+        ```
+        """
+
+        i = self._index.get(code)
+
+        if i is None:
+            return default
+
+        result = {"code": self.codes[i], "name": self.names[i]}
+
+        for field in self.PRICE_FIELDS:
+            value = self.prices[field][i]
+            result[field] = None if math.isnan(value) else value
+
+        volume = self.volumes[i]
+        result["volume"] = None if math.isnan(volume) else volume
+
+        return result
+
+    def get_many(self, codes: list) -> dict:
+        """一次查詢多檔股票，回傳代碼和 `get()` 回傳資料的對應，找不到的代碼不會出現在結果中"""
+
+        result = {}
+
+        for code in codes:
+            data = self.get(code)
+
+            if data is not None:
+                result[code] = data
+
+        return result
+
+    def rows(self):
+        """依序產生每檔股票的資料，格式和 `get()` 回傳的相同"""
+
+        for code in self._index:
+            yield self.get(code)
+
+    @classmethod
+    def from_rows(cls, rows) -> "PriceTable":
+        """由 `get()` 回傳格式的資料建立資料表"""
+
+        rows = list(rows)
+
+        return cls(
+            [row["code"] for row in rows],
+            [row["name"] for row in rows],
+            {
+                field: [math.nan if row[field] is None else row[field] for row in rows]
+                for field in cls.PRICE_FIELDS
+            },
+            [math.nan if row.get("volume") is None else row["volume"] for row in rows],
+        )
+
+
+class LazyPriceTable:
+    """
+    延遲解析的股票開高低收資料表
+
+    只保留 API 回傳的原始資料，建立時掃過一次取得代碼建立索引，
+    某檔股票第一次被查詢時才解析那一列。實際會用到的股票只有一百多檔，不需要解析整個市場的資料。
+    需要整個市場的資料時 (i.e: 存入歷史資料庫) 以 `materialize()` 一次轉換成 `PriceTable`，
+    轉換後不再保留原始資料，之後的查詢都使用轉換後的資料表
+
+    查詢介面 (`get()`, `get_many()`, `in`, `len()`) 和 `PriceTable` 相同
+    """
+
+    def __init__(self, rows: list, row_parser, code_getter, table_builder=None):
+        """
+
+        rows (list): API 回傳的原始資料
+
+        row_parser: 將一列原始資料解析成 `PriceTable.get()` 回傳格式的函式
+
+        code_getter: 從一列原始資料中取得股票代碼的函式
+
+        table_builder: 將所有原始資料一次解析成 `PriceTable` 的函式，None 代表逐列以 `row_parser` 解析
+        """
+
+        index = {}
+
+        for i, row in enumerate(rows):
+            index.setdefault(code_getter(row), i)
+
+        self._row_parser = row_parser
+        self._table_builder = table_builder
+
+        # 轉換前是 (原始資料, 代碼 -> 列的索引)，轉換後是 `PriceTable`。
+        # 只用一個屬性記錄，其他 thread 同時查詢時不會看到轉換到一半的狀態
+        self._data = (rows, index)
+        self._parsed = {}
+
+    @classmethod
+    def merge(cls, *tables: "LazyPriceTable") -> "_MergedPriceTable":
+        """
+        將多個資料表合併成一個，可以用一次查詢同時查上市、上櫃股票
+
+        代碼重複時以先傳入的資料表為準，不會解析任何資料。
+        合併後的資料表只會依序查詢原本的資料表，原本的資料表轉換後也會使用轉換後的資料
+        """
+
+        return _MergedPriceTable(tables)
+
+    def codes(self):
+        """所有的股票代碼"""
+
+        data = self._data
+
+        return data._index.keys() if isinstance(data, PriceTable) else data[1].keys()
+
+    def __len__(self) -> int:
+        return len(self.codes())
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.codes()
+
+    def get(self, code: str, default=None) -> dict:
+        """取得股票的開高低收資料，找不到時回傳 default，回傳格式和 `PriceTable.get()` 相同"""
+
+        data = self._data
+
+        if isinstance(data, PriceTable):
+            return data.get(code, default)
+
+        result = self._parsed.get(code)
+
+        if result is None:
+            rows, index = data
+            i = index.get(code)
+
+            if i is None:
+                return default
+
+            result = self._row_parser(rows[i])
+            self._parsed[code] = result
+
+        return dict(result)
+
+    def get_many(self, codes: list) -> dict:
+        """一次查詢多檔股票，回傳代碼和 `get()` 回傳資料的對應，找不到的代碼不會出現在結果中"""
+
+        result = {}
+
+        for code in codes:
+            data = self.get(code)
+
+            if data is not None:
+                result[code] = data
+
+        return result
+
+    def materialize(self) -> PriceTable:
+        """一次解析所有資料，轉換成 `PriceTable`，轉換後不再保留原始資料"""
+
+        data = self._data
+
+        if isinstance(data, PriceTable):
+            return data
+
+        rows = data[0]
+
+        if self._table_builder is not None:
+            table = self._table_builder(rows)
+
+        else:
+            table = PriceTable.from_rows(self._row_parser(row) for row in rows)
+
+        self._data = table
+        self._parsed = {}
+
+        return table
+
+    def rows(self):
+        """依序產生每檔股票的資料 (會轉換成 `PriceTable`)，格式和 `get()` 回傳的相同"""
+
+        return self.materialize().rows()
+
+
+class _MergedPriceTable:
+    """
+    `LazyPriceTable.merge()` 合併的資料表，依序查詢原本的資料表，代碼重複時以前面的資料表為準
+
+    查詢介面和 `PriceTable` 相同
+    """
+
+    def __init__(self, tables: tuple):
+        self.tables = tables
+
+    def codes(self):
+        """所有的股票代碼"""
+
+        return set().union(*[table.codes() for table in self.tables])
+
+    def __len__(self) -> int:
+        return len(self.codes())
+
+    def __contains__(self, code: str) -> bool:
+        return any(code in table for table in self.tables)
+
+    def get(self, code: str, default=None) -> dict:
+        """取得股票的開高低收資料，找不到時回傳 default，回傳格式和 `PriceTable.get()` 相同"""
+
+        for table in self.tables:
+            data = table.get(code)
+
+            if data is not None:
+                return data
+
+        return default
+
+    def get_many(self, codes: list) -> dict:
+        """一次查詢多檔股票，回傳代碼和 `get()` 回傳資料的對應，找不到的代碼不會出現在結果中"""
+
+        result = {}
+
+        for code in codes:
+            data = self.get(code)
+
+            if data is not None:
+                result[code] = data
+
+        return result
+
+    def materialize(self) -> PriceTable:
+        """轉換所有原本的資料表，合併成一個 `PriceTable`"""
+
+        return PriceTable.merge(*[table.materialize() for table in self.tables])
+
+    def rows(self):
+        """依序產生每檔股票的資料 (會轉換成 `PriceTable`)，格式和 `get()` 回傳的相同"""
+
+        return self.materialize().rows()
+
+
+class _SQLiteStore:
+    """
+    以 SQLite 儲存資料的基本類別
+
+    子類別以 `SCHEMA` 定義資料表，同一個連線可以在多個 thread 中使用
+    """
+
+    SCHEMA = ""
+
+    def __init__(self, filename: str):
+        """
+
+        filename (str): SQLite 資料庫檔案路徑
+        """
+
+        self.filename = filename
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """更新舊版的資料表，子類別有變更 `SCHEMA` 時覆寫"""
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PriceStore(_SQLiteStore):
+    """
+    以 SQLite 儲存的每日開高低收歷史資料
+
+    以 (交易日期, 市場, 代碼) 為主鍵，另外以代碼建立索引，可以查詢一段期間、一部分股票的資料 (包含成交股數)。
+    同一個代碼同時出現在上市、上櫃時兩筆都會保存，查詢時依照 `MARKETS` 的順序決定使用哪一筆。
+    每個日期、市場取得過的資料 (包含沒有交易的日期) 都會記錄下來，之後可以直接讀取不用重新下載
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS daily_prices (
+        trading_date TEXT NOT NULL,
+        code TEXT NOT NULL,
+        market TEXT NOT NULL,
+        name TEXT,
+        opening_price REAL,
+        highest_price REAL,
+        lowest_price REAL,
+        cloesing_price REAL,
+        volume REAL,
+        PRIMARY KEY (trading_date, market, code)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_daily_prices_code ON daily_prices (code, trading_date);
+
+    CREATE TABLE IF NOT EXISTS fetched_dates (
+        trading_date TEXT NOT NULL,
+        market TEXT NOT NULL,
+        row_count INTEGER NOT NULL,
+        PRIMARY KEY (trading_date, market)
+    ) WITHOUT ROWID;
+    """
+
+    # 市場代號，查詢時依照這個順序決定代碼重複時使用哪一筆
+    MARKETS = ("twse", "tpex")
+
+    def _migrate(self):
+        table_info = self._conn.execute("PRAGMA table_info(daily_prices)").fetchall()
+
+        # 舊版的資料表沒有成交股數
+        if "volume" not in [row[1] for row in table_info]:
+            with self._conn:
+                self._conn.execute("ALTER TABLE daily_prices ADD COLUMN volume REAL")
+
+        # 舊版的主鍵沒有市場，同一個代碼的上市、上櫃資料會互相覆蓋，以新的主鍵重新建立資料表
+        if "market" not in [row[1] for row in table_info if row[5]]:
+            self._conn.executescript(f"""
+                BEGIN;
+                ALTER TABLE daily_prices RENAME TO daily_prices_old;
+                DROP INDEX IF EXISTS idx_daily_prices_code;
+                {self.SCHEMA}
+                INSERT INTO daily_prices
+                SELECT trading_date, code, market, name, opening_price, highest_price,
+                lowest_price, cloesing_price, volume FROM daily_prices_old;
+                DROP TABLE daily_prices_old;
+                COMMIT;
+                """)
+
+    def has(self, trading_date: date, market: str) -> bool:
+        """是否已經儲存過指定日期、市場的資料 (包含沒有交易的日期)"""
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM fetched_dates WHERE trading_date = ? AND market = ?",
+                (trading_date.isoformat(), market),
+            ).fetchone()
+
+        return row is not None
+
+    def row_count(self, trading_date: date, market: str) -> int:
+        """指定日期、市場儲存的資料筆數，0 代表記錄成沒有交易，沒有儲存過時回傳 None"""
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT row_count FROM fetched_dates WHERE trading_date = ? AND market = ?",
+                (trading_date.isoformat(), market),
+            ).fetchone()
+
+        return row[0] if row is not None else None
+
+    def save(self, trading_date: date, market: str, price_data: PriceTable):
+        """儲存指定日期、市場的資料，會取代已經存在的同一個日期、市場的資料
+
+        Args:
+            trading_date (date): 交易日期
+            market (str): 市場代號 ("twse" 或 "tpex")
+            price_data (PriceTable): 交易資料，沒有資料代表當天沒有交易
+        """
+
+        day = trading_date.isoformat()
+
+        # 逐列產生要寫入的資料，不用再建立一份整個市場的 list
+        rows = (
+            (
+                day,
+                data["code"],
+                market,
+                data["name"],
+                data["opening_price"],
+                data["highest_price"],
+                data["lowest_price"],
+                data["cloesing_price"],
+                data.get("volume"),
+            )
+            for data in price_data.rows()
+        )
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM daily_prices WHERE trading_date = ? AND market = ?", (day, market)
+            )
+            self._conn.executemany(
+                "INSERT INTO daily_prices VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fetched_dates VALUES (?, ?, ?)",
+                (day, market, len(price_data)),
+            )
+
+    def load(self, trading_date: date, market: str = None) -> PriceTable:
+        """讀取指定日期的資料，沒有指定市場時會讀取所有市場的資料"""
+
+        return PriceTable.from_rows(self.query(start=trading_date, end=trading_date, market=market))
+
+    def query(
+        self, codes: list = None, start: date = None, end: date = None, market: str = None
+    ) -> list:
+        """
+        查詢一段期間、一部分股票的資料，沒有指定的條件不會限制
+
+        回傳格式 (依照交易日期、市場排序):
+        ```
+        [
+            {"trading_date" : date(2023, 9, 8), "market" : "twse", "code" : "3105", "name" : "穩懋",
+            "opening_price" : 141.0, "highest_price" : 146.0, "lowest_price" : 139.0, "cloesing_price" : 144.0,
+            "volume" : 12345678.0}, ...
+        ]
+        ```
+        """
+
+        conditions = []
+        params = []
+
+        if codes is not None:
+            conditions.append(f"code IN ({', '.join('?' * len(codes))})")
+            params.extend(codes)
+
+        if start is not None:
+            conditions.append("trading_date >= ?")
+            params.append(start.isoformat())
+
+        if end is not None:
+            conditions.append("trading_date <= ?")
+            params.append(end.isoformat())
+
+        if market is not None:
+            conditions.append("market = ?")
+            params.append(market)
+
+        sql = (
+            "SELECT trading_date, market, code, name, opening_price, highest_price, lowest_price,"
+            " cloesing_price, volume FROM daily_prices"
+        )
+
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+
+        sql += " ORDER BY trading_date, CASE market WHEN 'twse' THEN 0 ELSE 1 END, code"
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        return [
+            {
+                "trading_date": date.fromisoformat(row[0]),
+                "market": row[1],
+                "code": row[2],
+                "name": row[3],
+                "opening_price": row[4],
+                "highest_price": row[5],
+                "lowest_price": row[6],
+                "cloesing_price": row[7],
+                "volume": row[8],
+            }
+            for row in rows
+        ]
+
+    def trading_dates(self, start: date = None, end: date = None) -> list:
+        """已儲存且有交易的日期 (由小到大)"""
+
+        sql = "SELECT DISTINCT trading_date FROM fetched_dates WHERE row_count > 0"
+        params = []
+
+        if start is not None:
+            sql += " AND trading_date >= ?"
+            params.append(start.isoformat())
+
+        if end is not None:
+            sql += " AND trading_date <= ?"
+            params.append(end.isoformat())
+
+        with self._lock:
+            rows = self._conn.execute(f"{sql} ORDER BY trading_date", params).fetchall()
+
+        return [date.fromisoformat(row[0]) for row in rows]
+
+    def closing_prices(self, start: date = None, end: date = None) -> tuple:
+        """
+        以欄位的形式讀取一段期間所有股票的收盤價，代碼重複時以上市的資料為準
+
+        回傳 (交易日期的 list, {代碼 : 收盤價的 array('d')})，收盤價和交易日期的位置對齊，
+        沒有資料或沒有成交時為 NaN
+        """
+
+        dates = self.trading_dates(start, end)
+
+        if not dates:
+            return dates, {}
+
+        positions = {trading_date.isoformat(): i for i, trading_date in enumerate(dates)}
+        empty_prices = array("d", [math.nan]) * len(dates)
+        closes = {}
+
+        # 上櫃的資料先寫入，上市的資料後寫入時會覆蓋重複的代碼
+        sql = (
+            "SELECT trading_date, code, cloesing_price FROM daily_prices"
+            " WHERE trading_date >= ? AND trading_date <= ?"
+            " ORDER BY CASE market WHEN 'twse' THEN 1 ELSE 0 END"
+        )
+
+        with self._lock:
+            rows = self._conn.execute(sql, (dates[0].isoformat(), dates[-1].isoformat()))
+
+            for trading_date, code, price in rows:
+                prices = closes.get(code)
+
+                if prices is None:
+                    prices = closes[code] = array("d", empty_prices)
+
+                prices[positions[trading_date]] = math.nan if price is None else price
+
+        return dates, closes
+
+
+class RankingStore(_SQLiteStore):
+    """
+    以 SQLite 儲存的族群排行歷史資料
+
+    每個 (交易日期, 來源, 天數參數, 增加/減少, 名次) 一筆族群資料，族群中的股票另外存放，
+    並且以族群名稱和股票代碼建立索引，可以快速查詢某個族群或某檔股票過去出現在排行中的紀錄
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS group_rankings (
+        trading_date TEXT NOT NULL,
+        source TEXT NOT NULL,
+        period TEXT NOT NULL,
+        direction TEXT NOT NULL,
+        rank INTEGER NOT NULL,
+        group_name TEXT NOT NULL,
+        PRIMARY KEY (trading_date, source, period, direction, rank)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_group_rankings_group
+    ON group_rankings (group_name, trading_date);
+
+    CREATE TABLE IF NOT EXISTS group_ranking_stocks (
+        trading_date TEXT NOT NULL,
+        source TEXT NOT NULL,
+        period TEXT NOT NULL,
+        direction TEXT NOT NULL,
+        rank INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        code TEXT NOT NULL,
+        name TEXT,
+        PRIMARY KEY (trading_date, source, period, direction, rank, position)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_group_ranking_stocks_code
+    ON group_ranking_stocks (code, trading_date);
+    """
+
+    def save(self, trading_date: date, source: str, day_type_arg: str, stock_data: dict):
+        """儲存一個來源、天數參數的排行資料，已經存在的資料會被覆蓋
+
+        Args:
+            trading_date (date): 交易日期
+            source (str): 資料來源 ("statementdog" 或 "cmoney")
+            day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+            stock_data (dict): 排行資料，格式必須符合 `_BaseCrawler.get_data()` 生成的資料格式
+        """
+
+        day = trading_date.isoformat()
+        group_rows = []
+        stock_rows = []
+
+        for direction, groups in stock_data.items():
+            for rank, group_data in enumerate(groups, 1):
+                key = (day, source, day_type_arg, direction, rank)
+                group_rows.append(key + (group_data["group"],))
+
+                for position, stock in enumerate(group_data["data"], 1):
+                    stock_rows.append(key + (position, stock["code"], stock["name"]))
+
+        with self._lock, self._conn:
+            for table in ("group_rankings", "group_ranking_stocks"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE trading_date = ? AND source = ? AND period = ?",
+                    (day, source, day_type_arg),
+                )
+
+            self._conn.executemany(
+                "INSERT INTO group_rankings VALUES (?, ?, ?, ?, ?, ?)", group_rows
+            )
+            self._conn.executemany(
+                "INSERT INTO group_ranking_stocks VALUES (?, ?, ?, ?, ?, ?, ?, ?)", stock_rows
+            )
+
+    def count_group_in_top(
+        self,
+        group_name: str,
+        days: int = 60,
+        top: int = 5,
+        direction: str = "increase",
+        source: str = None,
+        period: str = None,
+        end: date = None,
+    ) -> int:
+        """
+        計算族群在最近幾天內有幾個交易日出現在排行的前幾名
+
+        i.e: 砷化鎵在最近 60 天內有幾天是增加的前 5 名
+        `store.count_group_in_top("砷化鎵", days=60, top=5)`
+
+        Args:
+            group_name (str): 族群名稱
+            days (int): 往前計算的天數 (日曆天)
+            top (int): 前幾名
+            direction (str): "increase" 或 "reduce"
+            source (str): 只計算指定的來源，沒有指定時計算所有來源
+            period (str): 只計算指定的天數參數，沒有指定時計算所有天數參數
+            end (date): 計算到哪一天，預設為今天
+        """
+
+        end = end or date.today()
+
+        sql = (
+            "SELECT COUNT(DISTINCT trading_date) FROM group_rankings"
+            " WHERE group_name = ? AND trading_date > ? AND trading_date <= ?"
+            " AND direction = ? AND rank <= ?"
+        )
+        params = [
+            group_name,
+            (end - timedelta(days=days)).isoformat(),
+            end.isoformat(),
+            direction,
+            top,
+        ]
+
+        if source is not None:
+            sql += " AND source = ?"
+            params.append(source)
+
+        if period is not None:
+            sql += " AND period = ?"
+            params.append(period)
+
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    @staticmethod
+    def _to_dicts(cursor: sqlite3.Cursor) -> list:
+        columns = [column[0] for column in cursor.description]
+        result = []
+
+        for row in cursor.fetchall():
+            data = dict(zip(columns, row))
+            data["trading_date"] = date.fromisoformat(data["trading_date"])
+            result.append(data)
+
+        return result
+
+    def group_history(self, group_name: str, start: date = None, end: date = None) -> list:
+        """
+        查詢族群出現在排行中的紀錄 (依照交易日期排序)
+
+        回傳格式:
+        ```
+        [
+            {"trading_date" : date(2023, 9, 8), "source" : "statementdog", "period" : "1day",
+            "direction" : "increase", "rank" : 1, "group_name" : "砷化鎵"}, ...
+        ]
+        ```
+        """
+
+        sql = "SELECT * FROM group_rankings WHERE group_name = ?"
+        params = [group_name]
+
+        if start is not None:
+            sql += " AND trading_date >= ?"
+            params.append(start.isoformat())
+
+        if end is not None:
+            sql += " AND trading_date <= ?"
+            params.append(end.isoformat())
+
+        with self._lock:
+            return self._to_dicts(
+                self._conn.execute(f"{sql} ORDER BY trading_date, source, period", params)
+            )
+
+    def stock_history(self, code: str, start: date = None, end: date = None) -> list:
+        """
+        查詢股票出現在排行族群中的紀錄 (依照交易日期排序)
+
+        回傳格式:
+        ```
+        [
+            {"trading_date" : date(2023, 9, 8), "source" : "statementdog", "period" : "1day",
+            "direction" : "increase", "rank" : 1, "position" : 1, "code" : "3105", "name" : "穩懋",
+            "group_name" : "砷化鎵"}, ...
+        ]
+        ```
+        """
+
+        sql = (
+            "SELECT s.*, g.group_name FROM group_ranking_stocks AS s"
+            " JOIN group_rankings AS g USING (trading_date, source, period, direction, rank)"
+            " WHERE s.code = ?"
+        )
+        params = [code]
+
+        if start is not None:
+            sql += " AND s.trading_date >= ?"
+            params.append(start.isoformat())
+
+        if end is not None:
+            sql += " AND s.trading_date <= ?"
+            params.append(end.isoformat())
+
+        with self._lock:
+            return self._to_dicts(
+                self._conn.execute(f"{sql} ORDER BY s.trading_date, s.source, s.period", params)
+            )
+
+
+class GroupRankingEngine:
+    """
+    以本機的歷史收盤價和產業類別的成分股，計算所有產業類別在各個天數參數的漲跌幅排行
+
+    產業類別的漲跌幅是成分股漲跌幅的平均 (等權重)，期間內沒有成交的成分股不計入。
+    每個天數參數的股票漲跌幅只計算一次，所有產業類別共用，
+    排行只需要前後幾名，以 heap 做部分選擇，不用排序所有產業類別
+
+    NOTE: 沒有使用 NumPy 以 (成分股 x 日期) 矩陣向量化計算 (專案沒有 NumPy 相依)，
+    `stock_returns()` 和 `group_returns()` 仍然是在 Python 中逐檔股票、逐個產業類別計算
+
+    i.e:
+    ```
+    engine = GroupRankingEngine.from_store(store, index.group_members("statementdog"))
+    engine.rank("1week", 5)
+    {"increase" : [{"group" : "砷化鎵", "return" : 0.123}, ...], "reduce" : [...]}
+    ```
+    """
+
+    # 天數參數 -> 交易日數
+    PERIODS = {"1day": 1, "1week": 5, "1month": 20, "3months": 60}
+
+    def __init__(self, dates: list, closes: dict, groups: dict, missing_dates: list = ()):
+        """
+
+        dates (list): 交易日期 (由小到大)
+
+        closes (dict): {代碼 : 收盤價的 array('d')}，和 `dates` 的位置對齊，格式和 `PriceStore.closing_prices()` 相同
+
+        groups (dict): {產業類別名稱 : [成分股代碼, ...]}，i.e: `GroupMembershipIndex.group_members()`
+
+        missing_dates (list): `dates` 中歷史資料庫沒有資料的交易日，期間包含這些日期的天數參數不會計算
+        """
+
+        self.dates = dates
+        self.closes = closes
+        self.groups = groups
+        self.missing_dates = list(missing_dates)
+
+        # 天數參數 -> {代碼 : 漲跌幅}
+        self._stock_returns = {}
+
+    @classmethod
+    def from_store(
+        cls,
+        store: PriceStore,
+        groups: dict,
+        end: date = None,
+        calendar: "TradingCalendar" = None,
+    ) -> "GroupRankingEngine":
+        """從歷史資料庫讀取計算最長天數參數需要的收盤價
+
+        有交易日曆時，期間以交易日曆上的交易日決定，資料庫中沒有的交易日會記錄在 `missing_dates`；
+        沒有交易日曆時直接使用資料庫中最後幾個有資料的日期 (中間漏抓的日期會讓期間變長)
+
+        Args:
+            store (PriceStore): 歷史資料庫
+            groups (dict): {產業類別名稱 : [成分股代碼, ...]}
+            end (date): 計算到哪一個交易日，預設為資料庫中最新的交易日
+            calendar (TradingCalendar): 交易日曆
+        """
+
+        day_number = max(cls.PERIODS.values()) + 1
+
+        if calendar is None:
+            dates = store.trading_dates(end=end)[-day_number:]
+
+            if not dates:
+                return cls([], {}, groups)
+
+            dates, closes = store.closing_prices(dates[0], dates[-1])
+
+            return cls(dates, closes, groups)
+
+        if end is None:
+            stored_dates = store.trading_dates()
+
+            if not stored_dates:
+                return cls([], {}, groups)
+
+            end = stored_dates[-1]
+
+        if not calendar.is_trading_day(end):
+            end = calendar.previous_trading_day(end)
+
+        dates = [end]
+
+        while len(dates) < day_number:
+            dates.append(calendar.previous_trading_day(dates[-1]))
+
+        dates.reverse()
+
+        stored_dates, stored_closes = store.closing_prices(dates[0], dates[-1])
+        positions = {trading_date: i for i, trading_date in enumerate(stored_dates)}
+        missing_dates = [trading_date for trading_date in dates if trading_date not in positions]
+
+        if stored_dates == dates:
+            return cls(dates, stored_closes, groups)
+
+        # 以交易日曆的日期重新對齊，沒有資料的日期是 NaN
+        indexes = [positions.get(trading_date) for trading_date in dates]
+        closes = {
+            code: array("d", (math.nan if i is None else prices[i] for i in indexes))
+            for code, prices in stored_closes.items()
+        }
+
+        return cls(dates, closes, groups, missing_dates)
+
+    def stock_returns(self, day_type_arg: str) -> dict:
+        """
+        計算所有股票在天數參數期間的漲跌幅 (最後一個交易日和 n 個交易日前的收盤價比較)，
+        歷史資料不足或期間內有缺少資料的交易日 (`missing_dates`) 時回傳空的 dict
+
+        回傳格式: {"3105" : 0.0123, ...}
+        """
+
+        if day_type_arg in self._stock_returns:
+            return self._stock_returns[day_type_arg]
+
+        last = len(self.dates) - 1
+        base = last - self.PERIODS[day_type_arg]
+        result = {}
+
+        if base >= 0 and not any(
+            trading_date in self.missing_dates for trading_date in self.dates[base:]
+        ):
+            for code, prices in self.closes.items():
+                base_price = prices[base]
+                last_price = prices[last]
+
+                # NaN 的比較都是 False，沒有成交的股票不會被計入
+                if base_price > 0 and last_price > 0:
+                    result[code] = last_price / base_price - 1
+
+        self._stock_returns[day_type_arg] = result
+
+        return result
+
+    def group_returns(self, day_type_arg: str) -> dict:
+        """
+        計算所有產業類別在天數參數期間的漲跌幅，沒有任何成分股有資料的產業類別不會出現在結果中
+
+        回傳格式: {"砷化鎵" : 0.0123, ...}
+        """
+
+        stock_returns = self.stock_returns(day_type_arg)
+        result = {}
+
+        for name, codes in self.groups.items():
+            returns = [stock_returns[code] for code in codes if code in stock_returns]
+
+            if returns:
+                result[name] = math.fsum(returns) / len(returns)
+
+        return result
+
+    def rank(self, day_type_arg: str, number: int = 5) -> dict:
+        """
+        取得天數參數的漲幅前 `number` 名和跌幅前 `number` 名的產業類別
+
+        回傳格式:
+        ```
+        {
+        "increase" : [{"group" : "砷化鎵", "return" : 0.123}, ...],
+        "reduce" : [{"group" : "家電", "return" : -0.05}, ...]
+        }
+        ```
+        """
+
+        items = self.group_returns(day_type_arg).items()
+        get_return = lambda item: item[1]
+
+        return {
+            "increase": [
+                {"group": name, "return": value}
+                for name, value in heapq.nlargest(number, items, key=get_return)
+            ],
+            "reduce": [
+                {"group": name, "return": value}
+                for name, value in heapq.nsmallest(number, items, key=get_return)
+            ],
+        }
+
+    def rank_all(self, day_type_args: list = None, number: int = 5) -> dict:
+        """
+        一次取得多個天數參數的排行
+
+        回傳格式:
+        ```
+        {"1day" : <rank() 的回傳格式>, ...}
+        ```
+        """
+
+        return {
+            day_type_arg: self.rank(day_type_arg, number)
+            for day_type_arg in (day_type_args or self.PERIODS)
+        }
+
+    def compare(self, stock_data: dict, day_type_arg: str) -> dict:
+        """
+        和爬取的排行比較，計算爬取的排行中有幾成的產業類別也出現在本機計算的同樣名次數量的排行中
+
+        Args:
+            stock_data (dict): 爬取的排行，格式必須符合 `_BaseCrawler.get_data()` 生成的資料格式
+            day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+
+        回傳格式: {"increase" : 0.8, "reduce" : 0.6}，任一邊的排行是空的 (i.e: 歷史資料不足、缺少資料) 時為 None
+        """
+
+        number = max(len(groups) for groups in stock_data.values())
+        local_ranking = self.rank(day_type_arg, number)
+        result = {}
+
+        for direction, groups in stock_data.items():
+            scraped = {group_data["group"] for group_data in groups}
+            local = {group_data["group"] for group_data in local_ranking[direction]}
+
+            result[direction] = len(scraped & local) / len(scraped) if scraped and local else None
+
+        return result
+
+
+class StockPrice:
+    """
+    取得股票的每日交易價格相關的類別
+    """
+
+    TRADING_DATE = None
+
+    # 上櫃股票每日交易資料的資料日期 (i.e: "20230908")，由 `get_mainborad_day_all()` 設定
+    MAINBORAD_TRADING_DATE = None
+
+    STOCK_DAY_ALL_URL = "https://www.twse.com.tw/exchangeReport/STOCK_DAY_ALL"
+    MAINBORAD_DAY_ALL_URL = "https://www.tpex.org.tw/openapi/v1/tpex_mainboard_quotes"
+
+    # 歷史資料庫，設定成 `PriceStore` 後取得的資料都會存入，並且會優先從資料庫讀取
+    STORE = None
+
+    # 交易日曆，設定成 `TradingCalendar` 後用來判斷沒有資料的日期是否為休市，None 代表只有週末休市
+    CALENDAR = None
+
+    # 延遲解析的資料表存入資料庫時需要解析所有資料，取得時先記錄在這裡，由 `save_pending()` 轉換後存入
+    _pending_saves = []
+    _pending_lock = threading.Lock()
+
+    @staticmethod
+    def _is_trading_day(trading_date: date) -> bool:
+        if StockPrice.CALENDAR is None:
+            return trading_date.weekday() < 5
+
+        return StockPrice.CALENDAR.is_trading_day(trading_date)
+
+    @staticmethod
+    def _load_from_store(trading_date: date, market: str) -> PriceTable:
+        """
+        從歷史資料庫讀取資料，沒有設定資料庫或沒有資料時回傳 None
+
+        記錄成沒有交易、但是是交易日的日期也回傳 None，重新取得一次 (HTTP 快取中確定沒有資料的回應會直接使用)
+        """
+
+        store = StockPrice.STORE
+
+        if store is None:
+            return None
+
+        row_count = store.row_count(trading_date, market)
+
+        if row_count is None or (row_count == 0 and StockPrice._is_trading_day(trading_date)):
+            return None
+
+        return store.load(trading_date, market)
+
+    @staticmethod
+    def previous_closes(codes, trading_date: date) -> dict:
+        """
+        從歷史資料庫取得股票在 `trading_date` 的前一個交易日的收盤價，
+        沒有設定資料庫或兩週內沒有交易資料時回傳空的 dict，代碼重複時以上市的資料為準
+
+        回傳格式: {"3105" : 144.0, ...}
+        """
+
+        store = StockPrice.STORE
+
+        if store is None or not codes:
+            return {}
+
+        dates = store.trading_dates(
+            trading_date - timedelta(days=14), trading_date - timedelta(days=1)
+        )
+
+        if not dates:
+            return {}
+
+        result = {}
+
+        # 查詢結果中上市的資料在前面
+        for row in store.query(codes=list(codes), start=dates[-1], end=dates[-1]):
+            if row["cloesing_price"] is not None:
+                result.setdefault(row["code"], row["cloesing_price"])
+
+        return result
+
+    @staticmethod
+    def _save_dated_data(trading_date: date, market: str, price_data: PriceTable):
+        """
+        儲存指定日期的 API 取得的資料
+
+        沒有資料時，只有今天以前 (回應已經確認是明確的沒有資料) 或是休市的日期才會記錄成沒有交易，
+        今天還沒公布的資料不會記錄
+        """
+
+        if (
+            price_data
+            or trading_date < date.today()
+            or not StockPrice._is_trading_day(trading_date)
+        ):
+            StockPrice._save_to_store(trading_date, market, price_data)
+
+    @staticmethod
+    def _save_to_store(trading_date: date, market: str, price_data: PriceTable):
+        if StockPrice.STORE is None:
+            return
+
+        if isinstance(price_data, LazyPriceTable):
+            with StockPrice._pending_lock:
+                StockPrice._pending_saves.append((trading_date, market, price_data))
+
+            return
+
+        StockPrice.STORE.save(trading_date, market, price_data)
+
+    @staticmethod
+    def save_pending() -> int:
+        """
+        將取得時延遲解析的資料表存入歷史資料庫，回傳存入的資料表數量
+
+        資料表會轉換成 `PriceTable` (`LazyPriceTable.materialize()`)，不再保留原始資料，
+        每日流程中和排行的爬取同時執行，不會拖慢交易資料的取得和合併
+        """
+
+        with StockPrice._pending_lock:
+            pending = StockPrice._pending_saves
+            StockPrice._pending_saves = []
+
+        for trading_date, market, price_data in pending:
+            StockPrice._save_to_store(trading_date, market, price_data.materialize())
+
+        return len(pending)
+
+    # 指定日期的 API 當天還沒有資料 (可能是還沒公布) 的回應只快取這麼久
+    EMPTY_REPLY_TTL = 10 * 60
+
+    @staticmethod
+    def _check_dated_reply(market: str, data: dict) -> bool:
+        """
+        檢查指定日期的 API 回應，回傳是否有交易資料，回應明確表示沒有資料時回傳 False，
+        其他狀態 (i.e: 查詢過於頻繁被拒絕) 時 raise RuntimeError
+        """
+
+        if market == "twse":
+            stat = data.get("stat") or ""
+
+            if stat == "OK":
+                return True
+
+            if "沒有符合條件的資料" in stat:
+                return False
+
+            raise RuntimeError(f"Error: 證交所回應的狀態不是 OK: [{stat}]")
+
+        # 櫃買中心舊版的格式沒有 stat
+        stat = str(data.get("stat", "ok"))
+
+        if stat.lower() != "ok":
+            raise RuntimeError(f"Error: 櫃買中心回應的狀態不是 ok: [{stat}]")
+
+        return bool(
+            data.get("aaData") or any(table.get("data") for table in data.get("tables") or [])
+        )
+
+    @staticmethod
+    def _dated_cache_ttl(market: str, trading_date: date, url: str):
+        """
+        指定日期的 API 回應的 `cache_ttl`
+
+        有交易資料，或是今天以前的日期明確表示沒有資料時依照 url 決定存活秒數；
+        今天還沒有資料時只快取 `EMPTY_REPLY_TTL` 秒；其他狀態的回應不快取
+        """
+
+        def cache_ttl(response: requests.Response) -> int:
+            try:
+                has_data = StockPrice._check_dated_reply(market, response.json())
+
+            except (RuntimeError, ValueError):
+                return None
+
+            if has_data or trading_date < date.today():
+                return BaseRequset.CACHE.get_ttl(url)
+
+            return StockPrice.EMPTY_REPLY_TTL
+
+        return cache_ttl
+
+    @staticmethod
+    def _expected_trading_date() -> date:
+        """每日交易資料 API 應該要有的資料日期，今天休市時往前找到最近的交易日"""
+
+        trading_date = date.today()
+
+        while not StockPrice._is_trading_day(trading_date):
+            trading_date -= timedelta(days=1)
+
+        return trading_date
+
+    @staticmethod
+    def _day_all_trading_date(market: str, data) -> date:
+        """每日交易資料 API 回應的資料日期，沒有資料時回傳 None"""
+
+        if market == "twse":
+            return datetime.strptime(data["date"], "%Y%m%d").date()
+
+        # 每一筆資料的 "Date" 都是資料日期 (民國年)
+        if data and data[0].get("Date"):
+            return StockPrice._roc_to_date(data[0]["Date"])
+
+        return None
+
+    @staticmethod
+    def _day_all_cache_ttl(market: str, url: str):
+        """
+        每日交易資料 API 回應的 `cache_ttl`
+
+        交易所還沒公布今天的資料時會回傳前一個交易日的資料，
+        資料日期比 `_expected_trading_date()` 舊的回應不快取，下次執行時會重新取得
+        """
+
+        def cache_ttl(response: requests.Response) -> int:
+            try:
+                trading_date = StockPrice._day_all_trading_date(market, response.json())
+
+            except (KeyError, TypeError, ValueError):
+                return None
+
+            if trading_date is None or trading_date < StockPrice._expected_trading_date():
+                return None
+
+            return BaseRequset.CACHE.get_ttl(url)
+
+        return cache_ttl
+
+    @staticmethod
+    def _roc_to_date(roc_date: str) -> date:
+        """將民國年的日期字串 (i.e: "1120908") 轉換成 date"""
+
+        return date(int(roc_date[:-4]) + 1911, int(roc_date[-4:-2]), int(roc_date[-2:]))
+
+    @staticmethod
+    def _translate_stock_data(stock_data: dict) -> PriceTable:
+        """
+        處理由證交所 API 取得的每日交易資訊，只留下必要的資料
+        (代碼、名稱、開高低收、成交股數)
+
+        NOTE: 會給 `StockPrice.TRADING_DATE` 複寫成 API 回傳的資料日期
+        """
+
+        result = StockPrice._translate_stock_rows(stock_data["data"])
+
+        StockPrice.TRADING_DATE = stock_data["date"]
+
+        return result
+
+    @staticmethod
+    def _translate_stock_rows(rows: list) -> PriceTable:
+        """處理證交所 API 回傳的 "data"，`LazyPriceTable` 一次轉換所有資料時也使用這個函式"""
+
+        # 這邊的處理要看 https://www.twse.com.tw/exchangeReport/STOCK_DAY_ALL 這隻 API 的回傳格式
+        return PriceTable(
+            [data[0] for data in rows],
+            [data[1] for data in rows],
+            {
+                "opening_price": PriceTable.parse_prices([data[4] for data in rows]),
+                "highest_price": PriceTable.parse_prices([data[5] for data in rows]),
+                "lowest_price": PriceTable.parse_prices([data[6] for data in rows]),
+                "cloesing_price": PriceTable.parse_prices([data[7] for data in rows]),
+            },
+            PriceTable.parse_prices([data[2] for data in rows]),
+        )
+
+    @staticmethod
+    def _translate_mainborad_data(mainborad_data: dict) -> PriceTable:
+        """
+        處理由櫃買中心 API 取得的每日交易資訊，只留下必要的資料
+        (代碼、名稱、開高低收、成交股數)
+        """
+
+        return PriceTable(
+            [data["SecuritiesCompanyCode"] for data in mainborad_data],
+            [data["CompanyName"] for data in mainborad_data],
+            {
+                "opening_price": PriceTable.parse_prices(
+                    [data["Open"] for data in mainborad_data], "----"
+                ),
+                "highest_price": PriceTable.parse_prices(
+                    [data["High"] for data in mainborad_data], "----"
+                ),
+                "lowest_price": PriceTable.parse_prices(
+                    [data["Low"] for data in mainborad_data], "----"
+                ),
+                "cloesing_price": PriceTable.parse_prices(
+                    [data["Close"] for data in mainborad_data], "----"
+                ),
+            },
+            PriceTable.parse_prices([data.get("TradingShares") for data in mainborad_data]),
+        )
+
+    @staticmethod
+    def _to_price(value: str, empty_value: str = "") -> float:
+        if not value or value == empty_value:
+            return None
+
+        return float(value.replace(",", ""))
+
+    @staticmethod
+    def _parse_stock_row(data: list) -> dict:
+        """解析證交所 API 的一列資料，回傳格式和 `PriceTable.get()` 相同"""
+
+        return {
+            "code": data[0],
+            "name": data[1],
+            "opening_price": StockPrice._to_price(data[4]),
+            "highest_price": StockPrice._to_price(data[5]),
+            "lowest_price": StockPrice._to_price(data[6]),
+            "cloesing_price": StockPrice._to_price(data[7]),
+            "volume": StockPrice._to_price(data[2]),
+        }
+
+    @staticmethod
+    def _get_stock_row_code(data: list) -> str:
+        return data[0]
+
+    @staticmethod
+    def _parse_mainborad_row(data: dict) -> dict:
+        """解析櫃買中心 API 的一列資料，回傳格式和 `PriceTable.get()` 相同"""
+
+        return {
+            "code": data["SecuritiesCompanyCode"],
+            "name": data["CompanyName"],
+            "opening_price": StockPrice._to_price(data["Open"], "----"),
+            "highest_price": StockPrice._to_price(data["High"], "----"),
+            "lowest_price": StockPrice._to_price(data["Low"], "----"),
+            "cloesing_price": StockPrice._to_price(data["Close"], "----"),
+            "volume": StockPrice._to_price(data.get("TradingShares")),
+        }
+
+    @staticmethod
+    def _get_mainborad_row_code(data: dict) -> str:
+        return data["SecuritiesCompanyCode"]
+
+    @staticmethod
+    def get_stock_day_all(lazy: bool = False) -> PriceTable:
+        """
+        根據證交所的 API 取得上市股票的每日交易資料
+
+        i.e:
+        ```
+        stock_day_all = StockPrice.get_stock_day_all()
+        stock_day_all.get("3105")
+        {
+        "code" : "3105",
+        "name" : "穩懋",
+        "opening_price" : 141.0,
+        "highest_price" : 146.0,
+        "lowest_price" : 139.0,
+        "cloesing_price" : 144.0}
+        ```
+
+        lazy (bool): 是否回傳延遲解析的 `LazyPriceTable`，延遲解析的資料要呼叫 `save_pending()` 才會存入歷史資料庫
+        """
+
+        # 收盤後執行時，今天的資料可能已經存在歷史資料庫中
+        today = date.today()
+        stored_data = StockPrice._load_from_store(today, "twse")
+
+        if stored_data is not None:
+            StockPrice.TRADING_DATE = today.strftime("%Y%m%d")
+
+            return stored_data
+
+        url = StockPrice.STOCK_DAY_ALL_URL
+        response = BaseRequset.get_requset(
+            url, cache_ttl=StockPrice._day_all_cache_ttl("twse", url)
+        )
+
+        with Metrics.timer("parse_seconds", parser="twse"):
+            stock_data = response.json()
+
+            if not lazy:
+                result = StockPrice._translate_stock_data(stock_data)
+
+            else:
+                StockPrice.TRADING_DATE = stock_data["date"]
+
+                result = LazyPriceTable(
+                    stock_data["data"],
+                    StockPrice._parse_stock_row,
+                    StockPrice._get_stock_row_code,
+                    StockPrice._translate_stock_rows,
+                )
+
+        StockPrice._save_to_store(
+            datetime.strptime(stock_data["date"], "%Y%m%d").date(), "twse", result
+        )
+
+        return result
+
+    @staticmethod
+    def get_mainborad_day_all(lazy: bool = False) -> PriceTable:
+        """
+        根據櫃買中心的 API 取得上櫃股票的每日交易資訊
+
+        回傳的資料表查詢格式和 `get_stock_day_all()` 相同
+
+        lazy (bool): 是否回傳延遲解析的 `LazyPriceTable`，延遲解析的資料要呼叫 `save_pending()` 才會存入歷史資料庫
+        """
+
+        today = date.today()
+        stored_data = StockPrice._load_from_store(today, "tpex")
+
+        if stored_data is not None:
+            StockPrice.MAINBORAD_TRADING_DATE = today.strftime("%Y%m%d")
+
+            return stored_data
+
+        url = StockPrice.MAINBORAD_DAY_ALL_URL
+        response = BaseRequset.get_requset(
+            url, cache_ttl=StockPrice._day_all_cache_ttl("tpex", url)
+        )
+
+        with Metrics.timer("parse_seconds", parser="tpex"):
+            mainborad_data = response.json()
+
+            if not lazy:
+                result = StockPrice._translate_mainborad_data(mainborad_data)
+
+            else:
+                result = LazyPriceTable(
+                    mainborad_data,
+                    StockPrice._parse_mainborad_row,
+                    StockPrice._get_mainborad_row_code,
+                    StockPrice._translate_mainborad_data,
+                )
+
+        trading_date = StockPrice._day_all_trading_date("tpex", mainborad_data)
+
+        if trading_date is not None:
+            StockPrice.MAINBORAD_TRADING_DATE = trading_date.strftime("%Y%m%d")
+            StockPrice._save_to_store(trading_date, "tpex", result)
+
+        return result
+
+    @staticmethod
+    def get_market_day_all(lazy: bool = False) -> PriceTable:
+        """
+        取得上市、上櫃股票的每日交易資料，合併成一個資料表，代碼重複時以上市的資料為準
+
+        回傳的資料表查詢格式和 `get_stock_day_all()` 相同
+
+        lazy (bool): 是否回傳延遲解析的 `LazyPriceTable`
+        """
+
+        return StockPrice.merge_market_tables(
+            StockPrice.get_stock_day_all(lazy), StockPrice.get_mainborad_day_all(lazy)
+        )
+
+    @staticmethod
+    def merge_market_tables(*tables) -> PriceTable:
+        """
+        合併上市、上櫃的資料表，代碼重複時以前面的資料表為準
+
+        全部都是 `LazyPriceTable` 時回傳 `LazyPriceTable.merge()` 合併的資料表，否則回傳 `PriceTable`
+        """
+
+        if all(isinstance(table, LazyPriceTable) for table in tables):
+            return LazyPriceTable.merge(*tables)
+
+        # 從歷史資料庫讀取的資料不是延遲解析的，統一轉換成 `PriceTable` 再合併
+        return PriceTable.merge(
+            *[table if isinstance(table, PriceTable) else table.materialize() for table in tables]
+        )
+
+    @staticmethod
+    def _translate_dated_stock_data(stock_data: dict) -> PriceTable:
+        """
+        處理由證交所每日收盤行情 (MI_INDEX) API 取得的指定日期交易資訊，只留下必要的資料
+        (代碼、名稱、開高低收、成交股數)，當天沒有交易時回傳空的資料表
+        """
+
+        # 新版的格式放在 "tables" 中，舊版的格式是 "fields1" ~ "fields9" 和 "data1" ~ "data9"
+        tables = stock_data.get("tables") or [
+            {"fields": stock_data.get(f"fields{i}"), "data": stock_data.get(f"data{i}")}
+            for i in range(1, 10)
+        ]
+
+        for table in tables:
+            fields = table.get("fields") or []
+
+            if "證券代號" in fields and "開盤價" in fields:
+                return PriceTable.from_table(
+                    fields,
+                    table.get("data") or [],
+                    ("證券代號", "證券名稱", "開盤價", "最高價", "最低價", "收盤價"),
+                    "--",
+                    "成交股數",
+                )
+
+        return PriceTable.empty()
+
+    @staticmethod
+    def _translate_dated_mainborad_data(mainborad_data: dict) -> PriceTable:
+        """
+        處理由櫃買中心上櫃股票行情 API 取得的指定日期交易資訊，只留下必要的資料
+        (代碼、名稱、開高低收、成交股數)，當天沒有交易時回傳空的資料表
+        """
+
+        field_names = ("代號", "名稱", "開盤", "最高", "最低", "收盤")
+
+        for table in mainborad_data.get("tables") or []:
+            fields = table.get("fields") or []
+
+            if all(name in fields for name in field_names):
+                return PriceTable.from_table(
+                    fields, table.get("data") or [], field_names, "----", "成交股數"
+                )
+
+        # 舊版的格式沒有欄位名稱，依序是代號、名稱、收盤、漲跌、開盤、最高、最低、均價、成交股數
+        rows = mainborad_data.get("aaData") or []
+        fields = ["代號", "名稱", "收盤", "漲跌", "開盤", "最高", "最低", "均價", "成交股數"]
+        width = min([len(fields)] + [len(row) for row in rows])
+
+        return PriceTable.from_table(
+            fields[:width], [row[:width] for row in rows], field_names, "----", "成交股數"
+        )
+
+    @staticmethod
+    def get_stock_day_by_date(trading_date: date) -> PriceTable:
+        """
+        根據證交所的 API 取得上市股票在指定日期的交易資料，當天沒有交易時回傳空的資料表
+
+        回傳的資料表查詢格式和 `get_stock_day_all()` 相同
+        """
+
+        stored_data = StockPrice._load_from_store(trading_date, "twse")
+
+        if stored_data is not None:
+            return stored_data
+
+        url = (
+            "https://www.twse.com.tw/exchangeReport/MI_INDEX?response=json&type=ALLBUT0999"
+            f"&date={trading_date.strftime('%Y%m%d')}"
+        )
+        response = BaseRequset.get_requset(
+            url, cache_ttl=StockPrice._dated_cache_ttl("twse", trading_date, url)
+        )
+
+        with Metrics.timer("parse_seconds", parser="twse_dated"):
+            stock_data = response.json()
+            has_data = StockPrice._check_dated_reply("twse", stock_data)
+            result = StockPrice._translate_dated_stock_data(stock_data)
+
+        if has_data and not result:
+            raise RuntimeError(f"Error: 無法解析證交所 {trading_date} 的交易資料")
+
+        StockPrice._save_dated_data(trading_date, "twse", result)
+
+        return result
+
+    @staticmethod
+    def get_mainborad_day_by_date(trading_date: date) -> PriceTable:
+        """
+        根據櫃買中心的 API 取得上櫃股票在指定日期的交易資料，當天沒有交易時回傳空的資料表
+
+        回傳的資料表查詢格式和 `get_stock_day_all()` 相同
+        """
+
+        stored_data = StockPrice._load_from_store(trading_date, "tpex")
+
+        if stored_data is not None:
+            return stored_data
+
+        # 櫃買中心的 API 使用民國年
+        roc_date = f"{trading_date.year - 1911}/{trading_date.month:02d}/{trading_date.day:02d}"
+
+        url = (
+            "https://www.tpex.org.tw/web/stock/aftertrading/otc_quotes_no1430/stk_wn1430_result.php"
+            f"?l=zh-tw&o=json&se=EW&d={roc_date}"
+        )
+        response = BaseRequset.get_requset(
+            url, cache_ttl=StockPrice._dated_cache_ttl("tpex", trading_date, url)
+        )
+
+        with Metrics.timer("parse_seconds", parser="tpex_dated"):
+            mainborad_data = response.json()
+            has_data = StockPrice._check_dated_reply("tpex", mainborad_data)
+            result = StockPrice._translate_dated_mainborad_data(mainborad_data)
+
+        if has_data and not result:
+            raise RuntimeError(f"Error: 無法解析櫃買中心 {trading_date} 的交易資料")
+
+        StockPrice._save_dated_data(trading_date, "tpex", result)
+
+        return result
+
+    @staticmethod
+    def get_market_day_by_date(trading_date: date) -> PriceTable:
+        """
+        取得上市、上櫃股票在指定日期的交易資料，合併成一個資料表，當天沒有交易時回傳空的資料表
+
+        回傳的資料表查詢格式和 `get_stock_day_all()` 相同
+        """
+
+        return PriceTable.merge(
+            StockPrice.get_stock_day_by_date(trading_date),
+            StockPrice.get_mainborad_day_by_date(trading_date),
+        )
+
+
+class TradingCalendar:
+    """
+    台股交易日曆
+
+    週末和證交所公告的休市日期 (`HOLIDAY_URL`) 不是交易日，每個年度的休市日期只會取得一次。
+    取得失敗 (i.e: 網路不穩、隔年的日期還沒公告) 時只排除週末，`RETRY_INTERVAL` 秒後查詢同一個年度時會再取得
+
+    i.e:
+    ```
+    calendar = TradingCalendar()
+    calendar.is_trading_day(date(2023, 10, 10))
+    False
+    calendar.next_trading_day(date(2023, 10, 6))
+    date(2023, 10, 11)
+    ```
+    """
+
+    HOLIDAY_URL = (
+        "https://www.twse.com.tw/holidaySchedule/holidaySchedule?response=json&queryYear={roc_year}"
+    )
+
+    RETRY_INTERVAL = 60 * 60
+
+    def __init__(self, holidays: list = None):
+        """
+
+        holidays (list): 公告以外的休市日期 (i.e: 颱風假)
+        """
+
+        self.extra_holidays = set(holidays or ())
+
+        # 年度 -> 休市日期
+        self._holidays = {}
+
+        # 年度 -> 上次取得失敗的時間 (time.monotonic())
+        self._failed_at = {}
+
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _parse_date(value: str) -> date:
+        """休市日期可能是西元 (i.e: "2023-10-10") 或民國年 (i.e: "112/10/10") 的格式"""
+
+        if "-" in value:
+            return date.fromisoformat(value)
+
+        return StockPrice._roc_to_date(value.replace("/", ""))
+
+    def _fetch_holidays(self, year: int) -> set:
+        """
+        取得證交所公告的休市日期
+
+        公告中名稱是 "...交易日" 的日期 (i.e: "農曆春節前最後交易日") 有交易，其他的都是休市
+        """
+
+        response = BaseRequset.get_requset(self.HOLIDAY_URL.format(roc_year=year - 1911))
+        data = response.json()
+
+        if data.get("stat", "OK").upper() != "OK" or not data.get("data"):
+            raise ValueError(f"Error: 沒有 {year} 年的休市日期")
+
+        return {
+            self._parse_date(row[0])
+            for row in data["data"]
+            if not row[1].strip().endswith("交易日")
+        }
+
+    def holidays(self, year: int) -> set:
+        """指定年度中不是週末的休市日期，取得失敗時只有 `extra_holidays`"""
+
+        with self._lock:
+            if year not in self._holidays:
+                failed_at = self._failed_at.get(year)
+
+                if failed_at is None or time.monotonic() - failed_at >= self.RETRY_INTERVAL:
+                    try:
+                        self._holidays[year] = self._fetch_holidays(year)
+
+                    except Exception as e:
+                        print(f"取得 {year} 年的休市日期失敗, 只排除週末: {e}")
+                        self._failed_at[year] = time.monotonic()
+
+            holidays = self._holidays.get(year, set())
+
+        return holidays | {day for day in self.extra_holidays if day.year == year}
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays(day.year)
+
+    def next_trading_day(self, day: date) -> date:
+        """`day` 之後 (不包含) 的第一個交易日"""
+
+        day += timedelta(days=1)
+
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+
+        return day
+
+    def previous_trading_day(self, day: date) -> date:
+        """`day` 之前 (不包含) 的最後一個交易日"""
+
+        day -= timedelta(days=1)
+
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+
+        return day
+
+    def trading_days(self, start: date, end: date) -> list:
+        """`start` ~ `end` (包含) 之間的所有交易日"""
+
+        result = []
+
+        while start <= end:
+            if self.is_trading_day(start):
+                result.append(start)
+
+            start += timedelta(days=1)
+
+        return result
+
+
+class PriceBackfill:
+    """
+    補抓一段期間的上市、上櫃每日交易資料，存入歷史資料庫 (`StockPrice.STORE`)
+
+    以 `StockPrice.get_stock_day_by_date()` 和 `get_mainborad_day_by_date()` 逐日抓取，
+    不同市場的請求同時進行，同一個 host 的請求會受到 `RateLimiter` 的頻率限制。
+    資料庫中已經有資料的日期會略過，中斷後重新執行會從沒抓到的日期繼續。
+    回應的狀態不是 OK (i.e: 查詢過於頻繁被拒絕) 的日期會失敗，不會記錄成沒有交易
+
+    i.e:
+    ```
+    StockPrice.STORE = PriceStore("data/stock_history.db")
+    PriceBackfill(date(2023, 7, 1), date(2023, 9, 30)).run()
+    ```
+    """
+
+    # 市場 -> (取得指定日期資料的函式, 請求的 url，用來區分 host)
+    MARKETS = {
+        "twse": (StockPrice.get_stock_day_by_date, "https://www.twse.com.tw/"),
+        "tpex": (StockPrice.get_mainborad_day_by_date, "https://www.tpex.org.tw/"),
+    }
+
+    def __init__(
+        self,
+        start: date,
+        end: date,
+        max_workers: int = 4,
+        requests_per_second: float = 0.5,
+        markets: tuple = ("twse", "tpex"),
+        calendar: TradingCalendar = None,
+    ):
+        """
+
+        start (date): 開始日期
+
+        end (date): 結束日期 (包含)，不會超過今天
+
+        max_workers (int): 同時進行中的抓取工作數量上限
+
+        requests_per_second (float): 每個 host 每秒的請求數量上限
+
+        markets (tuple): 要抓取的市場
+
+        calendar (TradingCalendar): 交易日曆，休市日期不會抓取，None 代表只略過週末
+        """
+
+        if StockPrice.STORE is None:
+            raise RuntimeError("Error: 補抓歷史資料前必須先設定 `StockPrice.STORE`")
+
+        self.start = start
+        self.end = min(end, date.today())
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.markets = markets
+        self.calendar = calendar
+
+    def _is_trading_day(self, trading_date: date) -> bool:
+        if self.calendar is None:
+            return trading_date.weekday() < 5
+
+        return self.calendar.is_trading_day(trading_date)
+
+    def jobs(self) -> list:
+        """
+        還沒有抓取的 (日期, 市場)，週末和休市日期不會有交易所以不會抓取。
+        交易日記錄成沒有交易的也會重新抓取 (有 HTTP 快取時，確定沒有資料的回應不會再發出請求)
+
+        回傳格式: [(date(2023, 9, 8), "twse"), ...]
+        """
+
+        result = []
+        trading_date = self.start
+
+        while trading_date <= self.end:
+            if self._is_trading_day(trading_date):
+                for market in self.markets:
+                    if not StockPrice.STORE.row_count(trading_date, market):
+                        result.append((trading_date, market))
+
+            trading_date += timedelta(days=1)
+
+        return result
+
+    def _fetch(self, trading_date: date, market: str) -> int:
+        """抓取一天一個市場的資料，回傳資料筆數"""
+
+        get_day_by_date, url = self.MARKETS[market]
+
+        self.rate_limiter.wait(url)
+
+        with Metrics.timer("backfill_seconds", market=market):
+            return len(get_day_by_date(trading_date))
+
+    def run(self) -> dict:
+        """
+        抓取所有還沒有抓取的日期，單一日期失敗時不會中斷其他日期，重新執行時會再抓取
+
+        回傳格式:
+        ```
+        {
+        "fetched" : 120,  # 有交易資料的 (日期, 市場) 數量
+        "empty" : 4,  # 沒有交易的 (日期, 市場) 數量
+        "failed" : [(date(2023, 9, 8), "twse", "錯誤訊息"), ...]
+        }
+        ```
+        """
+
+        jobs = self.jobs()
+        result = {"fetched": 0, "empty": 0, "failed": []}
+
+        if not jobs:
+            return result
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._fetch, *job): job for job in jobs}
+
+            for done_number, future in enumerate(as_completed(futures), 1):
+                trading_date, market = futures[future]
+
+                try:
+                    row_count = future.result()
+
+                except Exception as e:
+                    result["failed"].append((trading_date, market, str(e)))
+                    Metrics.increment("backfill_failed_days", market=market)
+                    continue
+
+                result["fetched" if row_count else "empty"] += 1
+
+                print(f"[{done_number}/{len(jobs)}] {trading_date} [{market}] {row_count} 筆")
+
+        return result
+
+
+class SheetLayout:
+    """
+    excel 模板的欄位配置
+
+    以宣告式的設定描述每個工作區的族群數量，和每個天數參數的增加、減少區塊位置，
+    建立時一次換算成整數的列、欄座標，寫入時直接使用 `cell(row, column)`。
+    新增天數參數或工作區只需要修改設定
+    """
+
+    # 工作區名稱 -> 族群數量
+    SHEETS = {
+        "漲跌幅-前五族群前三檔": 5,
+        "資金流向-前十族群前三檔": 10,
+    }
+
+    # (天數參數, 增加/減少) -> 區塊的族群名稱欄位代號，區塊中的其他欄位都以這個欄位為基準
+    BLOCKS = {
+        ("1day", "increase"): "A",
+        ("1week", "increase"): "N",
+        ("1month", "increase"): "AA",
+        ("3months", "increase"): "AN",
+        ("1day", "reduce"): "BA",
+        ("1week", "reduce"): "BN",
+        ("1month", "reduce"): "CA",
+        ("3months", "reduce"): "CN",
+    }
+
+    # 日期在第 4 列，資料從第 6 列開始，每個族群有 3 檔股票 (佔 3 列)
+    DATE_ROW = 4
+    DATA_START_ROW = 6
+    STOCK_NUMBER = 3
+
+    # 區塊中各欄位相對於族群名稱欄位的偏移量
+    DATA_DATE_OFFSET = 0  # 資料日期
+    TRADING_DATE_OFFSET = 1  # 交易日期
+    RANK_OFFSET = 1  # 排序
+    STOCK_DATA_OFFSET = 2  # 代號、名稱、今開、今高、今低、今收
+    NEXT_PRICE_OFFSET = 8  # 明開、明高、明低、明收
+
+    # 區塊的欄位數量 (族群名稱 ~ 明收)
+    BLOCK_WIDTH = 12
+
+    _default = None
+
+    def __init__(self):
+        self.group_columns = {
+            key: column_index_from_string(col_code) for key, col_code in self.BLOCKS.items()
+        }
+
+    @classmethod
+    def default(cls) -> "SheetLayout":
+        """取得預設的配置，只會建立一次"""
+
+        if cls._default is None:
+            cls._default = cls()
+
+        return cls._default
+
+    def group_number(self, worksheet_name: str) -> int:
+        """工作區的族群數量"""
+
+        if worksheet_name not in self.SHEETS:
+            raise ValueError(f"worksheet_name 參數錯誤, 應該是 {list(self.SHEETS)} 其中之一")
+
+        return self.SHEETS[worksheet_name]
+
+    def stock_row_number(self, worksheet_name: str) -> int:
+        """工作區中股票資料的總列數"""
+
+        return self.group_number(worksheet_name) * self.STOCK_NUMBER
+
+    def group_column(self, day_type_arg: str, direction: str) -> int:
+        """區塊的族群名稱欄位
+
+        Args:
+            day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+            direction (str): "increase" 或 "reduce"
+        """
+
+        if (day_type_arg, direction) not in self.group_columns:
+            raise ValueError("Invalid value for 'day_type'")
+
+        return self.group_columns[(day_type_arg, direction)]
+
+    def group_row(self, group_index: int) -> int:
+        """第 group_index 個族群的族群名稱所在的列"""
+
+        return self.DATA_START_ROW + group_index * self.STOCK_NUMBER
+
+    def stock_row(self, stock_index: int) -> int:
+        """第 stock_index 檔股票 (所有族群依序編號) 所在的列"""
+
+        return self.DATA_START_ROW + stock_index
+
+
+class ExcelWriter:
+    """
+    負責處理將資料寫入 excel 的類別
+
+    批次模式 (`batch=True`) 下所有寫入都只修改記憶體中的 workbook，
+    呼叫 `flush()` (或是 with 區塊正常結束) 時才一次寫入檔案
+    """
+
+    def __init__(self, base_filename: str, save_filename: str, batch: bool = False):
+        """
+
+        base_filename (str): 基本 excel 模板檔案路徑
+        save_filename (str): 要儲存的 excel 檔案路徑
+        batch (bool): 是否使用批次模式，不在每次寫入後儲存檔案
+        """
+
+        self.wb = openpyxl.load_workbook(base_filename)
+        self.save_name = save_filename
+        self.batch = batch
+        self.layout = SheetLayout.default()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # 發生錯誤時不儲存，避免留下寫到一半的檔案
+        if exc_type is None:
+            self.flush()
+
+        self.wb.close()
+
+    @staticmethod
+    def save_workbook(wb: openpyxl.Workbook, filename: str):
+        """
+        先將 workbook 寫入同一個資料夾中的暫存檔，完成後再取代目標檔案，
+        不會因為寫入途中發生錯誤而留下寫到一半的檔案
+        """
+
+        fd, tmp_filename = tempfile.mkstemp(
+            suffix=".xlsx.tmp", dir=os.path.dirname(os.path.abspath(filename))
+        )
+        os.close(fd)
+
+        try:
+            with Metrics.timer("workbook_save_seconds"):
+                wb.save(tmp_filename)
+
+            os.replace(tmp_filename, filename)
+
+        except BaseException:
+            os.remove(tmp_filename)
+            raise
+
+    def _set_cell(self, worksheet_name: str, row: int, column: int, value):
+        self.wb[worksheet_name].cell(row, column).value = value
+
+    def _auto_save(self):
+        if not self.batch:
+            self.save_workbook(self.wb, self.save_name)
+
+    def flush(self):
+        """將記憶體中的 workbook 寫入檔案"""
+
+        self.save_workbook(self.wb, self.save_name)
+
+    @staticmethod
+    def _cell_value(value):
+        """沒有資料時以 "null" 代替"""
+
+        return value if value else "null"
+
+    def _write_data(self, data: list, worksheet_name: str, group_col: int):
+        """將一個區塊的資料寫入至 excel 中
+
+        Args:
+            data (list): 要寫入的資料
+            worksheet_name (str): 要寫入至哪個分頁的名稱
+            group_col (int): 區塊的族群名稱欄位 i.e: 1 (A 欄)
+
+        data 的格式要符合：
+        ```
+        [
+            {
+                "group" : "砷化鎵",
+                "data" : [
+                    {
+                        "code" : "3105",
+                        "name" : "穩懋",
+                        "opening_price" : 141.0,
+                        "highest_price" : 146.0,
+                        "lowest_price" : 139.0,
+                        "cloesing_price" : 144.0
+                    }, ...]
+            }, ....
+        ]
+        ```
+        """
+
+        layout = self.layout
+        stock_col = group_col + layout.STOCK_DATA_OFFSET
+
+        # 控制族群名稱
+        for i in range(layout.group_number(worksheet_name)):
+            # 寫入族群名稱
+            self._set_cell(worksheet_name, layout.group_row(i), group_col, data[i]["group"])
+
+            # 控制每個族群中的三筆資料
+            for j, stock_data in enumerate(data[i]["data"][: layout.STOCK_NUMBER]):
+                row = layout.stock_row(i * layout.STOCK_NUMBER + j)
+
+                # 寫入各項資料
+                for k, key in enumerate(("code", "name") + PriceTable.PRICE_FIELDS):
+                    self._set_cell(
+                        worksheet_name, row, stock_col + k, self._cell_value(stock_data[key])
+                    )
+
+        self._auto_save()
+
+    def _write_stock_data(self, stock_data: dict, day_type_arg: str, worksheet_name: str):
+        """將股票交易資料寫入 execl
+
+        stock_data (dict): 股票的交易資料
+
+        day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+
+        worksheet_name (str): 要將資料寫入至哪個工作區 (漲跌幅-前五族群前三檔, 資金流向-前十族群前三檔)
+
+        stock_data 的資料格式必須符合 `_BaseCrawler.get_data()` 生成的資料格式
+        """
+
+        for direction in ("increase", "reduce"):
+            self._write_data(
+                stock_data[direction],
+                worksheet_name,
+                self.layout.group_column(day_type_arg, direction),
+            )
+
+    def write_statement_dog_data(self, stock_data: dict, day_type_arg: str):
+        """
+        將財報狗的資料寫入 excel
+
+        stock_data (dict): 股票的交易資料
+
+        day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+
+        stock_data 的資料格式必須符合 `_BaseCrawler.get_data()` 生成的資料格式
+        """
+
+        self._write_stock_data(stock_data, day_type_arg, "漲跌幅-前五族群前三檔")
+
+    def write_cmoney_data(self, stock_data: dict, day_type_arg: str):
+        """
+        將 CMoney 資料寫入 excel
+
+        stock_data (dict): 股票的交易資料
+
+        day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+
+        stock_data 的資料格式必須符合 `_BaseCrawler.get_data()` 生成的資料格式
+        """
+
+        self._write_stock_data(stock_data, day_type_arg, "資金流向-前十族群前三檔")
+
+    def write_date(self, data_date: str, trading_date: str):
+        """寫入日期資料
+
+        Args:
+            data_date (str): 資料日期
+            trading_date (str): 交易日期
+        """
+
+        layout = self.layout
+
+        for worksheet_name in layout.SHEETS:
+            for group_col in layout.group_columns.values():
+                row = layout.DATE_ROW
+
+                self._set_cell(worksheet_name, row, group_col + layout.DATA_DATE_OFFSET, data_date)
+                self._set_cell(
+                    worksheet_name, row, group_col + layout.TRADING_DATE_OFFSET, trading_date
+                )
+
+        self._auto_save()
+
+
+class ExcelTemplate:
+    """
+    excel 模板的描述
+
+    以唯讀模式讀取一次模板，只保留每個工作區中有值的儲存格和它們的數值格式，
+    同一個模板檔案在同一個程序中只會讀取一次
+    """
+
+    _cache = {}
+
+    def __init__(self, filename: str):
+        """
+
+        filename (str): 模板檔案路徑
+        """
+
+        wb = openpyxl.load_workbook(filename, read_only=True)
+
+        # 工作區名稱 -> {(列, 欄) : 數值}
+        self.cells = {}
+
+        # 工作區名稱 -> {(列, 欄) : 數值格式}，只記錄不是 "General" 的格式
+        self.number_formats = {}
+
+        for ws in wb.worksheets:
+            cells = {}
+            number_formats = {}
+
+            for row in ws.iter_rows():
+                for cell in row:
+                    if cell.value is None:
+                        continue
+
+                    cells[(cell.row, cell.column)] = cell.value
+
+                    if cell.number_format != "General":
+                        number_formats[(cell.row, cell.column)] = cell.number_format
+
+            self.cells[ws.title] = cells
+            self.number_formats[ws.title] = number_formats
+
+        wb.close()
+
+    @property
+    def sheet_names(self) -> list:
+        return list(self.cells)
+
+    @classmethod
+    def load(cls, filename: str) -> "ExcelTemplate":
+        """讀取模板，檔案沒有變更時直接使用之前讀取的結果"""
+
+        key = (os.path.abspath(filename), os.path.getmtime(filename))
+
+        if key not in cls._cache:
+            cls._cache[key] = cls(filename)
+
+        return cls._cache[key]
+
+
+class StreamingExcelWriter(ExcelWriter):
+    """
+    以 openpyxl 的 write-only 模式輸出 excel
+
+    不會把模板載入成完整的 workbook，只保留模板描述 (`ExcelTemplate`) 和實際寫入的儲存格，
+    `flush()` 時再依照列的順序一次串流寫出。記憶體用量和寫入時間只和寫入的資料量有關，
+    適合一次產生大量歷史資料的檔案
+
+    NOTE: 只會保留模板的數值和數值格式，字型、框線、欄寬等樣式不會保留
+
+    寫入的介面和 `ExcelWriter` 相同，一定是批次模式
     """
 
-    @staticmethod
-    def get_requset(url: str):
-        response = requests.get(url)
+    def __init__(self, base_filename: str, save_filename: str):
+        """
 
-        if response.status_code != 200:
-            raise RuntimeError(f"Response error, status code: [{response.status_code}]")
+        base_filename (str): 基本 excel 模板檔案路徑
+        save_filename (str): 要儲存的 excel 檔案路徑
+        """
 
-        return response
+        self.template = ExcelTemplate.load(base_filename)
+        self.save_name = save_filename
+        self.batch = True
+        self.layout = SheetLayout.default()
 
+        # 工作區名稱 -> {(列, 欄) : 數值}，模板中會被區塊資料覆蓋的儲存格不會保留
+        self._cells = {}
 
-class _BaseCrawler:
+        for worksheet_name, cells in self.template.cells.items():
+            self._cells[worksheet_name] = dict(cells)
+
+            if worksheet_name in self.layout.SHEETS:
+                self._clear_data_cells(worksheet_name)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def _clear_data_cells(self, worksheet_name: str):
+        """移除模板中區塊的族群名稱和股票資料，避免留下模板中的範例資料"""
+
+        layout = self.layout
+        cells = self._cells[worksheet_name]
+        rows = range(
+            layout.DATA_START_ROW, layout.stock_row(layout.stock_row_number(worksheet_name))
+        )
+
+        for group_col in layout.group_columns.values():
+            for row in rows:
+                for offset in range(layout.BLOCK_WIDTH):
+                    # 保留排序欄位 (1-1, 1-2, ...)
+                    if offset != layout.RANK_OFFSET:
+                        cells.pop((row, group_col + offset), None)
+
+    def _set_cell(self, worksheet_name: str, row: int, column: int, value):
+        self._cells[worksheet_name][(row, column)] = value
+
+    def flush(self):
+        """依照列的順序將所有工作區串流寫入檔案"""
+
+        wb = openpyxl.Workbook(write_only=True)
+
+        for worksheet_name in self.template.sheet_names:
+            ws = wb.create_sheet(worksheet_name)
+            number_formats = self.template.number_formats[worksheet_name]
+
+            rows = defaultdict(dict)
+
+            for (row, column), value in self._cells[worksheet_name].items():
+                rows[row][column] = value
+
+            for row in range(1, max(rows, default=0) + 1):
+                values = rows.get(row)
+
+                if not values:
+                    ws.append([])
+                    continue
+
+                row_cells = [None] * max(values)
+
+                for column, value in values.items():
+                    number_format = number_formats.get((row, column))
+
+                    if number_format is not None:
+                        value = WriteOnlyCell(ws, value)
+                        value.number_format = number_format
+
+                    row_cells[column - 1] = value
+
+                ws.append(row_cells)
+
+        self.save_workbook(wb, self.save_name)
+
+
+class ExeclUpdater:
     """
-    針對 CMoney 和 財報狗爬蟲的 interface
+    更新前一天的 execl 檔案的股票資訊
     """
 
-    def _get_group_data(self) -> list:
+    def __init__(self, filename: str):
         """
-        取得產業類別的資料
 
-        回傳格式:
-        ```
-        [
-            {"name" : "IC-設計", "url" : "http...."},...
-        ]
-        ```
+        filename (str): 要更新的 excel 檔案路徑
         """
 
-        raise NotImplementedError
+        self.wb = openpyxl.load_workbook(filename)
+        self.save_name = filename
+        self.layout = SheetLayout.default()
 
-    def _get_increase_reduce_group_data(self, day_type_arg: str = "1day") -> dict:
+    def _write_data(self, worksheet_name: str, price_data: PriceTable):
+        """將資料寫入至指定的工作區
+
+        Args:
+            worksheet_name (str): 工作區名稱
+            price_data (PriceTable): 上市、上櫃股票的交易資料
         """
-        取得增加、減少的產業類別的資料
+
+        s1 = self.wb[worksheet_name]
+        layout = self.layout
+
+        for group_col in layout.group_columns.values():
+            stock_code_col = group_col + layout.STOCK_DATA_OFFSET
+            next_price_col = group_col + layout.NEXT_PRICE_OFFSET
+
+            for j in range(layout.stock_row_number(worksheet_name)):
+                row = layout.stock_row(j)
+                stock_code = s1.cell(row, stock_code_col).value
+
+                if not stock_code:
+                    continue
+
+                data = price_data.get(str(stock_code))
+
+                for k, field in enumerate(PriceTable.PRICE_FIELDS):
+                    s1.cell(row, next_price_col + k).value = (
+                        data[field] if data and data[field] else "null"
+                    )
+
+    def update_file(self, price_data: PriceTable):
+        """更新股票資料
 
         Args:
+            price_data (PriceTable): 上市、上櫃股票的交易資料
+        """
 
-        day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+        for worksheet_name in self.layout.SHEETS:
+            self._write_data(worksheet_name, price_data)
 
-        回傳格式:
-        ```
-        {
-        "increase" : [{"name" : "砷化鎵", "url" : "http...."}, ...],
-        "reduce" : [{"name" : "家電", "url" : "http...."}, ...]
-        }
-        ```
+        ExcelWriter.save_workbook(self.wb, self.save_name)
+
+    @staticmethod
+    def update_workbook(filename: str, price_data: PriceTable) -> str:
+        """更新指定的 excel 檔案，給 process pool 使用，回傳更新的檔案路徑"""
+
+        excel_updater = ExeclUpdater(filename)
+        excel_updater.update_file(price_data)
+        excel_updater.wb.close()
+
+        return filename
+
+    @staticmethod
+    def _update_workbook_with_metrics(filename: str, price_data: PriceTable) -> tuple:
+        """
+        給 process pool 使用的 `update_workbook`，
+        會一併回傳這次更新的計量資料 (`Metrics.snapshot()`)，讓主 process 合併
         """
 
-        raise NotImplementedError
+        # process 會重複使用 (同一個 process 會更新多個檔案)，先清除上一個檔案的資料避免重複計算
+        Metrics.reset()
 
-    def _get_top_3_stock_of_group_data(self, url: str, group_name: str) -> dict:
+        return ExeclUpdater.update_workbook(filename, price_data), Metrics.snapshot()
+
+    @staticmethod
+    def inspect_file(filename: str) -> tuple:
         """
-        取得產業類別的前三名股票資料
+        以唯讀模式檢查 excel 檔案
 
-        Args:
+        回傳 (交易日期, 是否有股票的隔日開高低收欄位還是空的)，
+        沒有交易日期時回傳的交易日期是 None
 
-        url (str): 產業類別的股票詳細頁面 url
+        NOTE: 更新時隔日沒有資料的股票 (i.e: 暫停交易、下市) 會寫入 "null"，代表已經更新過，不會再次更新
+        """
 
-        group_name (str): 產業類別名稱
+        layout = SheetLayout.default()
+        wb = openpyxl.load_workbook(filename, read_only=True)
+
+        try:
+            trading_date = None
+            needs_update = False
+
+            for worksheet_name in layout.SHEETS:
+                s1 = wb[worksheet_name]
+
+                # 每個區塊的交易日期都相同，取第一個區塊的就好
+                if trading_date is None:
+                    group_col = layout.group_column("1day", "increase")
+                    trading_date = s1.cell(
+                        layout.DATE_ROW, group_col + layout.TRADING_DATE_OFFSET
+                    ).value
+
+                rows = list(
+                    s1.iter_rows(
+                        min_row=layout.DATA_START_ROW,
+                        max_row=layout.stock_row(layout.stock_row_number(worksheet_name) - 1),
+                        values_only=True,
+                    )
+                )
 
-        回傳格式:
-        ```
-        {
-        "group" : "砷化鎵",
-        "data" : [["3105", "穩懋"], ["2455", "全新"], ["8086", "宏捷科"]]
-        }
-        ```
+                for group_col in layout.group_columns.values():
+                    code_i = group_col + layout.STOCK_DATA_OFFSET - 1
+                    price_i = group_col + layout.NEXT_PRICE_OFFSET - 1
+
+                    for row in rows:
+                        if len(row) <= code_i or not row[code_i]:
+                            continue
+
+                        next_prices = row[price_i : price_i + len(PriceTable.PRICE_FIELDS)]
+
+                        if len(next_prices) < len(PriceTable.PRICE_FIELDS) or any(
+                            value is None for value in next_prices
+                        ):
+                            needs_update = True
+
+        finally:
+            wb.close()
+
+        if isinstance(trading_date, datetime):
+            trading_date = trading_date.date()
+
+        elif isinstance(trading_date, str):
+            trading_date = datetime.strptime(trading_date, "%Y-%m-%d").date()
+
+        else:
+            trading_date = None
+
+        return trading_date, needs_update
+
+
+class BulkExeclUpdater:
+    """
+    一次更新資料夾中所有還缺少隔日開高低收資料的 excel 檔案
+
+    依照每個檔案的交易日期找出下一個交易日 (遇到假日會往後找)，
+    每個交易日的股價只會取得一次，再以多個 process 同時更新檔案
+    """
+
+    def __init__(self, data_dir: str, max_workers: int = None, calendar: TradingCalendar = None):
         """
 
-        raise NotImplementedError
+        data_dir (str): excel 檔案所在的資料夾
 
-    def _get_data(self, day_type_arg: str = "1day") -> dict:
+        max_workers (int): 同時更新檔案的 process 數量，預設為 CPU 數量
+
+        calendar (TradingCalendar): 交易日曆，休市日期不會查詢交易資料，None 代表只略過週末
         """
-        取得增加、減少的產業類別資料，和股票的資料
 
-        Args:
+        self.data_dir = data_dir
+        self.max_workers = max_workers
+        self.calendar = calendar
 
-        day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+        # 日期 -> 當天的交易資料，沒有交易的日期是空的資料表
+        self.price_cache = {}
 
-        回傳格式:
-        ```
-        {
-        "increase" : [
-            {
-                "group" : "砷化鎵",
-                "data" : [["3105" : "穩懋"], ...]
-            }, ...],
-        "reduce" : [
-            {
-                "group" : "LCD塑膠框",
-                "data" : [["2371" : "大同"]. ...]
-            }, ...]
-        }
-        ```
+    def scan(self) -> list:
         """
+        找出需要更新的檔案，excel 開啟檔案時產生的暫存檔 (`~$` 開頭) 會略過，
+        無法讀取的檔案會印出錯誤後略過
 
-        raise NotImplementedError
+        回傳格式: [("data/2023-09-08.xlsx", date(2023, 9, 8)), ...]
+        """
 
-    def get_data(
-        self, Listed_price_data: dict, OTC_price_data: dict, day_type_arg: str = "1day"
-    ) -> dict:
+        result = []
+
+        for filename in sorted(glob.glob(os.path.join(self.data_dir, "*.xlsx"))):
+            if os.path.basename(filename).startswith("~$"):
+                continue
+
+            try:
+                trading_date, needs_update = ExeclUpdater.inspect_file(filename)
+
+            except Exception as e:
+                print(f"無法讀取 [{filename}], 略過: {e}")
+                continue
+
+            if trading_date is not None and needs_update:
+                result.append((filename, trading_date))
+
+        return result
+
+    def get_price_data(self, trading_date: date) -> PriceTable:
+        """取得指定日期的交易資料，同一個日期只會取得一次"""
+
+        if trading_date not in self.price_cache:
+            self.price_cache[trading_date] = StockPrice.get_market_day_by_date(trading_date)
+
+        return self.price_cache[trading_date]
+
+    def get_next_trading_price_data(self, trading_date: date) -> tuple:
         """
-        取得最終處裡完的資料。
-        換句話說，就是取得增加、減少的產業資料和股票名稱、代碼，和開高低收資料
+        取得指定日期的下一個交易日的交易資料
 
-        Args:
+        回傳 (下一個交易日, 交易資料)，到今天為止都還沒有下一個交易日的資料時回傳 (None, None)
+        """
 
-        Listed_price_data (dict): 上市公司股票交易資料
+        next_date = trading_date + timedelta(days=1)
 
-        OTC_price_data (dict): 上櫃公司股票交易資料
+        while next_date <= date.today():
+            # 週末和休市日期不會有交易
+            if next_date.weekday() < 5 and (
+                self.calendar is None or self.calendar.is_trading_day(next_date)
+            ):
+                price_data = self.get_price_data(next_date)
 
-        data_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+                if len(price_data):
+                    return next_date, price_data
 
-        回傳格式:
-        ```
-        {
-        "increase" : [
-            {"group" : "砷化鎵", "data" : [
-                {"code" : "3105", "name" : "穩懋", "opening_price" : 101.1, "highest_price" : 120.0, "lowest_price" : 100.0, "cloesing_price" : 102.2}, ...]
-            }, ...],
-        "reduce: [....]
-        }
-        ```
+            next_date += timedelta(days=1)
+
+        return None, None
+
+    def update_all(self) -> list:
         """
+        更新所有需要更新的檔案
 
-        result = defaultdict(list)
-        meta_data = self._get_data(day_type_arg)
+        回傳更新的檔案路徑
+        """
 
-        for k in meta_data:
-            for group_data in meta_data[k]:
-                tmp = {}
-                tmp["group"] = group_data["group"]
-                tmp["data"] = []
+        jobs = []
 
-                for stock in group_data["data"]:
-                    if Listed_price_data.get(stock[0]):
-                        tmp["data"].append(Listed_price_data[stock[0]])
+        for filename, trading_date in self.scan():
+            # 取得失敗 (i.e: 被拒絕、回應錯誤) 時不能略過那一天，這次先不更新，下次執行時再更新
+            try:
+                next_date, price_data = self.get_next_trading_price_data(trading_date)
 
-                    elif OTC_price_data.get(stock[0]):
-                        tmp["data"].append(OTC_price_data[stock[0]])
+            except Exception as e:
+                print(f"取得 [{filename}] 隔日的交易資料失敗, 下次執行時再更新: {e}")
+                continue
 
-                    else:
-                        # 如果找不到股票資料
-                        tmp["data"].append(
-                            {
-                                "code": stock[0],
-                                "name": stock[1],
-                                "opening_price": None,
-                                "highest_price": None,
-                                "lowest_price": None,
-                                "cloesing_price": None,
-                            }
-                        )
+            if next_date is not None:
+                jobs.append((filename, price_data))
 
-                result[k].append(tmp)
+        if not jobs:
+            return []
 
-        return result
+        # openpyxl 的讀取和儲存是 CPU bound，使用多個 process 才能同時處理。
+        # 這裡是在 pipeline 的 thread 中執行，其他 thread 可能正持有 lock (`Metrics`、快取、sqlite)，
+        # fork 出來的 process 會帶著被持有的 lock 而卡住，所以使用 spawn 建立新的 process
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = [
+                executor.submit(ExeclUpdater._update_workbook_with_metrics, filename, price_data)
+                for filename, price_data in jobs
+            ]
 
+            result = []
 
-class StatementDogCrawler(_BaseCrawler):
-    """
-    財報狗爬蟲
+            for future in futures:
+                filename, snapshot = future.result()
+                Metrics.merge(snapshot)
+                result.append(filename)
 
-    使用 API 和解析 HTML 獲得資料
+            return result
+
+
+class Pipeline:
+    """
+    以相依關係 (DAG) 描述的執行流程
+
+    每個階段在它相依的階段都完成後就會被丟進 thread pool 中執行，互不相依的階段會同時執行，
+    整體的執行時間會接近最慢的那條相依路徑，而不是所有階段的總和
+
+    i.e:
+    ```
+    pipeline = Pipeline()
+    pipeline.add_stage("a", lambda: 1)
+    pipeline.add_stage("b", lambda: 2)
+    pipeline.add_stage("sum", lambda a, b: a + b, depends_on=("a", "b"))
+    pipeline.run()["sum"]
+    3
+    ```
     """
 
-    def _get_increase_reduce_group_data(self, day_type_arg: str = "1day") -> dict:
-        response = BaseRequset.get_requset(
-            f"https://statementdog.com/api/v1/market-trend/tw/{day_type_arg}"
-        )
+    def __init__(self, max_workers: int = None):
+        """
 
-        datas = response.json()["data"]
+        max_workers (int): 同時執行的階段數量上限，預設為階段的數量
+        """
 
-        if not datas:
-            raise RuntimeError(f"Error: 取得財報狗 [{day_type_arg}] 的增加減少產業族群資料時發生錯誤.")
+        self.max_workers = max_workers
 
-        sorted_datas = sorted(datas, key=lambda i: i["diff_percentage"], reverse=True)
+        # 階段名稱 -> (函式, 相依的階段名稱)
+        self.stages = {}
 
-        get_group_data = lambda s: [{"name": d["name"], "url": d["url"]} for d in sorted_datas[s]]
+        # 階段名稱 -> 執行秒數
+        self.stage_times = {}
 
-        increase = get_group_data(slice(0, 5))
+    def add_stage(self, name: str, func, depends_on: tuple = ()):
+        """
+        加入一個階段
 
-        reduce = get_group_data(slice(-1, -6, -1))
+        Args:
+            name (str): 階段名稱
+            func (callable): 要執行的函式，會依照 `depends_on` 的順序傳入相依階段的結果
+            depends_on (tuple): 相依的階段名稱
+        """
 
-        result = {}
+        if name in self.stages:
+            raise ValueError(f"Error: 階段 [{name}] 已經存在.")
 
-        result["increase"] = increase
-        result["reduce"] = reduce
+        self.stages[name] = (func, tuple(depends_on))
 
-        return result
+    def _check(self):
+        """檢查相依的階段是否都存在，並且沒有循環相依"""
+
+        for name, (_, depends_on) in self.stages.items():
+            for dependency in depends_on:
+                if dependency not in self.stages:
+                    raise ValueError(f"Error: 階段 [{name}] 相依的階段 [{dependency}] 不存在.")
+
+        visited = set()
+        visiting = set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+
+            if name in visiting:
+                raise ValueError(f"Error: 階段 [{name}] 有循環相依.")
+
+            visiting.add(name)
+
+            for dependency in self.stages[name][1]:
+                visit(dependency)
+
+            visiting.remove(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _run_stage(self, name: str, results: dict):
+        func, depends_on = self.stages[name]
+        start_time = time.perf_counter()
+
+        try:
+            return func(*[results[dependency] for dependency in depends_on])
+
+        finally:
+            self.stage_times[name] = time.perf_counter() - start_time
+            Metrics.observe("stage_seconds", self.stage_times[name], stage=name)
+
+    def run(self) -> dict:
+        """
+        執行所有階段，回傳每個階段的結果
+
+        任何一個階段發生錯誤時，不會再開始新的階段，等待執行中的階段結束後拋出該錯誤
+
+        回傳格式:
+        ```
+        {"階段名稱" : 結果, ...}
+        ```
+        """
+
+        self._check()
+
+        results = {}
+        pending = dict(self.stages)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers or len(self.stages) or 1) as executor:
+            running = {}
+
+            while pending or running:
+                for name in [
+                    name
+                    for name, (_, depends_on) in pending.items()
+                    if all(dependency in results for dependency in depends_on)
+                ]:
+                    running[executor.submit(self._run_stage, name, results)] = name
+                    del pending[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    name = running.pop(future)
+                    error = future.exception()
+
+                    if error is not None:
+                        wait(running)
+                        raise error
+
+                    results[name] = future.result()
+
+        return results
+
+
+class DailyPipeline:
+    """
+    每日執行的完整流程
+
+    各階段的相依關係:
+    ```
+    twse_prices ─┐
+    tpex_prices ─┴─ prices ─┬──────────────────────────────── update_previous
+                            ├──────────────────────────────── store_prices
+                            ├─ statementdog ─┬─ excel
+    statementdog_rankings ──┘                ├─ store_rankings
+                            ┌─ cmoney ───────┘
+    cmoney_rankings ────────┘
+    ```
+    上市、上櫃的交易資料，和財報狗、CMoney 的排行資料會同時爬取，
+    排行資料只有在和交易資料合併時才需要等待交易資料。
+    延遲解析的交易資料在 store_prices 階段才會完整解析並存入歷史資料庫，不會拖慢合併
+    有成分股索引時，另外會有以本機資料計算排行並和爬取的排行比較的 cross_check 階段
+
+    有設定 `Checkpoint` 時，各市場的交易資料、各來源和天數參數的排行、每個產業類別頁面，
+    以及寫入 excel、儲存排行、更新之前的檔案都是獨立的工作，中斷後重新執行只會執行還沒完成的工作
+
+    沒有給爬蟲時會建立新的爬蟲，CMoney 的瀏覽器在爬取完排行後就會關閉；
+    給了爬蟲的話 (i.e: `DailyDaemon` 跨日重複使用) 由呼叫的一方負責關閉
+    """
+
+    DAY_TYPE_ARGS = ["1day", "1week", "1month", "3months"]
+
+    def __init__(
+        self,
+        base_dir: str,
+        is_headless: bool = False,
+        use_selenium: bool = False,
+        streaming: bool = False,
+        update_previous: bool = True,
+        statement_dog_parser: str = "auto",
+        checkpoint: Checkpoint = None,
+        membership_index: GroupMembershipIndex = None,
+        refresh_index: bool = False,
+        statement_dog_crawler: StatementDogCrawler = None,
+        cmoney_crawler: CMoneyCrawler = None,
+        calendar: TradingCalendar = None,
+        run_date: date = None,
+        expected_trading_date: date = None,
+    ):
+        """
 
-    def _get_top_3_stock_of_group_data(self, url: str, group_name: str) -> dict:
-        response = BaseRequset.get_requset(f"{url}?country=tw")
+        base_dir (str): 專案目錄，模板 `base.xlsx` 和 `data` 資料夾的位置
 
-        soup = BeautifulSoup(response.text, "html.parser")
+        is_headless (bool): CMoney 使用瀏覽器時是否為無頭模式
 
-        tbody = soup.find("tbody", id="stock-tags-list-body")
+        use_selenium (bool): CMoney 是否一律使用瀏覽器爬取
 
-        items = tbody.find_all("td", class_="stock-tags-list-item ticker-name")
+        streaming (bool): 是否使用 `StreamingExcelWriter` 輸出 excel
 
-        stock_list = []
+        update_previous (bool): 是否更新之前還缺少隔日資料的檔案
 
-        for item in items:
-            code_name = item.text.replace("\n", "").split(" ")
+        statement_dog_parser (str): 財報狗產業類別頁面的解析器，參考 `StatementDogCrawler.PARSERS`
 
-            # 針對像 [1111, "iphone", "12"] 這樣的資料進行處理
-            if len(code_name) > 2:
-                code_name = [code_name[0], "".join(code_name[1:])]
+        checkpoint (Checkpoint): 工作紀錄，None 代表不紀錄、不重試
 
-            stock_list.append(code_name)
+        membership_index (GroupMembershipIndex): 成分股索引，None 代表每次都爬取產業類別頁面
 
-        stock_list = stock_list[:3]
+        refresh_index (bool): 爬取排行前是否先完整更新成分股索引
 
-        result = {}
+        statement_dog_crawler (StatementDogCrawler): 要使用的財報狗爬蟲，None 代表依照 `statement_dog_parser` 建立
 
-        result["group"] = group_name
-        result["data"] = stock_list
+        cmoney_crawler (CMoneyCrawler): 要使用的 CMoney 爬蟲，None 代表依照 `is_headless` 和 `use_selenium` 建立
 
-        return result
+        calendar (TradingCalendar): 更新之前的檔案時使用的交易日曆，None 代表只略過週末
 
-    def _get_data(self, day_type_arg: str = "1day") -> dict:
-        result = defaultdict(list)
+        run_date (date): 輸出的 excel 檔名和資料日期，None 代表今天
 
-        group_stock_data = self._get_increase_reduce_group_data(day_type_arg)
+        expected_trading_date (date): 交易資料必須是這一天的，交易所還沒更新時取得交易資料的工作會失敗，
+        None 代表不檢查
+        """
 
-        for k in group_stock_data:
-            for group in group_stock_data[k]:
-                increase_reduce = self._get_top_3_stock_of_group_data(group["url"], group["name"])
+        self.base_dir = base_dir
+        self.data_dir = os.path.join(base_dir, "data")
+        self.streaming = streaming
+        self.update_previous = update_previous
 
-                result[k].append(increase_reduce)
+        self.today_date = (run_date or date.today()).strftime("%Y-%m-%d")
+        self.expected_trading_date = expected_trading_date
 
-        return result
+        self.owns_crawlers = cmoney_crawler is None
 
+        if statement_dog_crawler is None:
+            statement_dog_crawler = StatementDogCrawler(parser=statement_dog_parser)
 
-class CMoneyCrawler(_BaseCrawler):
-    """
+        if cmoney_crawler is None:
+            cmoney_crawler = CMoneyCrawler(is_headless=is_headless, use_selenium=use_selenium)
 
-    CMoney 爬蟲
+        self.statement_dog_crawler = statement_dog_crawler
+        self.cmoney_crawler = cmoney_crawler
+        self.calendar = calendar
 
-    使用 selenium
-    """
+        self.ranking_store = RankingStore(os.path.join(self.data_dir, "stock_history.db"))
 
-    def __init__(self, is_headless: bool = True):
-        options = None
+        self.checkpoint = checkpoint
+        self.membership_index = membership_index
+        self.refresh_index = refresh_index
 
-        if is_headless:
-            options = webdriver.ChromeOptions()
-            options.add_argument("--headless=new")
+        for crawler in (self.statement_dog_crawler, self.cmoney_crawler):
+            crawler.checkpoint = checkpoint
+            crawler.membership_index = membership_index
 
-        self.driver = webdriver.Chrome(options=options)
+    def _task(self, name: str, func):
+        """將 `func` 包裝成以 `self.checkpoint` 執行的工作"""
 
-    def _get_group_data(self) -> list:
-        result = []
+        if self.checkpoint is None:
+            return func
 
-        items = self.driver.find_element(By.ID, "MainContent").find_elements(By.TAG_NAME, "tr")
+        return lambda *args: self.checkpoint.run(name, func, *args)
 
-        # 取前 10 個
-        for item in items[1:11]:
-            url = item.find_element(By.TAG_NAME, "a").get_attribute("href")
+    def _check_trading_date(self, market: str, trading_date: str, url: str):
+        """
+        有指定 `expected_trading_date` 時，確認取得的是那一天的交易資料
 
-            group_meta_data = item.text.split(" ")
+        交易所還沒更新時刪除 url 的 HTTP 快取 (不然存活時間內重試都會拿到同樣的資料) 並 raise `RetryLaterError`，
+        失敗的工作不會被記錄，稍後重新執行時會重新取得
+        """
 
-            # 防止名稱出現像 "概念股_iPhone 12" 這種情況
-            # 這邊的 7 這個數字是依據 https://www.cmoney.tw/finance/f00018.aspx?o=1&o2=1 這個網頁上的表格欄位數量
-            if len(group_meta_data) > 7:
-                name = "".join(group_meta_data[0 : len(group_meta_data) - 7 + 1])
+        if self.expected_trading_date is None:
+            return
 
-            else:
-                name = group_meta_data[0]
+        expected_date = self.expected_trading_date.strftime("%Y%m%d")
 
-            tmp = {"name": name, "url": url}
+        if trading_date == expected_date:
+            return
 
-            result.append(tmp)
+        if BaseRequset.CACHE is not None:
+            BaseRequset.CACHE.invalidate(url)
 
-        return result
+        raise RetryLaterError(
+            f"Error: [{market}] 交易資料的日期是 {trading_date}, 交易所還沒更新 {expected_date} 的資料"
+        )
 
-    def _get_increase_reduce_group_data(self, day_type_arg: str = "1day") -> dict:
-        if day_type_arg == "1day":
-            url_arg = 1
-        elif day_type_arg == "1week":
-            url_arg = 2
-        elif day_type_arg == "1month":
-            url_arg = 3
-        elif day_type_arg == "3months":
-            url_arg = 4
-        else:
-            raise ValueError("Invalid value for 'day_arg'")
+    def _get_twse_prices(self) -> tuple:
+        """回傳 (資料日期, 上市股票交易資料)，讓從紀錄中回復時也能設定 `StockPrice.TRADING_DATE`"""
 
-        # 增加和減少的 url
-        top_url = f"https://www.cmoney.tw/finance/f00018.aspx?o=1&o2={url_arg}"
-        last_url = f"https://www.cmoney.tw/finance/f00018.aspx?o=2&o2={url_arg}"
+        price_data = StockPrice.get_stock_day_all(lazy=True)
+        self._check_trading_date("twse", StockPrice.TRADING_DATE, StockPrice.STOCK_DAY_ALL_URL)
 
-        result = {}
+        return StockPrice.TRADING_DATE, price_data
 
-        self.driver.get(top_url)
-        locator = (By.CLASS_NAME, "up")
-        WebDriverWait(self.driver, 10).until(
-            EC.presence_of_all_elements_located(locator),
-            f"Error: 取得增加頁面的資料時出現錯誤, day_type_arg: [{day_type_arg}]",
+    def _get_tpex_prices(self) -> LazyPriceTable:
+        price_data = StockPrice.get_mainborad_day_all(lazy=True)
+        self._check_trading_date(
+            "tpex", StockPrice.MAINBORAD_TRADING_DATE, StockPrice.MAINBORAD_DAY_ALL_URL
         )
-        top_group_data = self._get_group_data()
 
-        self.driver.get(last_url)
-        locator = (By.CLASS_NAME, "down")
-        WebDriverWait(self.driver, 10).until(
-            EC.presence_of_all_elements_located(locator),
-            f"Error: 取得減少頁面的資料時出現錯誤, day_type_arg: [{day_type_arg}]",
-        )
-        last_group_data = self._get_group_data()
+        return price_data
 
-        result["increase"] = top_group_data
-        result["reduce"] = last_group_data
+    def _restore_twse_prices(self) -> PriceTable:
+        StockPrice.TRADING_DATE, price_data = self._task("prices/twse", self._get_twse_prices)()
 
-        return result
+        return price_data
 
-    def _get_top_3_stock_of_group_data(self, url: str, group_name: str) -> dict:
-        result = {}
+    @staticmethod
+    def _trading_date() -> date:
+        return datetime.strptime(StockPrice.TRADING_DATE, "%Y%m%d").date()
 
-        self.driver.get(url)
-        locator = (By.CLASS_NAME, "bk-clr")
-        WebDriverWait(self.driver, 10).until(
-            EC.presence_of_all_elements_located(locator), f"Error: 取得前三名股票頁面的資料時出現錯誤, url: {url}"
-        )
+    def _get_rankings(self, crawler: _BaseCrawler) -> dict:
+        if self.membership_index is not None and self.refresh_index:
+            changed_number = crawler.refresh_membership_index(self.DAY_TYPE_ARGS)
+            print(f"更新 [{crawler.SOURCE}] 成分股索引, {changed_number} 個頁面有變動")
 
-        stock_table = self.driver.find_element(By.ID, "table1").find_elements(By.TAG_NAME, "tr")
+        return crawler._get_datas(self.DAY_TYPE_ARGS)
 
-        result["group"] = group_name
-        result["data"] = []
+    def _get_cmoney_rankings(self) -> dict:
+        if not self.owns_crawlers:
+            return self._get_rankings(self.cmoney_crawler)
 
-        for i in stock_table[1:4]:
-            data = i.text.split(" ")
-            code = data[1]
-            name = data[2]
+        with self.cmoney_crawler as cmoney_crawler:
+            return self._get_rankings(cmoney_crawler)
 
-            result["data"].append([code, name])
+    @staticmethod
+    def _merge_rankings(meta_datas: dict, price_data: PriceTable) -> dict:
+        return {
+            day_type_arg: _BaseCrawler._merge_price_data(meta_data, price_data)
+            for day_type_arg, meta_data in meta_datas.items()
+        }
 
-        return result
+    def _write_excel(self, statement_dog_datas: dict, cmoney_datas: dict) -> str:
+        """將所有資料寫入今天的 excel，回傳檔案路徑"""
 
-    def _get_data(self, day_type_arg: str = "1day") -> dict:
-        result = defaultdict(list)
+        base_filename = os.path.join(self.base_dir, "base.xlsx")
+        save_filename = os.path.join(self.data_dir, f"{self.today_date}.xlsx")
 
-        data = self._get_increase_reduce_group_data(day_type_arg)
+        if self.streaming:
+            excel = StreamingExcelWriter(base_filename, save_filename)
 
-        for i in data:
-            for d in data[i]:
-                stock_data = self._get_top_3_stock_of_group_data(d["url"], d["name"])
+        else:
+            excel = ExcelWriter(base_filename, save_filename, batch=True)
 
-                result[i].append(stock_data)
+        with excel:
+            excel.write_date(self.today_date, self._trading_date().strftime("%Y-%m-%d"))
 
-        return result
+            for day_arg in self.DAY_TYPE_ARGS:
+                excel.write_statement_dog_data(statement_dog_datas[day_arg], day_arg)
+                excel.write_cmoney_data(cmoney_datas[day_arg], day_arg)
 
-    def close_driver(self):
-        """關閉瀏覽器 driver"""
+        return save_filename
 
-        self.driver.close()
+    def _store_rankings(self, statement_dog_datas: dict, cmoney_datas: dict):
+        trading_date = self._trading_date()
 
+        for source, datas in (("statementdog", statement_dog_datas), ("cmoney", cmoney_datas)):
+            for day_arg, stock_data in datas.items():
+                self.ranking_store.save(trading_date, source, day_arg, stock_data)
 
-class StockPrice:
-    """
-    取得股票的每日交易價格相關的類別
-    """
+    def _cross_check_rankings(self, statement_dog_datas: dict) -> dict:
+        """
+        以成分股索引和歷史資料庫在本機計算排行，和爬取的財報狗排行比較
 
-    TRADING_DATE = None
+        本機排行是成分股的等權重漲跌幅，和財報狗的漲跌幅排行是同一種指標；
+        CMoney 的排行是資金流向，和本機排行不能比較，所以不比較 CMoney
 
-    @staticmethod
-    def _translate_stock_data(stock_data: dict) -> dict:
+        回傳格式:
+        ```
+        {"statementdog" : {"1day" : <GroupRankingEngine.compare() 的回傳格式>, ...}}
+        ```
         """
-        處理由證交所 API 取得的每日交易資訊，只留下必要的資料
-        (代碼、名稱、開高低收)
 
-        NOTE: 會給 `StockPrice.TRADING_DATE` 複寫成 API 回傳的資料日期
-        """
+        source = StatementDogCrawler.SOURCE
+        engine = GroupRankingEngine.from_store(
+            StockPrice.STORE,
+            self.membership_index.group_members(source),
+            self._trading_date(),
+            self.calendar,
+        )
 
-        result = {}
+        if engine.missing_dates:
+            print(
+                f"[{source}] 歷史資料庫缺少 {len(engine.missing_dates)} 個交易日的資料 "
+                f"(最近的是 {engine.missing_dates[-1]})，期間包含這些日期的天數參數不會比較"
+            )
 
-        # 這邊的處理要看 https://www.twse.com.tw/exchangeReport/STOCK_DAY_ALL 這隻 API 的回傳格式
-        for data in stock_data["data"]:
-            tmp = {
-                "code": data[0],
-                "name": data[1],
-                "opening_price": float(data[4].replace(",", "")) if data[4] else None,
-                "highest_price": float(data[5].replace(",", "")) if data[5] else None,
-                "lowest_price": float(data[6].replace(",", "")) if data[6] else None,
-                "cloesing_price": float(data[7].replace(",", "")) if data[7] else None,
-            }
+        overlaps = {
+            day_arg: engine.compare(stock_data, day_arg)
+            for day_arg, stock_data in statement_dog_datas.items()
+        }
 
-            result[data[0]] = tmp
+        for day_arg, overlap in overlaps.items():
+            if all(value is None for value in overlap.values()):
+                continue
 
-        StockPrice.TRADING_DATE = stock_data["date"]
+            print(
+                f"[{source}] [{day_arg}] 本機排行和爬取排行的重疊比例: "
+                + ", ".join(
+                    f"{direction} {value:.0%}"
+                    for direction, value in overlap.items()
+                    if value is not None
+                )
+            )
 
-        return result
+        return {source: overlaps}
 
-    @staticmethod
-    def _translate_mainborad_data(mainborad_data: dict) -> dict:
-        """
-        處理由櫃買中心 API 取得的每日交易資訊，只留下必要的資料
-        (代碼、名稱、開高低收)
-        """
+    def _update_previous_files(self, price_data: PriceTable) -> list:
+        bulk_updater = BulkExeclUpdater(self.data_dir, calendar=self.calendar)
 
-        result = {}
+        # 今天取得的交易資料可以直接使用，不用再依日期取得一次
+        bulk_updater.price_cache[self._trading_date()] = price_data
 
-        for data in mainborad_data:
-            tmp = {
-                "code": data["SecuritiesCompanyCode"],
-                "name": data["CompanyName"],
-                "opening_price": float(data["Open"]) if data["Open"] != "----" else None,
-                "highest_price": float(data["High"]) if data["High"] != "----" else None,
-                "lowest_price": float(data["Low"]) if data["Low"] != "----" else None,
-                "cloesing_price": float(data["Close"]) if data["Close"] != "----" else None,
-            }
+        return bulk_updater.update_all()
 
-            result[data["SecuritiesCompanyCode"]] = tmp
+    def build(self) -> Pipeline:
+        """建立每日流程的 `Pipeline`"""
 
-        return result
+        pipeline = Pipeline()
 
-    @staticmethod
-    def get_stock_day_all() -> dict:
-        """
-        根據證交所的 API 取得上市股票的每日交易資料
+        pipeline.add_stage("twse_prices", self._restore_twse_prices)
+        pipeline.add_stage(
+            "tpex_prices",
+            self._task("prices/tpex", self._get_tpex_prices),
+        )
+        pipeline.add_stage(
+            "prices", StockPrice.merge_market_tables, depends_on=("twse_prices", "tpex_prices")
+        )
 
-        i.e:
-        ```
-        {
-        "3105" : {
-        "code" : "3105",
-        "name" : "穩懋",
-        "opening_price" : 141.0,
-        "highest_price" : 146.0,
-        "lowest_price" : 139.0,
-        "cloesing_price" : 144.0}, ...
-        }
-        ```
-        """
+        pipeline.add_stage(
+            "statementdog_rankings", lambda: self._get_rankings(self.statement_dog_crawler)
+        )
+        pipeline.add_stage("cmoney_rankings", self._get_cmoney_rankings)
 
-        response = BaseRequset.get_requset("https://www.twse.com.tw/exchangeReport/STOCK_DAY_ALL")
+        pipeline.add_stage(
+            "statementdog", self._merge_rankings, depends_on=("statementdog_rankings", "prices")
+        )
+        pipeline.add_stage("cmoney", self._merge_rankings, depends_on=("cmoney_rankings", "prices"))
 
-        return StockPrice._translate_stock_data(response.json())
+        pipeline.add_stage(
+            "excel",
+            self._task("stage/excel", self._write_excel),
+            depends_on=("statementdog", "cmoney"),
+        )
+        pipeline.add_stage(
+            "store_rankings",
+            self._task("stage/store_rankings", self._store_rankings),
+            depends_on=("statementdog", "cmoney"),
+        )
 
-    @staticmethod
-    def get_mainborad_day_all() -> dict:
-        """
-        根據櫃買中心的 API 取得上櫃股票的每日交易資訊
+        pipeline.add_stage(
+            "store_prices", lambda _: StockPrice.save_pending(), depends_on=("prices",)
+        )
 
-        i.e:
-        ```
-        {
-        "3105" : {
-        "code" : "3105",
-        "name" : "穩懋",
-        "opening_price" : 141.0,
-        "highest_price" : 146.0,
-        "lowest_price" : 139.0,
-        "cloesing_price" : 144.0}, ...
-        }
-        ```
-        """
+        # 本機排行需要成分股和歷史交易資料 (store_prices 之後今天的交易資料才會在資料庫中)
+        if self.membership_index is not None and StockPrice.STORE is not None:
+            pipeline.add_stage(
+                "cross_check",
+                lambda statement_dog_datas, _: self._cross_check_rankings(statement_dog_datas),
+                depends_on=("statementdog", "store_prices"),
+            )
 
-        response = BaseRequset.get_requset(
-            "https://www.tpex.org.tw/openapi/v1/tpex_mainboard_quotes"
-        )
+        # 和原本的流程相同，今天的 excel 寫入之後才更新之前的檔案，更新失敗時今天的檔案已經輸出
+        if self.update_previous:
+            update_previous_files = self._task("stage/update_previous", self._update_previous_files)
+            pipeline.add_stage(
+                "update_previous",
+                lambda price_data, _: update_previous_files(price_data),
+                depends_on=("prices", "excel"),
+            )
 
-        return StockPrice._translate_mainborad_data(response.json())
+        return pipeline
 
+    def run(self) -> dict:
+        """執行每日流程，回傳每個階段的結果，格式和 `Pipeline.run()` 相同"""
 
-class ExcelWriter:
-    """
-    負責處理將資料寫入 excel 的類別
-    """
+        pipeline = self.build()
 
-    def __init__(self, base_filename: str, save_filename: str):
-        """
+        # 重複使用的爬蟲中還有之前執行時的頁面快取
+        for crawler in (self.statement_dog_crawler, self.cmoney_crawler):
+            crawler.group_page_cache.clear()
 
-        base_filename (str): 基本 excel 模板檔案路徑
-        save_filename (str): 要儲存的 excel 檔案路徑
-        """
+        self.cmoney_crawler.page_load_times.clear()
 
-        self.wb = openpyxl.load_workbook(base_filename)
-        self.save_name = save_filename
+        try:
+            return pipeline.run()
 
-    def _write_data(
-        self,
-        data: dict,
-        group_number: int,
-        worksheet_name: str,
-        group_col_code: str,
-        data_col_start: str,
-        data_col_end: str,
-    ):
-        """將資料寫入至 excel 中
+        finally:
+            self.ranking_store.close()
 
-        Args:
-            data (dict): 要寫入的資料
-            group_number (int): 族群的數量
-            worksheet_name (str): 要寫入至哪個分頁的名稱
-            group_col_code (str): 族群名稱的欄位代號 i.e: "A"
-            data_col_start (str): 資料範圍的開始欄位代號 i.e: "C"
-            data_col_end (str): 資料範圍的結束欄位代號 i.e: "H"
+            # 中斷時也保存已經爬取的成分股
+            if self.membership_index is not None:
+                self.membership_index.save()
 
-        data 的格式要符合：
-        ```
-        [
-            {
-                "group" : "砷化鎵",
-                "data" : [
-                    {
-                        "code" : "3105",
-                        "name" : "穩懋",
-                        "opening_price" : 141.0,
-                        "highest_price" : 146.0,
-                        "lowest_price" : 139.0,
-                        "cloesing_price" : 144.0
-                    }, ...]
-            }, ....
-        ]
-        ```
-        """
+    def report(self, results: dict):
+        """顯示 `run()` 寫入和更新的檔案，以及計量資料的摘要"""
 
-        s1 = self.wb[worksheet_name]
+        print(f"寫入 [{results['excel']}]")
 
-        # 控制族群名稱
-        for i in range(group_number):
-            # 寫入族群名稱
-            s1[f"{group_col_code}{6 + (i*3)}"].value = data[i]["group"]
+        for filename in results.get("update_previous", []):
+            print(f"更新 [{filename}]")
 
-            if not data[i]["data"]:
-                continue
+        for crawler in (self.statement_dog_crawler, self.cmoney_crawler):
+            cache_stats = crawler.group_page_cache.stats()
+            Metrics.increment("group_page_cache_hits", cache_stats["hits"], source=crawler.SOURCE)
+            Metrics.increment(
+                "group_page_cache_misses", cache_stats["misses"], source=crawler.SOURCE
+            )
 
-            # 控制每個族群中的三筆資料
-            for j in range(3):
-                n = i * 3 + j
+        print(Metrics.summary())
 
-                cell_range = s1[f"{data_col_start}{6 + n}":f"{data_col_end}{6 + n}"]
 
-                stcok_data = data[i]["data"][j]
+class DailyDaemon:
+    """
+    常駐模式
 
-                # 寫入各項資料
-                cell_range[0][0].value = stcok_data["code"] if stcok_data["code"] else "null"
-                cell_range[0][1].value = stcok_data["name"] if stcok_data["name"] else "null"
-                cell_range[0][2].value = (
-                    stcok_data["opening_price"] if stcok_data["opening_price"] else "null"
-                )
-                cell_range[0][3].value = (
-                    stcok_data["highest_price"] if stcok_data["highest_price"] else "null"
-                )
-                cell_range[0][4].value = (
-                    stcok_data["lowest_price"] if stcok_data["lowest_price"] else "null"
-                )
-                cell_range[0][5].value = (
-                    stcok_data["cloesing_price"] if stcok_data["cloesing_price"] else "null"
-                )
+    在同一個程序中，每個交易日 (`TradingCalendar`) 的 `run_at` 時間執行一次 `DailyPipeline`。
+    HTTP session、爬蟲 (包含 CMoney 的瀏覽器)、歷史資料庫、成分股索引、交易日曆和 streaming 模式的模板描述
+    都會跨日重複使用，每次執行只需要爬取資料，不用再 import 套件、啟動瀏覽器、建立連線和讀取模板
 
-        self.wb.save(self.save_name)
+    執行失敗時會在 `RETRY_INTERVAL` 秒後從中斷的地方繼續 (`Checkpoint`)，同一天最多失敗 `MAX_ATTEMPTS` 次。
+    交易所還沒更新當天的交易資料時不會輸出前一個交易日的資料，每 `RETRY_INTERVAL` 秒重新執行一次，
+    直到第一次執行後的 `PUBLISH_WAIT` 秒為止 (不計入 `MAX_ATTEMPTS`)
 
-    def _write_stock_data(self, stock_data: dict, day_type_arg: str, worksheet_name: str):
-        """將股票交易資料寫入 execl
+    i.e:
+    ```
+    daemon = DailyDaemon(base_dir, run_at="17:00")
+    daemon.run_forever()
+    ```
+    """
 
-        stock_data (dict): 股票的交易資料
+    RETRY_INTERVAL = 10 * 60
 
-        day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+    MAX_ATTEMPTS = 3
 
-        worksheet_name (str): 要將資料寫入至哪個工作區 (漲跌幅-前五族群前三檔, 資金流向-前十族群前三檔)
+    # 等待交易所更新當天資料的時間，櫃買中心的 OpenAPI 有時到晚上才會更新
+    PUBLISH_WAIT = 6 * 60 * 60
 
-        stock_data 的資料格式必須符合 `_BaseCrawler.get_data()` 生成的資料格式
+    def __init__(
+        self,
+        base_dir: str,
+        run_at: str = "17:00",
+        calendar: TradingCalendar = None,
+        is_headless: bool = True,
+        use_selenium: bool = False,
+        streaming: bool = False,
+        update_previous: bool = True,
+        statement_dog_parser: str = "auto",
+        membership_index: GroupMembershipIndex = None,
+        refresh_index: bool = False,
+        retries: int = 2,
+        prometheus: str = None,
+    ):
         """
 
-        if worksheet_name == "漲跌幅-前五族群前三檔":
-            group_number = 5
+        base_dir (str): 專案目錄，模板 `base.xlsx` 和 `data` 資料夾的位置
 
-        elif worksheet_name == "資金流向-前十族群前三檔":
-            group_number = 10
+        run_at (str): 每個交易日開始執行的時間 (i.e: "17:00")，要在證交所和櫃買中心更新當天的資料之後
 
-        else:
-            raise ValueError("worksheet_name 參數錯誤, 應該是 '漲跌幅-前五族群前三檔' 或 '資金流向-前十族群前三檔'")
+        calendar (TradingCalendar): 交易日曆，None 代表建立新的交易日曆
 
-        if day_type_arg == "1day":
-            raise_group_col_code = "A"
-            raise_data_col_start_code = "C"
-            raise_data_col_end_code = "H"
+        retries (int): 每個工作失敗後最多重試的次數，參考 `Checkpoint`
 
-            reduce_group_col_code = "BA"
-            reduce_data_col_start_code = "BC"
-            recude_data_col_end_code = "BH"
+        prometheus (str): 每次執行後將計量資料以 Prometheus 文字格式寫入這個檔案
 
-        elif day_type_arg == "1week":
-            raise_group_col_code = "N"
-            raise_data_col_start_code = "P"
-            raise_data_col_end_code = "U"
+        其他參數參考 `DailyPipeline`
+        """
 
-            reduce_group_col_code = "BN"
-            reduce_data_col_start_code = "BP"
-            recude_data_col_end_code = "BU"
+        self.base_dir = base_dir
+        self.data_dir = os.path.join(base_dir, "data")
+        self.run_at = datetime.strptime(run_at, "%H:%M").time()
+        self.calendar = calendar if calendar is not None else TradingCalendar()
+        self.streaming = streaming
+        self.update_previous = update_previous
+        self.membership_index = membership_index
+        self.refresh_index = refresh_index
+        self.retries = retries
+        self.prometheus = prometheus
 
-        elif day_type_arg == "1month":
-            raise_group_col_code = "AA"
-            raise_data_col_start_code = "AC"
-            raise_data_col_end_code = "AH"
+        self.statement_dog_crawler = StatementDogCrawler(parser=statement_dog_parser)
+        self.cmoney_crawler = CMoneyCrawler(is_headless=is_headless, use_selenium=use_selenium)
 
-            reduce_group_col_code = "CA"
-            reduce_data_col_start_code = "CC"
-            recude_data_col_end_code = "CH"
+        # 最後一個執行過 (成功或放棄) 的日期
+        self.last_run_date = None
 
-        elif day_type_arg == "3months":
-            raise_group_col_code = "AN"
-            raise_data_col_start_code = "AP"
-            raise_data_col_end_code = "AU"
+        self._stop = threading.Event()
 
-            reduce_group_col_code = "CN"
-            reduce_data_col_start_code = "CP"
-            recude_data_col_end_code = "CU"
+    def checkpoint_filename(self, day: date) -> str:
+        return os.path.join(self.data_dir, ".checkpoint", f"{day:%Y-%m-%d}.pkl")
 
-        else:
-            raise ValueError("Invalid value for 'day_type'")
+    def is_done(self, day: date) -> bool:
+        """這一天是否已經執行過，重新啟動時已經有當天的 excel 且沒有中斷紀錄的話就不會再執行"""
 
-        self._write_data(
-            stock_data["increase"],
-            group_number,
-            worksheet_name,
-            raise_group_col_code,
-            raise_data_col_start_code,
-            raise_data_col_end_code,
-        )
-        self._write_data(
-            stock_data["reduce"],
-            group_number,
-            worksheet_name,
-            reduce_group_col_code,
-            reduce_data_col_start_code,
-            recude_data_col_end_code,
-        )
+        if self.last_run_date is not None and day <= self.last_run_date:
+            return True
 
-    def write_statement_dog_data(self, stock_data: dict, day_type_arg: str):
+        return os.path.exists(
+            os.path.join(self.data_dir, f"{day:%Y-%m-%d}.xlsx")
+        ) and not os.path.exists(self.checkpoint_filename(day))
+
+    def next_run(self, now: datetime) -> datetime:
         """
-        將財報狗的資料寫入 excel
+        下一次執行的時間
 
-        stock_data (dict): 股票的交易資料
+        今天是交易日且還沒執行過時是今天的 `run_at` (已經過了的話就是 `now`)，否則是下一個交易日的 `run_at`
+        """
 
-        day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+        today = now.date()
 
-        stock_data 的資料格式必須符合 `_BaseCrawler.get_data()` 生成的資料格式
-        """
+        if self.calendar.is_trading_day(today) and not self.is_done(today):
+            return max(now, datetime.combine(today, self.run_at))
 
-        self._write_stock_data(stock_data, day_type_arg, "漲跌幅-前五族群前三檔")
+        return datetime.combine(self.calendar.next_trading_day(today), self.run_at)
 
-    def write_cmoney_data(self, stock_data: dict, day_type_arg: str):
-        """
-        將 CMoney 資料寫入 excel
+    def warm_up(self):
+        """預先建立 HTTP 連線、讀取今年的休市日期和模板，使用瀏覽器爬取時預先啟動一個瀏覽器"""
 
-        stock_data (dict): 股票的交易資料
+        BaseRequset.get_session()
+        self.calendar.holidays(date.today().year)
 
-        day_type_arg (str): 指定天數參數 (1day, 1week, 1month, 3months)
+        if self.streaming:
+            ExcelTemplate.load(os.path.join(self.base_dir, "base.xlsx"))
 
-        stock_data 的資料格式必須符合 `_BaseCrawler.get_data()` 生成的資料格式
-        """
+        if self.cmoney_crawler.use_selenium:
+            with self.cmoney_crawler.driver_pool.acquire():
+                pass
 
-        self._write_stock_data(stock_data, day_type_arg, "資金流向-前十族群前三檔")
+    def run_once(self, day: date) -> dict:
+        """執行一次每日流程，回傳格式和 `DailyPipeline.run()` 相同"""
 
-    def write_date(self, data_date: str, trading_date: str):
-        """寫入日期資料
+        Metrics.reset()
 
-        Args:
-            data_date (str): 資料日期
-            trading_date (str): 交易日期
-        """
+        checkpoint = Checkpoint(self.checkpoint_filename(day), self.retries)
 
-        data_date_col = ["A4", "N4", "AA4", "AN4", "BA4", "BN4", "CA4", "CN4"]
-        tading_date_col = ["B4", "O4", "AB4", "AO4", "BB4", "BO4", "CB4", "CO4"]
+        if checkpoint.restored:
+            print(f"從上次中斷的地方繼續執行, 已完成 {len(checkpoint.restored)} 個工作")
 
-        s1 = self.wb["漲跌幅-前五族群前三檔"]
-        s2 = self.wb["資金流向-前十族群前三檔"]
+        daily_pipeline = DailyPipeline(
+            self.base_dir,
+            streaming=self.streaming,
+            update_previous=self.update_previous,
+            checkpoint=checkpoint,
+            membership_index=self.membership_index,
+            refresh_index=self.refresh_index,
+            statement_dog_crawler=self.statement_dog_crawler,
+            cmoney_crawler=self.cmoney_crawler,
+            calendar=self.calendar,
+            run_date=day,
+            expected_trading_date=day,
+        )
 
-        for col in data_date_col:
-            s1[col].value = data_date
-            s2[col].value = data_date
+        results = daily_pipeline.run()
 
-        for col in tading_date_col:
-            s1[col].value = trading_date
-            s2[col].value = trading_date
+        checkpoint.clear()
 
-        self.wb.save(self.save_name)
+        daily_pipeline.report(results)
 
+        if self.prometheus:
+            Metrics.write_prometheus(self.prometheus)
 
-class ExeclUpdater:
-    """
-    更新前一天的 execl 檔案的股票資訊
-    """
+        return results
 
-    def __init__(self, filename: str):
-        """
+    def run_day(self, day: date) -> bool:
+        """執行這一天的每日流程，失敗時等待後重試，回傳是否成功"""
 
-        filename (str): 要更新的 excel 檔案路徑
-        """
+        deadline = time.monotonic() + self.PUBLISH_WAIT
+        failures = 0
 
-        self.wb = openpyxl.load_workbook(filename)
-        self.save_name = filename
+        try:
+            while True:
+                try:
+                    self.run_once(day)
+                    return True
 
-    def _write_data(
-        self,
-        worksheet_name: str,
-        data_number: int,
-        stock_price_all_day: dict,
-        mainborad_price_all_day: dict,
-    ):
-        """將資料寫入至指定的工作區
+                except RetryLaterError as e:
+                    if time.monotonic() + self.RETRY_INTERVAL > deadline:
+                        print(f"{day} 交易所一直沒有更新資料, 放棄執行: {e}")
+                        return False
 
-        Args:
-            worksheet_name (str): 工作區名稱
-            data_number (int): 資料的總數
-            stock_price_all_day (dict): 上市股票的交易資料
-            mainborad_price_all_day (dict): 上櫃股票的交易資料
-        """
+                    print(f"{day} 交易所還沒更新資料, 稍後重新執行: {e}")
 
-        s1 = self.wb[worksheet_name]
+                except Exception as e:
+                    failures += 1
+                    print(f"{day} 第 {failures} 次執行失敗: {e!r}")
 
-        stock_code_col = ["C", "P", "AC", "AP", "BC", "BP", "CC", "CP"]
-        stock_data_col = [
-            ["I", "L"],
-            ["V", "Y"],
-            ["AI", "AL"],
-            ["AV", "AY"],
-            ["BI", "BL"],
-            ["BV", "BY"],
-            ["CI", "CL"],
-            ["CV", "CY"],
-        ]
+                    if failures == self.MAX_ATTEMPTS:
+                        return False
 
-        for i, col in enumerate(stock_code_col):
-            for j in range(data_number):
-                stock_code = s1[f"{col}{6 + j}"].value
+                if self._stop.wait(self.RETRY_INTERVAL):
+                    return False
 
-                if stock_code:
-                    if stock_price_all_day.get(str(stock_code)):
-                        data = stokc_price_all_day[str(stock_code)]
+        finally:
+            self.last_run_date = day
 
-                    elif mainborad_price_all_day.get(str(stock_code)):
-                        data = mainborad_price_all_day[str(stock_code)]
+    def run_forever(self):
+        """依照交易日曆持續執行，直到呼叫 `stop()`"""
 
-                    else:
-                        data = {
-                            "opening_price": None,
-                            "highest_price": None,
-                            "lowest_price": None,
-                            "cloesing_price": None,
-                        }
-
-                else:
-                    continue
+        self.warm_up()
 
-                data_cell_range = s1[
-                    f"{stock_data_col[i][0]}{6 + j}":f"{stock_data_col[i][1]}{6 + j}"
-                ]
+        while not self._stop.is_set():
+            run_time = self.next_run(datetime.now())
+            print(f"下次執行時間: {run_time:%Y-%m-%d %H:%M}")
 
-                data_cell_range[0][0].value = (
-                    data["opening_price"] if data["opening_price"] else "null"
-                )
-                data_cell_range[0][1].value = (
-                    data["highest_price"] if data["highest_price"] else "null"
-                )
-                data_cell_range[0][2].value = (
-                    data["lowest_price"] if data["lowest_price"] else "null"
-                )
-                data_cell_range[0][3].value = (
-                    data["cloesing_price"] if data["cloesing_price"] else "null"
-                )
+            if self._stop.wait(max((run_time - datetime.now()).total_seconds(), 0)):
+                break
 
-        self.wb.save(self.save_name)
+            print(f"{'-' * 5} 開始執行 {run_time:%Y-%m-%d} 的每日流程 {'-' * 5}")
+            self.run_day(run_time.date())
 
-    def update_file(self, stock_price_all_day: dict, mainborad_price_all_day: dict):
-        """更新股票資料
+    def stop(self):
+        """讓 `run_forever()` 在目前的等待或執行結束後停止"""
 
-        Args:
-            stock_price_all_day (dict): 上市股票的交易資料
-            mainborad_price_all_day (dict): 上櫃股票的交易資料
-        """
+        self._stop.set()
 
-        self._write_data("漲跌幅-前五族群前三檔", 15, stock_price_all_day, mainborad_price_all_day)
-        self._write_data("資金流向-前十族群前三檔", 30, stock_price_all_day, mainborad_price_all_day)
+    def close(self):
+        """關閉瀏覽器、HTTP session 和歷史資料庫，保存成分股索引"""
 
+        self.cmoney_crawler.close_driver()
+        BaseRequset.close()
 
-if __name__ == "__main__":
-    # 取得今天日期
-    today_date = datetime.now().strftime("%Y-%m-%d")
+        if StockPrice.STORE is not None:
+            StockPrice.STORE.close()
 
-    base_dir = os.path.abspath(os.path.dirname(__name__))
+        if self.membership_index is not None:
+            self.membership_index.save()
 
-    statement_dog_crawler = StatementDogCrawler()
-    stokc_price = StockPrice()
-    excel = ExcelWriter(
-        os.path.join(base_dir, "base.xlsx"), os.path.join(base_dir, "data", f"{today_date}.xlsx")
-    )
 
-    print("取得股票交易資料....")
-    stokc_price_all_day = stokc_price.get_stock_day_all()
-    mainborad_price_all_day = stokc_price.get_mainborad_day_all()
-    print("處理完成")
+def main(argv: list = None) -> dict:
+    """
+    命令列進入點
+
+    i.e:
+    ```bash
+    python main.py --headless --streaming
+    ```
+    """
 
-    excel.write_date(
-        today_date,
-        datetime.strftime(datetime.strptime(stokc_price.TRADING_DATE, "%Y%m%d"), "%Y-%m-%d"),
+    parser = argparse.ArgumentParser(description="爬取財報狗和 CMoney 的資料並整合至 excel 中")
+    parser.add_argument(
+        "--base-dir",
+        default=os.path.abspath(os.path.dirname(__file__)),
+        help="專案目錄，模板 base.xlsx 和 data 資料夾的位置",
+    )
+    parser.add_argument("--headless", action="store_true", help="CMoney 使用無頭模式的瀏覽器")
+    parser.add_argument("--selenium", action="store_true", help="CMoney 一律使用瀏覽器爬取")
+    parser.add_argument("--streaming", action="store_true", help="使用 write-only 模式輸出 excel")
+    parser.add_argument("--offline", action="store_true", help="只使用 HTTP 快取，不發出任何請求")
+    parser.add_argument("--no-update", action="store_true", help="不更新之前還缺少隔日資料的檔案")
+    parser.add_argument(
+        "--statementdog-parser",
+        choices=StatementDogCrawler.PARSERS,
+        default="auto",
+        help="財報狗產業類別頁面的解析器",
+    )
+    parser.add_argument(
+        "--membership-index",
+        action="store_true",
+        help="使用成分股索引 (data/group_index.json)，索引還沒過期的產業類別不會再爬取頁面",
+    )
+    parser.add_argument(
+        "--refresh-index",
+        action="store_true",
+        help="先完整爬取所有產業類別頁面更新成分股索引 (會一併啟用 --membership-index)",
+    )
+    parser.add_argument(
+        "--index-max-age", type=float, default=7, help="成分股索引可以使用的天數，預設 7 天"
     )
+    parser.add_argument(
+        "--retries", type=int, default=2, help="每個工作 (頁面、排行、寫入等) 失敗後最多重試的次數"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="忽略上次中斷的執行紀錄，所有工作重新執行"
+    )
+    parser.add_argument(
+        "--backfill",
+        nargs=2,
+        metavar=("START", "END"),
+        type=date.fromisoformat,
+        help="補抓 START ~ END (i.e: 2023-07-01 2023-09-30) 的每日交易資料存入歷史資料庫，不執行每日流程",
+    )
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=0.5,
+        help="補抓歷史資料時每個網站每秒的請求數量上限，預設 0.5",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="常駐執行，每個交易日的 --run-at 時間執行一次，瀏覽器、連線和模板會跨日重複使用",
+    )
+    parser.add_argument(
+        "--run-at", default="17:00", help="常駐執行時每個交易日開始執行的時間，預設 17:00"
+    )
+    parser.add_argument("--metrics-log", help="將計量資料以 JSON 格式逐行寫入這個檔案")
+    parser.add_argument("--prometheus", help="結束時將計量資料以 Prometheus 文字格式寫入這個檔案")
 
-    day_args_list = ["1day", "1week", "1month", "3months"]
+    args = parser.parse_args(argv)
 
-    print(f"{'-' * 5} 爬取財報狗資料 {'-' * 5}")
+    Metrics.LOG_FILE = args.metrics_log
 
-    for day_arg in day_args_list:
-        print(f"取得 [{day_arg}] 資料...")
+    data_dir = os.path.join(args.base_dir, "data")
 
-        statement_dog_data = statement_dog_crawler.get_data(
-            stokc_price_all_day, mainborad_price_all_day, day_arg
-        )
+    BaseRequset.CACHE = HttpDiskCache(os.path.join(data_dir, ".http_cache"), offline=args.offline)
+    StockPrice.STORE = PriceStore(os.path.join(data_dir, "stock_history.db"))
 
-        print("爬取完成")
+    calendar = TradingCalendar()
+    StockPrice.CALENDAR = calendar
 
-        print("寫入 excel...")
+    if args.backfill:
+        try:
+            backfill_result = PriceBackfill(
+                *args.backfill, requests_per_second=args.requests_per_second, calendar=calendar
+            ).run()
 
-        excel.write_statement_dog_data(statement_dog_data, day_arg)
+        finally:
+            BaseRequset.close()
+            StockPrice.STORE.close()
 
-        print("寫入完成")
+        for trading_date, market, error in backfill_result["failed"]:
+            print(f"{trading_date} [{market}] 抓取失敗: {error}")
 
-    print(f"{'-' * 5} 財報狗資料處理完畢 {'-' * 5}")
+        print(
+            f"補抓完成, 有交易 {backfill_result['fetched']} 筆, 沒有交易 {backfill_result['empty']} 筆, "
+            f"失敗 {len(backfill_result['failed'])} 筆 (重新執行會再抓取)"
+        )
+        print(Metrics.summary())
 
-    print(f"{'-' * 5} 爬取 CMoney 資料 {'-' * 5}")
+        return backfill_result
 
-    cmoney_crawler = CMoneyCrawler(is_headless=False)
+    membership_index = None
 
-    for day_arg in day_args_list:
-        print(f"取得 [{day_arg}] 資料...")
+    if args.membership_index or args.refresh_index:
+        membership_index = GroupMembershipIndex(
+            os.path.join(data_dir, "group_index.json"), args.index_max_age
+        )
 
-        cmoney_data = cmoney_crawler.get_data(stokc_price_all_day, mainborad_price_all_day, day_arg)
+    if args.daemon:
+        daemon = DailyDaemon(
+            args.base_dir,
+            run_at=args.run_at,
+            calendar=calendar,
+            is_headless=args.headless,
+            use_selenium=args.selenium,
+            streaming=args.streaming,
+            update_previous=not args.no_update,
+            statement_dog_parser=args.statementdog_parser,
+            membership_index=membership_index,
+            refresh_index=args.refresh_index,
+            retries=args.retries,
+            prometheus=args.prometheus,
+        )
 
-        print("爬取完成")
+        if args.restart:
+            Checkpoint(daemon.checkpoint_filename(date.today())).clear()
 
-        print("寫入 excel...")
+        # 收到 SIGTERM (i.e: systemd 停止服務) 時在目前的等待或執行結束後停止
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
 
-        excel.write_cmoney_data(cmoney_data, day_arg)
+        try:
+            daemon.run_forever()
 
-        print("寫入完成")
+        except KeyboardInterrupt:
+            print("停止常駐執行")
 
-    print(f"{'-' * 5} CMoney 資料處理完畢 {'-' * 5}")
+        finally:
+            daemon.close()
 
-    excel.wb.close()
+        return {}
 
-    # 更新資料
-    today_weekday = datetime.today().weekday()
+    # 每天一個紀錄檔，同一天中斷後重新執行時會略過已完成的工作
+    checkpoint = Checkpoint(
+        os.path.join(data_dir, ".checkpoint", f"{datetime.now():%Y-%m-%d}.pkl"), args.retries
+    )
 
-    # 星期一
-    if today_weekday == 0:
-        subtract_number = 3
+    if args.restart:
+        checkpoint.clear()
+
+    elif checkpoint.restored:
+        print(f"從上次中斷的地方繼續執行, 已完成 {len(checkpoint.restored)} 個工作")
+
+    daily_pipeline = DailyPipeline(
+        args.base_dir,
+        is_headless=args.headless,
+        use_selenium=args.selenium,
+        streaming=args.streaming,
+        update_previous=not args.no_update,
+        statement_dog_parser=args.statementdog_parser,
+        checkpoint=checkpoint,
+        membership_index=membership_index,
+        refresh_index=args.refresh_index,
+        calendar=calendar,
+    )
 
-    else:
-        subtract_number = 1
+    try:
+        results = daily_pipeline.run()
 
-    pre_date = datetime.now() - timedelta(days=subtract_number)
-    pre_date_str = pre_date.strftime("%Y-%m-%d")
+    except Exception:
+        print(f"執行失敗, 已完成的工作記錄在 [{checkpoint.filename}], 重新執行時會略過")
+        raise
 
-    pre_filename = os.path.join(base_dir, "data", f"{pre_date_str}.xlsx")
+    finally:
+        BaseRequset.close()
+        StockPrice.STORE.close()
 
-    if os.path.exists(pre_filename):
-        print(f"{'-' * 5} 更新前一天的資料 {'-' * 5}")
+    # 全部完成後就不需要紀錄了
+    checkpoint.clear()
 
-        print(f"更新 [{pre_filename}]")
-        excel_updater = ExeclUpdater(pre_filename)
-        excel_updater.update_file(stokc_price_all_day, mainborad_price_all_day)
-        print("更新完成")
+    daily_pipeline.report(results)
 
-    else:
-        print(f"找不到 {pre_filename} 因此跳過更新")
+    if args.prometheus:
+        Metrics.write_prometheus(args.prometheus)
 
     print("程式執行結束")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()